@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Consensus voting benchmark
+--------------------------
+Character error rate against the number of OCR passes, for best-of-N selection
+(what the extractors did before: score every pass and keep one) and for
+word-level consensus voting.
+
+The passes are simulated from a ground-truth page. Each pass misreads words
+with typical OCR confusions at its own error rate, and sometimes garbles a
+whole line. Misread words get lower confidences, as tesseract reports them.
+The oracle column is the best single pass chosen with hindsight, which is the
+limit for any method that keeps one pass.
+
+Usage:
+    python benchmarks/bench_consensus.py [--trials 50] [--passes 1 2 3 5 7]
+"""
+
+import os
+import sys
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_accuracy import cer
+from ocr_consensus import consensus
+from ocr_scoring import ranked
+
+
+WORDS = (
+    "the of and to in is that for it as was with be by on not this are from at "
+    "document report section page total number system information management "
+    "certificate presented recognition achievement signature director meeting "
+    "committee approved annual summary results following quarter revenue"
+).split()
+
+CONFUSIONS = [("m", "rn"), ("rn", "m"), ("l", "1"), ("o", "0"), ("e", "c"), ("h", "b"),
+              ("i", "l"), ("a", "o"), ("cl", "d"), ("u", "v"), ("t", "f"), ("S", "5")]
+
+
+def ground_truth(rng, lines=30):
+    paragraphs = []
+    for _ in range(lines // 5):
+        paragraphs.append('\n'.join(
+            ' '.join(rng.choice(WORDS) for _ in range(rng.randint(6, 12))) for _ in range(5)))
+    return '\n\n'.join(paragraphs)
+
+
+def misread(word, rng):
+    """The word with one or two OCR confusions or a dropped character"""
+    for _ in range(rng.randint(1, 2)):
+        options = [(wrong, right) for wrong, right in CONFUSIONS if wrong in word]
+        if options and rng.random() < 0.8:
+            wrong, right = rng.choice(options)
+            word = word.replace(wrong, right, 1)
+        elif len(word) > 1:
+            index = rng.randrange(len(word))
+            word = word[:index] + word[index + 1:]
+    return word
+
+
+def simulate_pass(truth, rng, error_rate, line_failure_rate=0.08):
+    """(text, word confidences) for one simulated OCR pass over the truth text"""
+    paragraphs = []
+    confidences = []
+    for paragraph in truth.split('\n\n'):
+        lines = []
+        for line in paragraph.split('\n'):
+            garbled = rng.random() < line_failure_rate
+            words = []
+            for word in line.split():
+                if garbled or rng.random() < error_rate:
+                    words.append(misread(word, rng))
+                    confidences.append(int(min(95, max(5, rng.gauss(55, 15)))))
+                else:
+                    words.append(word)
+                    confidences.append(int(min(99, max(40, rng.gauss(88, 6)))))
+            lines.append(' '.join(words))
+        paragraphs.append('\n'.join(lines))
+    return '\n\n'.join(paragraphs), confidences
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trials", type=int, default=50)
+    parser.add_argument("--passes", type=int, nargs="+", default=[1, 2, 3, 5, 7])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    totals = {count: [0.0, 0.0, 0.0] for count in args.passes}
+    for _ in range(args.trials):
+        truth = ground_truth(rng)
+        passes = [simulate_pass(truth, rng, rng.uniform(0.03, 0.15)) for _ in range(max(args.passes))]
+        for count in args.passes:
+            subset = passes[:count]
+            confidences = dict(subset)
+            order = [text for _, text in ranked([text for text, _ in subset], "document")]
+
+            best = order[0]
+            merged = consensus(order, [confidences[text] for text in order])
+            oracle = min(cer(text, truth) for text, _ in subset)
+
+            totals[count][0] += cer(best, truth)
+            totals[count][1] += oracle
+            totals[count][2] += cer(merged, truth)
+
+    print(f"CER over {args.trials} simulated pages")
+    print(f"{'passes':>6}{'best-of-N':>12}{'oracle':>12}{'consensus':>12}")
+    for count in args.passes:
+        best, oracle, merged = (value / args.trials for value in totals[count])
+        print(f"{count:>6}{best:>11.2%}{oracle:>12.2%}{merged:>12.2%}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Language model benchmark
+------------------------
+Build time, load time and per-candidate scoring cost of the character n-gram
+model in ocr_ngram, and how often it ranks a clean text above misread copies
+of it.
+
+Without --corpus, a corpus is generated from the bundled English lexicon.
+
+Usage:
+    python benchmarks/bench_language_model.py [--corpus file.txt ...] [--table-bits 20]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_lexicon import lexicon_files, read_lexicon
+from ocr_ngram import NgramModel
+
+CONFUSIONS = [("m", "rn"), ("rn", "m"), ("l", "1"), ("o", "0"), ("e", "c"), ("h", "b"),
+              ("i", "l"), ("a", "o"), ("cl", "d"), ("u", "v"), ("t", "f")]
+
+
+def synthetic_corpus(rng, paragraphs=2000):
+    words = {}
+    for path in lexicon_files("english"):
+        words.update(read_lexicon(path))
+    vocabulary = list(words)
+    weights = [words[word] for word in vocabulary]
+    for _ in range(paragraphs):
+        yield ' '.join(rng.choices(vocabulary, weights, k=rng.randint(20, 80)))
+
+
+def misread(text, rng, rate=0.2):
+    words = text.split()
+    for index, word in enumerate(words):
+        options = [(wrong, right) for wrong, right in CONFUSIONS if wrong in word]
+        if options and rng.random() < rate:
+            wrong, right = rng.choice(options)
+            words[index] = word.replace(wrong, right, 1)
+    return ' '.join(words)
+
+
+def per_call(func, items, repeat=3):
+    """Best time per call in microseconds"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, (time.perf_counter() - started) / len(items))
+    return best * 1e6
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", nargs="*", default=[])
+    parser.add_argument("--table-bits", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    if args.corpus:
+        texts = []
+        for path in args.corpus:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                texts.extend(paragraph for paragraph in f.read().split('\n\n') if paragraph.strip())
+    else:
+        texts = list(synthetic_corpus(rng))
+    held_out = texts[-100:]
+    texts = texts[:-100]
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "bench.ngram")
+        started = time.perf_counter()
+        NgramModel.build(texts, path, table_bits=args.table_bits)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        model = NgramModel(path)
+        load_seconds = time.perf_counter() - started
+
+        corpus_chars = sum(map(len, texts))
+        print(f"Corpus: {len(texts)} texts, {corpus_chars / 1e6:.1f}M characters")
+        print(f"Build: {build_seconds:.2f}s, model {os.path.getsize(path) // 1024} KB")
+        print(f"Load:  {load_seconds * 1e3:.2f} ms")
+        print()
+
+        print(f"{'candidate length':<20}{'per candidate':>16}")
+        sample = ' '.join(held_out)
+        for length in (50, 200, 1000):
+            candidates = [misread(sample[start:start + length], rng)
+                          for start in rng.sample(range(len(sample) - length), 100)]
+            print(f"{length:<20}{per_call(model.score, candidates):>13.0f} us")
+        print()
+
+        wins = 0
+        trials = 0
+        for text in held_out:
+            clean = text[:200]
+            for _ in range(3):
+                trials += 1
+                wins += model.score(clean) > model.score(misread(clean, rng))
+        print(f"Clean text ranked above a misread copy: {wins}/{trials}")
+        model.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
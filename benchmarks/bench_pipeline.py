@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+OCR pipeline benchmark
+----------------------
+Speed and accuracy of the whole pipeline, preprocessing through text cleaning,
+on a synthetic corpus with ground truth (see corpus.py). Reported per style:
+images/s, p50 and p95 latency, tesseract calls per image, CER and WER, and
+which mode the images were detected as. Per pass label it reports how often
+the pass won its selection and its mean CER, and adds those CERs to the pass
+statistics auto-prune decides by (see ocr_passes).
+
+The images go through the same worker pool as `run_ocr.py batch`, with worker
+start-up and warm-up kept out of the figures. One worker (the default) gives
+the most repeatable latencies.
+
+With --json the report is also written as JSON, tagged with the current git
+commit; --compare prints the change against such a report from another commit.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--corpus DIR] [--count 5] [--noise 8 --blur 0.8 --skew 1.5]
+                                        [--mode auto] [--workers 1] [--json out.json] [--compare base.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_accuracy import cer, wer
+from ocr_pool import OCRWorkerPool, _percentile
+from ocr_passes import PassStats, candidate_cers
+from corpus import generate, add_corpus_arguments, corpus_options
+
+
+def git_commit():
+    """Commit of the working tree being measured, or None outside a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_corpus(directory, manifest, engine_options, workers):
+    """Per-image records, their passes, and the wall-clock seconds the pool took for all of them"""
+    entries = {os.path.join(directory, entry["image"]): entry for entry in manifest["images"]}
+    records = []
+    passes = []
+    with OCRWorkerPool(workers=workers, engine_options=engine_options) as pool:
+        started = time.perf_counter()
+        for job in pool.map(list(entries)):
+            entry = entries[job.path]
+            with open(os.path.join(directory, entry["truth"]), encoding='utf-8') as f:
+                truth = f.read()
+            result = job.result
+            if result is not None:
+                candidate_cers(result.timings["passes"], truth, cer)
+                for item in result.timings["passes"]:
+                    item.pop("text", None)
+                    passes.append(item)
+            records.append({
+                "image": entry["image"],
+                "style": entry["style"],
+                "error": job.error,
+                "seconds": job.seconds,
+                "detected": result.mode if result is not None else None,
+                "tesseract_calls": len(result.timings["passes"]) if result is not None and result.timings else 0,
+                "cer": cer(job.text, truth),
+                "wer": wer(job.text, truth),
+            })
+        wall = time.perf_counter() - started
+    return records, passes, wall
+
+
+def summarize(records, wall=None):
+    """Aggregate figures for a group of per-image records"""
+    seconds = [record["seconds"] for record in records]
+    detected = {}
+    for record in records:
+        detected[record["detected"]] = detected.get(record["detected"], 0) + 1
+    count = len(records)
+    return {
+        "images": count,
+        "failures": sum(1 for record in records if record["error"]),
+        # Per style there is no wall clock of its own, so throughput is from the summed latencies
+        "images_per_second": count / (wall if wall is not None else sum(seconds)) if seconds else 0.0,
+        "p50": _percentile(seconds, 0.5),
+        "p95": _percentile(seconds, 0.95),
+        "tesseract_calls": sum(record["tesseract_calls"] for record in records) / max(1, count),
+        "cer": sum(record["cer"] for record in records) / max(1, count),
+        "wer": sum(record["wer"] for record in records) / max(1, count),
+        "detected": detected,
+    }
+
+
+def summarize_passes(passes):
+    """{label: runs, wins, mean ms, mean CER} over every pass of the run"""
+    labels = {}
+    for item in passes:
+        entry = labels.setdefault(item["label"], {"runs": 0, "candidates": 0, "wins": 0, "seconds": 0.0,
+                                                   "cer_runs": 0, "cer": 0.0})
+        entry["runs"] += 1
+        entry["seconds"] += item["seconds"]
+        if "score" in item:
+            entry["candidates"] += 1
+            entry["wins"] += int(item["won"])
+        if "cer" in item:
+            entry["cer_runs"] += 1
+            entry["cer"] += item["cer"]
+    return {label: {"runs": entry["runs"],
+                    "mean_ms": 1000 * entry["seconds"] / entry["runs"],
+                    "win_rate": entry["wins"] / entry["candidates"] if entry["candidates"] else None,
+                    "mean_cer": entry["cer"] / entry["cer_runs"] if entry["cer_runs"] else None}
+            for label, entry in sorted(labels.items())}
+
+
+def print_passes(passes):
+    print(f"\n{'pass':<34}{'runs':>6}{'ms':>8}{'wins':>7}{'CER':>8}")
+    for label, s in passes.items():
+        wins = f"{s['win_rate']:.0%}" if s["win_rate"] is not None else "-"
+        mean_cer = f"{s['mean_cer']:.1%}" if s["mean_cer"] is not None else "-"
+        print(f"{label:<34}{s['runs']:>6}{s['mean_ms']:>8.0f}{wins:>7}{mean_cer:>8}")
+
+
+def print_report(report):
+    print(f"{'style':<13}{'images':>7}{'img/s':>8}{'p50':>8}{'p95':>8}{'calls':>7}{'CER':>8}{'WER':>8}  detected as")
+    rows = list(report["styles"].items()) + [("all", report["overall"])]
+    for name, s in rows:
+        detected = ", ".join(f"{mode} {count}" for mode, count in sorted(s["detected"].items(), key=str))
+        print(f"{name:<13}{s['images']:>7}{s['images_per_second']:>8.2f}{s['p50']:>7.2f}s{s['p95']:>7.2f}s"
+              f"{s['tesseract_calls']:>7.1f}{s['cer']:>8.1%}{s['wer']:>8.1%}  {detected}")
+
+
+def print_comparison(report, base):
+    """Change of the headline figures against a report from another run"""
+    print(f"\nAgainst {base.get('commit') or 'baseline'}:")
+    print(f"{'style':<13}{'img/s':>10}{'p95':>10}{'calls':>9}{'CER':>9}")
+    rows = list(report["styles"].items()) + [("all", report["overall"])]
+    for name, s in rows:
+        old = base["overall"] if name == "all" else base["styles"].get(name)
+        if old is None:
+            continue
+        speed = (s["images_per_second"] / old["images_per_second"] - 1) if old["images_per_second"] else 0.0
+        print(f"{name:<13}{speed:>+10.1%}{s['p95'] - old['p95']:>+9.2f}s"
+              f"{s['tesseract_calls'] - old['tesseract_calls']:>+9.1f}{(s['cer'] - old['cer']) * 100:>+8.2f}%")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", help="existing corpus directory (default: generate one from the options below)")
+    add_corpus_arguments(parser)
+    parser.add_argument("--mode", default="auto", choices=["auto", "document", "screenshot", "single"])
+    parser.add_argument("--preprocessing", default="none", choices=["none", "contrast", "sharpen", "grayscale"])
+    parser.add_argument("--lang", default="eng")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--compare", help="report from an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    engine_options = {"mode": args.mode, "preprocessing": args.preprocessing, "lang": args.lang,
+                      "keep_pass_text": True}
+    with tempfile.TemporaryDirectory() as scratch:
+        directory = args.corpus or scratch
+        if args.corpus:
+            with open(os.path.join(directory, "manifest.json"), encoding='utf-8') as f:
+                manifest = json.load(f)
+        else:
+            manifest = generate(directory, **corpus_options(args))
+        print(f"{len(manifest['images'])} images ({', '.join(manifest['styles'])}), "
+              f"degradation {manifest['degradation']}, mode {args.mode}, {args.workers} worker(s)")
+        records, passes, wall = run_corpus(directory, manifest, engine_options, args.workers)
+
+    # The workers have counted the runs; ground truth adds each candidate pass's CER
+    pass_stats = PassStats()
+    pass_stats.update_accuracy(passes)
+    pass_stats.save()
+
+    styles = {}
+    for record in records:
+        styles.setdefault(record["style"], []).append(record)
+    report = {
+        "commit": git_commit(),
+        "created_at": time.time(),
+        "engine": engine_options,
+        "workers": args.workers,
+        "corpus": {key: manifest[key] for key in ("seed", "count", "styles", "degradation")},
+        "overall": summarize(records, wall),
+        "styles": {style: summarize(styles[style]) for style in manifest["styles"] if style in styles},
+        "passes": summarize_passes(passes),
+        "images": records,
+    }
+    print_report(report)
+    print_passes(report["passes"])
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(report, json.load(f))
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
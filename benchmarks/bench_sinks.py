@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Result sink benchmark
+---------------------
+Throughput of the bulk result sinks in ocr_sinks, measured on their own with
+synthetic results, so it can be compared with OCR throughput (a few images
+per second per worker). The baseline is what batch runs did before the sinks:
+one .txt file per result, opened, written and closed on the collecting loop.
+
+Usage:
+    python benchmarks/bench_sinks.py [--results 5000] [--words 300] [--sinks jsonl sqlite npz]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_result import OCRResult
+from ocr_words import WordTable
+from ocr_sinks import JsonlSink, SqliteSink, NpzSink, SinkWriter
+from bench_word_table import synthetic_data
+
+
+# The JobResult fields the sinks read (ocr_pool itself would import the whole OCR engine)
+Job = namedtuple("Job", "path text error seconds result")
+
+SINKS = {"jsonl": (JsonlSink, "results.jsonl"), "sqlite": (SqliteSink, "results.db"),
+         "npz": (NpzSink, "words.npz")}
+
+
+def synthetic_results(count, words):
+    table = WordTable.from_tesseract(synthetic_data(words), image_size=(2480, 3508))
+    timings = {"stages": {"preprocess": 0.4, "ocr": 2.1, "clean": 0.02}, "passes": [], "total": 2.52}
+    for index in range(count):
+        result = OCRResult(table.text, mode="document", image_size=(2480, 3508), timings=timings,
+                           path=f"scans/page{index:05d}.png", words=table)
+        yield Job(result.path, result.text, None, 2.52, result)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--results", type=int, default=5000)
+    parser.add_argument("--words", type=int, default=300, help="words per result")
+    parser.add_argument("--sinks", nargs="+", choices=list(SINKS), default=list(SINKS))
+    args = parser.parse_args(argv)
+
+    results = list(synthetic_results(args.results, args.words))
+    print(f"{args.results} results of {args.words} words ({len(results[0].text)} characters)")
+    print(f"{'sink':<12}{'seconds':>10}{'results/s':>12}{'MB':>8}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        started = time.perf_counter()
+        for index, result in enumerate(results):
+            with open(os.path.join(directory, f"{index}.txt"), 'w', encoding='utf-8') as f:
+                f.write(result.text)
+        seconds = time.perf_counter() - started
+        print(f"{'.txt files':<12}{seconds:>10.3f}{args.results / seconds:>12.0f}{'':>8}")
+
+        for name in args.sinks:
+            cls, filename = SINKS[name]
+            path = os.path.join(directory, filename)
+            started = time.perf_counter()
+            writer = SinkWriter([cls(path)])
+            for result in results:
+                writer.submit(result)
+            writer.close()
+            seconds = time.perf_counter() - started
+            size = os.path.getsize(path) / 1e6
+            print(f"{name:<12}{seconds:>10.3f}{args.results / seconds:>12.0f}{size:>8.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
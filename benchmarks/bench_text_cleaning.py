@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Text cleaning microbenchmark
+----------------------------
+Times ocr_text's cleaners against the previous per-call implementations on
+about 1 MB of synthetic OCR output, and checks that both give the same text.
+
+Usage:
+    python benchmarks/bench_text_cleaning.py [--size-mb 1] [--repeat 3]
+"""
+
+import os
+import re
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ocr_text
+from ocr_text import COMMON_CORRECTIONS, CERTIFICATE_CORRECTIONS
+
+
+# The previous implementation, kept here for comparison
+LEGACY_REPLACEMENTS = dict(ocr_text.CHAR_REPLACEMENTS)
+
+
+# Evaluating the table's repr compiles the same dict display the old code built
+_common_corrections_literal = eval("lambda: " + repr(COMMON_CORRECTIONS))
+_certificate_corrections_literal = eval("lambda: " + repr(CERTIFICATE_CORRECTIONS))
+
+
+def legacy_clean_text(text):
+    if not text:
+        return text
+
+    for original, replacement in LEGACY_REPLACEMENTS.items():
+        text = text.replace(original, replacement)
+
+    cleaned_lines = []
+    for line in text.split('\n'):
+        if not line.strip():
+            cleaned_lines.append('')
+            continue
+        if re.match(r'^[-_=.…]+$', line.strip()):
+            continue
+        alpha_count = sum(c.isalnum() or c.isspace() for c in line)
+        if alpha_count / len(line) >= 0.3:
+            line = re.sub(r'[^\w\s.,;:!?()\'"-]', '', line)
+            cleaned_lines.append(line)
+
+    cleaned_text = '\n'.join(cleaned_lines)
+    cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
+    cleaned_text = re.sub(r'^\s+|\s+$', '', cleaned_text, flags=re.MULTILINE)
+    cleaned_text = re.sub(r'\s[b-hj-zA-HJ-Z]\s', ' ', cleaned_text)
+    cleaned_text = re.sub(r'([a-z])([A-Z])', r'\1 \2', cleaned_text)
+    cleaned_text = re.sub(r'([a-zA-Z])0([a-zA-Z])', r'\1o\2', cleaned_text)
+    cleaned_text = re.sub(r'([a-zA-Z])1([a-zA-Z])', r'\1l\2', cleaned_text)
+
+    corrected_words = []
+    for word in cleaned_text.split():
+        if len(word) <= 2 or word.isdigit() or not word.isalpha():
+            corrected_words.append(word)
+            continue
+        # The old code rebuilt its correction table literal for every word
+        common_corrections = _common_corrections_literal()
+        if word.lower() in common_corrections:
+            if word.isupper():
+                corrected_words.append(common_corrections[word.lower()].upper())
+            elif word[0].isupper():
+                corrected_words.append(common_corrections[word.lower()].capitalize())
+            else:
+                corrected_words.append(common_corrections[word.lower()])
+        else:
+            corrected_words.append(word)
+
+    final_text = ' '.join(corrected_words)
+    final_text = re.sub(r'([.,;:!?])([^\s])', r'\1 \2', final_text)
+    return final_text.strip()
+
+
+def legacy_post_process_certificate_text(text):
+    if not text:
+        return text
+
+    certificate_corrections = _certificate_corrections_literal()
+    corrected_words = []
+    for word in text.split():
+        word_lower = word.lower()
+        if word_lower in certificate_corrections:
+            if word.isupper():
+                corrected_words.append(certificate_corrections[word_lower].upper())
+            elif word[0].isupper():
+                corrected_words.append(certificate_corrections[word_lower].capitalize())
+            else:
+                corrected_words.append(certificate_corrections[word_lower])
+        else:
+            corrected_words.append(word)
+
+    corrected_text = ' '.join(corrected_words)
+    for heading in ['CERTIFICATE', 'AWARD', 'RECOGNITION', 'ACHIEVEMENT']:
+        pattern = r'([^\n]*)(' + heading + r')([^\n]*)'
+        corrected_text = re.sub(pattern, r'\1\n' + heading + r'\n\3', corrected_text, flags=re.IGNORECASE)
+    for phrase in ['presented to', 'awarded to', 'given to', 'granted to']:
+        pattern = r'([^\n]*)(' + phrase + r')([^\n]*)'
+        corrected_text = re.sub(pattern, r'\1\n\2\n\3', corrected_text, flags=re.IGNORECASE)
+    corrected_text = re.sub(r'\n{3,}', '\n\n', corrected_text)
+    return corrected_text.strip()
+
+
+def legacy_printable_text(text):
+    return ''.join(c if c.isprintable() or c in ['\n', '\t'] else ' ' for c in text)
+
+
+WORDS = (
+    "the of and to in is that for it as was with be by on not this are from at "
+    "document report section page total number system information management "
+    "Certificate Award presented to recognition achievement signature director"
+).split()
+NOISE = list(COMMON_CORRECTIONS) + ['|', '1', '$ign', '[1]', '©', '°C', '—', '…', '•', 'x', 'q', 'A0B']
+
+
+def synthetic_ocr_text(size, seed=0):
+    """Roughly size characters of word soup with OCR-style noise and junk lines"""
+    rng = random.Random(seed)
+    lines = []
+    length = 0
+    while length < size:
+        if rng.random() < 0.05:
+            line = rng.choice(['------', '____', '~~ ## ~~', '. . .', ''])
+        else:
+            line = ' '.join(
+                rng.choice(NOISE) if rng.random() < 0.15 else rng.choice(WORDS)
+                for _ in range(rng.randint(4, 14))
+            )
+            if rng.random() < 0.3:
+                line = line.capitalize() + rng.choice(['.', ',', ':', '!'])
+        lines.append(line)
+        length += len(line) + 1
+    return '\n'.join(lines)
+
+
+def best_of(func, text, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=1.0)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    text = synthetic_ocr_text(int(args.size_mb * 1024 * 1024))
+    print(f"Input: {len(text) / 1024 / 1024:.2f} MB, {len(text.split())} words")
+    print()
+    print(f"{'function':<32}{'legacy':>10}{'compiled':>10}{'speedup':>10}")
+
+    # The old certificate layout regexes rescan the rest of the line from every
+    # position, which is quadratic on one long line, so certificates are timed
+    # the way they occur: as many short texts
+    certificates = [text[start:start + 300] for start in range(0, len(text), 300)]
+
+    def per_certificate(func):
+        return lambda _: [func(certificate) for certificate in certificates]
+
+    cases = [
+        ("clean_text", legacy_clean_text, ocr_text.clean_text),
+        ("post_process_certificate_text", per_certificate(legacy_post_process_certificate_text),
+         per_certificate(ocr_text.post_process_certificate_text)),
+        ("printable_text", legacy_printable_text, ocr_text.printable_text),
+    ]
+
+    mismatches = 0
+    for name, legacy, current in cases:
+        legacy_seconds, expected = best_of(legacy, text, args.repeat)
+        current_seconds, actual = best_of(current, text, args.repeat)
+        print(f"{name:<32}{legacy_seconds:>9.3f}s{current_seconds:>9.3f}s"
+              f"{legacy_seconds / current_seconds:>9.1f}x")
+        if actual != expected:
+            mismatches += 1
+            print("  output differs from the legacy implementation")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
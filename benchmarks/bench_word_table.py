@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Word table memory benchmark
+---------------------------
+Measures the memory held by word boxes stored as a list of per-word dicts (the
+rows pytesseract's image_to_data gives back) against ocr_words.WordTable, and
+times exporting both to TSV.
+
+Usage:
+    python benchmarks/bench_word_table.py [--words 10000]
+"""
+
+import io
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_words import WordTable, WORD_LEVEL
+
+
+WORDS = (
+    "the of and to in is that for it as was with be by on not this are from at "
+    "document report section page total number system information management"
+).split()
+
+
+def synthetic_data(count, seed=0):
+    """image_to_data-style columns for count words laid out in lines and paragraphs"""
+    rng = random.Random(seed)
+    data = {key: [] for key in ("level", "page_num", "block_num", "par_num", "line_num", "word_num",
+                                "left", "top", "width", "height", "conf", "text")}
+    block, par, line, word_num, left = 1, 1, 1, 0, 0
+    for _ in range(count):
+        word_num += 1
+        if word_num > 12:
+            word_num, left, line = 1, 0, line + 1
+            if rng.random() < 0.2:
+                par, line = par + 1, 1
+        word = rng.choice(WORDS)
+        width = 9 * len(word)
+        for key, value in (("level", WORD_LEVEL), ("page_num", 1), ("block_num", block), ("par_num", par),
+                           ("line_num", line), ("word_num", word_num), ("left", left),
+                           ("top", 30 * (line + 10 * par)), ("width", width), ("height", 22),
+                           ("conf", f"{rng.uniform(30, 99):.6f}"), ("text", word)):
+            data[key].append(value)
+        left += width + 8
+    return data
+
+
+def as_dicts(data):
+    """The per-word representation: one dict of converted values per word"""
+    keys = list(data)
+    rows = []
+    for values in zip(*(data[key] for key in keys)):
+        row = dict(zip(keys, values))
+        row["conf"] = float(row["conf"])
+        rows.append(row)
+    return rows
+
+
+def measure(build):
+    """(bytes still allocated by what build returned, the value)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    value = build()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return size, value
+
+
+def dicts_to_tsv(rows, f):
+    f.write("\t".join(rows[0]) + "\n")
+    for row in rows:
+        f.write("\t".join(str(value) for value in row.values()) + "\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--words", type=int, default=10000)
+    args = parser.parse_args(argv)
+
+    data = synthetic_data(args.words)
+    dict_bytes, rows = measure(lambda: as_dicts(data))
+    table_bytes, table = measure(lambda: WordTable.from_tesseract(data, image_size=(2480, 3508)))
+
+    print(f"{args.words} words")
+    print(f"{'representation':<16}{'total':>12}{'per word':>12}")
+    print(f"{'list of dicts':<16}{dict_bytes / 1024:>10.0f}KB{dict_bytes / args.words:>11.0f}B")
+    print(f"{'WordTable':<16}{table_bytes / 1024:>10.0f}KB{table_bytes / args.words:>11.0f}B"
+          f"  ({table.nbytes() / 1024:.0f}KB in columns, {len(table.text) / 1024:.0f}KB of text)")
+    print(f"{'ratio':<16}{dict_bytes / table_bytes:>11.1f}x")
+
+    print()
+    for name, export in (("list of dicts", lambda: dicts_to_tsv(rows, io.StringIO())),
+                         ("WordTable", lambda: table.write_tsv(io.StringIO()))):
+        started = time.perf_counter()
+        export()
+        print(f"TSV export, {name:<14}{time.perf_counter() - started:>8.3f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
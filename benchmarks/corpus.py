@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Synthetic OCR corpus
+--------------------
+Renders images with known text in the four styles the app detects: printed
+documents, application screenshots, single lines (buttons and labels) and
+certificates. Each image is written with its ground truth next to it, so
+bench_pipeline.py can measure speed and accuracy on the same pages from one
+commit to the next.
+
+Degradations are applied in the order a scan picks them up: resolution
+(rendering at a lower scale), skew, blur and then sensor noise. The same seed
+and options always give the same corpus.
+
+Files written to the output directory, for each image:
+    <style>_<n>.png       the image
+    <style>_<n>.gt.txt    its text, one rendered line per line
+and manifest.json listing every image with its style and degradations.
+
+Usage:
+    python benchmarks/corpus.py OUTPUT_DIR [--count 5] [--styles document screenshot single certificate]
+                                [--scale 1.0] [--skew 0] [--blur 0] [--noise 0] [--seed 0]
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+
+STYLES = ("document", "screenshot", "single", "certificate")
+
+WORDS = (
+    "the of and to in is that for it as was with be by on not this are from at "
+    "document report section page total number system information management "
+    "meeting committee approved annual summary results following quarter revenue "
+    "customer account payment invoice balance period service contract delivery"
+).split()
+
+MENU_ITEMS = ["File", "Edit", "View", "Project", "Settings", "Help", "Inbox", "Drafts",
+              "Archive", "Reports", "Contacts", "Calendar"]
+
+BUTTON_LABELS = ["Save changes", "Cancel", "Submit order", "Sign in", "Continue to payment",
+                 "Download report", "Delete account", "Send message", "Apply filters"]
+
+NAMES = ["Maria Gonzalez", "James Okafor", "Lena Fischer", "Arjun Patel", "Sophie Martin",
+         "Daniel Kowalski", "Aiko Tanaka", "Samuel Reed"]
+
+COURSES = ["Advanced Project Management", "Data Analysis Fundamentals", "Workplace Safety",
+           "Introduction to Accounting", "Leadership and Communication"]
+
+# TrueType fonts tried in order; PIL's built-in font is the fallback
+SANS_FONTS = ["DejaVuSans.ttf", "Arial.ttf", "arial.ttf", "LiberationSans-Regular.ttf"]
+SERIF_FONTS = ["DejaVuSerif.ttf", "Times New Roman.ttf", "times.ttf", "LiberationSerif-Regular.ttf"]
+
+
+def load_font(size, names=SANS_FONTS):
+    for name in names:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default(size=size)
+
+
+def sentence(rng, low=6, high=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def wrap(text, font, width):
+    """Lines of text that fit in width pixels"""
+    lines = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if line and font.getlength(candidate) > width:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    if line:
+        lines.append(line)
+    return lines
+
+
+def render_document(rng):
+    """A4 page at 150 dpi: heading and paragraphs of black text on white"""
+    image = Image.new('RGB', (1240, 1754), 'white')
+    draw = ImageDraw.Draw(image)
+    heading = load_font(40)
+    body = load_font(26)
+    lines = [sentence(rng, 3, 5).title()]
+    draw.text((120, 120), lines[0], font=heading, fill='black')
+    y = 220
+    while y < 1550:
+        for line in wrap(' '.join(sentence(rng) for _ in range(rng.randint(2, 4))), body, 1000):
+            if y >= 1600:
+                break
+            draw.text((120, y), line, font=body, fill='black')
+            lines.append(line)
+            y += 38
+        y += 30
+    return image, lines
+
+
+def render_screenshot(rng):
+    """1280x800 window: coloured title bar, sidebar menu, body text and buttons"""
+    image = Image.new('RGB', (1280, 800), (245, 246, 250))
+    draw = ImageDraw.Draw(image)
+    font = load_font(20)
+    title_font = load_font(24)
+    accent = rng.choice([(33, 99, 196), (46, 125, 50), (123, 31, 162), (198, 40, 40)])
+
+    draw.rectangle((0, 0, 1280, 60), fill=accent)
+    title = sentence(rng, 2, 4).title()
+    draw.text((24, 16), title, font=title_font, fill='white')
+    lines = [title]
+
+    draw.rectangle((0, 60, 240, 800), fill=(228, 231, 238))
+    for index, item in enumerate(rng.sample(MENU_ITEMS, 6)):
+        draw.text((24, 90 + index * 44), item, font=font, fill=(40, 40, 40))
+        lines.append(item)
+
+    y = 100
+    for _ in range(rng.randint(3, 5)):
+        for line in wrap(' '.join(sentence(rng) for _ in range(2)), font, 960):
+            draw.text((280, y), line, font=font, fill=(30, 30, 30))
+            lines.append(line)
+            y += 30
+        y += 24
+
+    x = 280
+    for label in rng.sample(BUTTON_LABELS, 2):
+        width = int(font.getlength(label)) + 40
+        draw.rounded_rectangle((x, 700, x + width, 746), radius=8, fill=accent)
+        draw.text((x + 20, 711), label, font=font, fill='white')
+        lines.append(label)
+        x += width + 24
+    return image, lines
+
+
+def render_single(rng):
+    """One button or label, much wider than tall"""
+    label = rng.choice(BUTTON_LABELS)
+    font = load_font(28)
+    width = int(font.getlength(label)) + 60
+    background, color = rng.choice([((255, 255, 255), (0, 0, 0)), ((33, 99, 196), (255, 255, 255)),
+                                     ((230, 230, 230), (20, 20, 20))])
+    image = Image.new('RGB', (max(width, 160), 56), background)
+    ImageDraw.Draw(image).text((30, 12), label, font=font, fill=color)
+    return image, [label]
+
+
+def render_certificate(rng):
+    """Landscape certificate with a double decorative border and centred serif text"""
+    image = Image.new('RGB', (1650, 1275), 'white')
+    draw = ImageDraw.Draw(image)
+    border = (120, 90, 30)
+    draw.rectangle((40, 40, 1610, 1235), outline=border, width=12)
+    draw.rectangle((80, 80, 1570, 1195), outline=border, width=3)
+
+    name = rng.choice(NAMES)
+    rows = [
+        ("Certificate of Achievement", 72),
+        ("This is to certify that", 36),
+        (name, 64),
+        ("has successfully completed", 36),
+        (rng.choice(COURSES), 44),
+        (f"Awarded on {rng.randint(1, 28)} {rng.choice(['March', 'June', 'September'])} 20{rng.randint(18, 26)}", 32),
+    ]
+    y = 220
+    lines = []
+    for text, size in rows:
+        font = load_font(size, SERIF_FONTS)
+        draw.text(((1650 - font.getlength(text)) / 2, y), text, font=font, fill=(20, 20, 20))
+        lines.append(text)
+        y += size + 70
+
+    font = load_font(30, SERIF_FONTS)
+    for x, role in ((300, "Director"), (1050, "Instructor")):
+        draw.line((x, 1080, x + 300, 1080), fill=(20, 20, 20), width=2)
+        draw.text((x + (300 - font.getlength(role)) / 2, 1095), role, font=font, fill=(20, 20, 20))
+    lines.append("Director Instructor")
+    return image, lines
+
+
+RENDERERS = {
+    "document": render_document,
+    "screenshot": render_screenshot,
+    "single": render_single,
+    "certificate": render_certificate,
+}
+
+
+def degrade(image, rng, scale=1.0, skew=0.0, blur=0.0, noise=0.0):
+    """
+    The image as a scan or capture would give it back: resized by scale,
+    rotated by up to skew degrees either way, Gaussian-blurred with radius
+    blur, and with Gaussian noise of standard deviation noise (in grey levels).
+    """
+    if scale != 1.0:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    if skew:
+        angle = rng.uniform(-skew, skew)
+        image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor='white')
+    if blur:
+        image = image.filter(ImageFilter.GaussianBlur(blur))
+    if noise:
+        pixels = np.asarray(image, dtype=np.float32)
+        pixels += np.random.default_rng(rng.getrandbits(32)).normal(0, noise, pixels.shape)
+        image = Image.fromarray(np.clip(pixels, 0, 255).astype(np.uint8))
+    return image
+
+
+def generate(directory, count=5, styles=STYLES, seed=0, **degradation):
+    """Write count images of each style to directory and return the manifest"""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    images = []
+    for style in styles:
+        for index in range(count):
+            image, lines = RENDERERS[style](rng)
+            image = degrade(image, rng, **degradation)
+            name = f"{style}_{index:03d}"
+            image.save(os.path.join(directory, f"{name}.png"))
+            with open(os.path.join(directory, f"{name}.gt.txt"), 'w', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            images.append({"image": f"{name}.png", "truth": f"{name}.gt.txt", "style": style,
+                           "size": list(image.size)})
+
+    manifest = {"seed": seed, "count": count, "styles": list(styles), "degradation": degradation,
+                "images": images}
+    with open(os.path.join(directory, "manifest.json"), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def add_corpus_arguments(parser):
+    """Generator options, shared with bench_pipeline.py"""
+    parser.add_argument("--count", type=int, default=5, help="images per style")
+    parser.add_argument("--styles", nargs="+", choices=STYLES, default=list(STYLES))
+    parser.add_argument("--scale", type=float, default=1.0, help="resolution relative to the rendered size")
+    parser.add_argument("--skew", type=float, default=0.0, help="largest rotation, in degrees")
+    parser.add_argument("--blur", type=float, default=0.0, help="Gaussian blur radius, in pixels")
+    parser.add_argument("--noise", type=float, default=0.0, help="noise standard deviation, in grey levels")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def corpus_options(args):
+    return {"count": args.count, "styles": args.styles, "seed": args.seed, "scale": args.scale,
+            "skew": args.skew, "blur": args.blur, "noise": args.noise}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("output_dir")
+    add_corpus_arguments(parser)
+    args = parser.parse_args(argv)
+
+    manifest = generate(args.output_dir, **corpus_options(args))
+    print(f"Wrote {len(manifest['images'])} images to {args.output_dir}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
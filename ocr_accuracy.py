@@ -0,0 +1,63 @@
+"""
+OCR Accuracy
+------------
+Character and word error rates of OCR output against ground truth, the usual
+measures for comparing OCR settings: the edit distance between output and
+truth divided by the length of the truth.
+"""
+
+
+def levenshtein(a, b):
+    """
+    Insertions, deletions and substitutions needed to turn sequence a into b.
+
+    Uses the bit-parallel algorithm of Myers and Hyyrö: one column of the edit
+    distance table is held as bit vectors in Python integers, so each item of
+    a costs a handful of integer operations instead of a loop over b.
+    """
+    if not a:
+        return len(b)
+    if not b:
+        return len(a)
+
+    # Bit i of match[item] is set where b[i] == item
+    match = {}
+    for i, item in enumerate(b):
+        match[item] = match.get(item, 0) | (1 << i)
+
+    mask = (1 << len(b)) - 1
+    last = 1 << (len(b) - 1)
+    plus, minus = mask, 0     # vertical deltas of +1 and -1 down the current column
+    distance = len(b)
+    for item in a:
+        equal = match.get(item, 0)
+        vertical = equal | minus
+        horizontal = (((equal & plus) + plus) ^ plus) | equal
+        h_plus = minus | (~(horizontal | plus) & mask)
+        h_minus = plus & horizontal
+        if h_plus & last:
+            distance += 1
+        elif h_minus & last:
+            distance -= 1
+        h_plus = ((h_plus << 1) | 1) & mask
+        h_minus = (h_minus << 1) & mask
+        plus = h_minus | (~(vertical | h_plus) & mask)
+        minus = h_plus & vertical
+    return distance
+
+
+def _normalize(text):
+    """Collapse runs of whitespace, which OCR layout changes without changing what was read"""
+    return ' '.join(text.split())
+
+
+def cer(output, truth):
+    """Character error rate of output against truth (0 is perfect; can exceed 1)"""
+    output, truth = _normalize(output), _normalize(truth)
+    return levenshtein(output, truth) / max(1, len(truth))
+
+
+def wer(output, truth):
+    """Word error rate of output against truth (0 is perfect; can exceed 1)"""
+    output, truth = output.split(), truth.split()
+    return levenshtein(output, truth) / max(1, len(truth))
@@ -10,10 +10,62 @@ import numpy as np
 import cv2
 import threading
 import time
-import re
 import concurrent.futures
+from collections import namedtuple, deque
+
+from ocr_events import ProgressBus, coalesce, PROGRESS, STAGE, CALL, ESTIMATE
+from ocr_result import OCRResult
+from ocr_words import WordTable
+from ocr_scoring import ranked
+from ocr_consensus import merge
+from ocr_text import (clean_text, post_process_certificate_text, printable_text, is_placeholder,
+                      spelling_lexicon, confusion_table, language_model, uncertain_words, CERTIFICATE_DOMAINS)
+from ocr_pages import is_multipage, streams_pages, first_page, page_count, process_pages, open_image, full_size
+from ocr_strips import open_strips, iter_tiles
+from ocr_thumbs import ThumbnailWorker
+from ocr_debug import DebugSink
+from ocr_timing import StageTimer, ProgressEstimator, get_timing_store, megapixel_bucket
+from ocr_passes import get_pass_stats, record_outcomes, record_votes
+from ocr_trace import span, traced, TRACE_ENV, enable as enable_tracing, write_trace
+from ocr_log import get_logger, configure as configure_logging, count, lazy, format_counters, TRACE
+
+# Attributes describing the image currently being processed; reset before each job
+JOB_STATE_ATTRS = ('detected_type', 'processing_results', 'multi_processing_available', 'stage_timer',
+                   'pass_words', 'pass_records', 'selected_text', 'cleaned_texts', 'debug_job')
+
+# Modes whose passes are merged by word-level voting instead of keeping the best one.
+# Screenshot passes use sparse layouts that read UI regions in different orders,
+# so their words don't line up
+CONSENSUS_MODES = ("ocr", "document", "certificate")
+
+# Images are shrunk to this many pixels for OCR, so JPEGs are decoded no larger than needed for it
+OCR_MAX_PIXELS = 1000000
+
+# Preview size, slightly less than the canvas to account for padding
+PREVIEW_SIZE = (580, 380)
+# Size the processed image is shown at in its debug window
+PROCESSED_VIEW_SIZE = (760, 500)
+
+# Characters inserted into the text box per event loop tick, so large results don't freeze the window
+TEXT_INSERT_CHARS = 64 * 1024
+
+log = get_logger("app")
+
+
+def _format_stages(result):
+    return ", ".join(f"{stage} {seconds:.2f}s" for stage, seconds in result.stage_timings.items())
+
+
+# An image that has been through detection and preprocessing, ready for OCR passes
+PreparedImage = namedtuple(
+    "PreparedImage",
+    "original processed path mode size_bucket image_size state"
+)
 
 class OCRApp:
+    # How often the main loop drains progress events from the worker thread (ms)
+    PROGRESS_POLL_MS = 50
+    
     def __init__(self, root):
         self.root = root
         self.root.title("OCR Application")
@@ -43,6 +95,16 @@ class OCRApp:
         self.current_image_path = None
         self.extracted_text = ""
         
+        # Text waiting to be inserted into the text box, as [text, position] entries
+        self._pending_text = deque()
+        
+        # Renders previews off the UI thread and keeps them in the thumbnail cache
+        self.thumbnails = ThumbnailWorker()
+        
+        # Processed images and OCR variants are saved in the background for "View Processed Image"
+        self.debug_sink = DebugSink()
+        self.last_processed_path = None
+        
         # Create main content frame to hold everything
         self.main_content = tk.Frame(root, bg="#f5f5f5")
         self.main_content.pack(fill=tk.BOTH, expand=True, padx=0, pady=0)
@@ -61,7 +123,7 @@ class OCRApp:
         self.title_label.pack(anchor=tk.W, pady=(0, 5))
         
         # File formats label
-        self.formats_label = tk.Label(self.top_section, text=".jpg, .jpeg, .png", font=("Arial", 12), bg="#f5f5f5")
+        self.formats_label = tk.Label(self.top_section, text=".jpg, .jpeg, .png, .tif, .tiff, .pdf", font=("Arial", 12), bg="#f5f5f5")
         self.formats_label.pack(anchor=tk.W, pady=(0, 20))
         
         # Create two main columns
@@ -317,6 +379,15 @@ class OCRApp:
         
         # Hide side loading bar initially
         self.side_progress.pack_forget()
+        
+        # The OCR worker thread never touches Tk; it publishes events here and the
+        # main loop drains them on a timer
+        self.progress_bus = ProgressBus()
+        self.current_stage = None
+        self.progress_estimator = None
+        self.progress_status_text = ""
+        self.last_result = None
+        self.root.after(self.PROGRESS_POLL_MS, self._drain_progress_events)
 
     def configure_tesseract(self):
         """Configure tesseract executable path based on OS"""
@@ -340,7 +411,7 @@ class OCRApp:
             for path in tesseract_paths:
                 if os.path.exists(path):
                     pytesseract.pytesseract.tesseract_cmd = path
-                    print(f"Using Tesseract from: {path}")
+                    log.info("Using Tesseract from: %s", path)
                     break
                     
             # Set TESSDATA_PREFIX environment variable if not already set
@@ -348,7 +419,7 @@ class OCRApp:
                 for prefix in ['/usr/local/share/tessdata', '/opt/homebrew/share/tessdata']:
                     if os.path.exists(prefix):
                         os.environ['TESSDATA_PREFIX'] = prefix
-                        print(f"Setting TESSDATA_PREFIX to: {prefix}")
+                        log.info("Setting TESSDATA_PREFIX to: %s", prefix)
                         break
                         
         # For Linux
@@ -366,11 +437,11 @@ class OCRApp:
         try:
             # Try to get tesseract version
             version = pytesseract.get_tesseract_version()
-            print(f"Tesseract version: {version}")
+            log.info("Tesseract version: %s", version)
             return True, f"Tesseract version {version} detected"
         except Exception as e:
             error_message = str(e)
-            print(f"Tesseract error: {error_message}")
+            log.error("Tesseract error: %s", error_message)
             
             # Check if the error is related to missing data files
             if "tessdata" in error_message or "TESSDATA_PREFIX" in error_message:
@@ -380,7 +451,8 @@ class OCRApp:
     
     def upload_file(self):
         filetypes = [
-            ("Image files", "*.jpg *.jpeg *.png"),
+            ("Image files", "*.jpg *.jpeg *.png *.tif *.tiff"),
+            ("PDF documents", "*.pdf"),
         ]
         
         file_path = filedialog.askopenfilename(filetypes=filetypes)
@@ -391,7 +463,7 @@ class OCRApp:
                 self.current_image_path = file_path
                 self.current_image = None  # Clear previous image
                 self.extracted_text = ""   # Clear previous text
-                self.text_box.delete(1.0, tk.END)  # Clear text box
+                self._clear_text_box()  # Clear text box
                 
                 # Load and display the new image
                 self.display_image(file_path)
@@ -401,44 +473,41 @@ class OCRApp:
                 if self.auto_scan_var.get():
                     self.root.after(500, self.scan_image)  # Slight delay to ensure image is loaded
             else:
-                messagebox.showerror("Invalid File", "Please select a file with .jpg, .jpeg, or .png extension.")
+                messagebox.showerror("Invalid File", "Please select a .jpg, .jpeg, .png, .tif, .tiff or .pdf file.")
                 self.status_var.set("Error: Invalid file format")
     
     def validate_file(self, file_path):
-        valid_extensions = ('.jpg', '.jpeg', '.png')
+        valid_extensions = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.pdf')
         return file_path.lower().endswith(valid_extensions)
     
     def display_image(self, image_path):
-        # Open the image and resize for display
+        """Show a placeholder and have the preview rendered (or read from the thumbnail cache) in the background"""
+        # The image for OCR is decoded on the OCR thread when a scan needs it
+        self.current_image = None
+        
+        self.preview_label.config(image="", text="Loading preview...")
+        self.preview_label.image = None
+        
+        def deliver(img, error):
+            self.progress_bus.call(lambda: self._show_preview(image_path, img, error))
+        
+        self.thumbnails.request("preview", image_path, PREVIEW_SIZE, deliver)
+    
+    def _show_preview(self, image_path, img, error):
+        """Display a finished preview thumbnail (main thread)"""
+        # A different file may have been opened while this one was rendering
+        if image_path != self.current_image_path:
+            return
+        
+        if error is not None:
+            self.preview_label.config(text="")
+            messagebox.showerror("Error", f"Could not display image: {str(error)}")
+            self.status_var.set("Error displaying image")
+            return
+        
         try:
-            img = Image.open(image_path)
-            
-            # Store the original image for OCR processing
-            self.current_image = img.copy()
-            
-            # Get original image dimensions
-            width, height = img.size
-            
-            # Calculate size for display - set reasonable limits for preview
-            max_display_width = 580  # Slightly less than canvas width to account for padding
-            max_display_height = 380  # Slightly less than canvas height to account for padding
-            
-            # Calculate the scaling factor to maintain aspect ratio
-            scale_factor = min(max_display_width / width, max_display_height / height)
-            
-            # If the image is already smaller than our max dimensions, don't scale it up
-            if scale_factor > 1:
-                scale_factor = 1.0
-                
-            # Calculate new dimensions
-            new_width = int(width * scale_factor)
-            new_height = int(height * scale_factor)
-            
-            # Resize the image
-            img_resized = img.resize((new_width, new_height), Image.LANCZOS)
-            
             # Convert to PhotoImage for display
-            photo = ImageTk.PhotoImage(img_resized)
+            photo = ImageTk.PhotoImage(img)
             
             # Update the preview label
             self.preview_label.config(image=photo, text="")
@@ -475,6 +544,7 @@ class OCRApp:
             "difficult images."
         )
     
+    @traced("preprocess")
     def preprocess_image(self, image):
         """Apply advanced preprocessing to the image for optimal OCR accuracy"""
         preproc_type = self.preproc_var.get()
@@ -483,25 +553,26 @@ class OCRApp:
         # Detect image type for optimal processing
         detected_type = self._detect_image_type(image)
         self.detected_type = detected_type
-        print(f"Detected image type: {detected_type}")
+        count(f"detected.{detected_type}")
+        log.debug("Detected image type: %s", detected_type)
         
         # If auto detect mode is selected, override with the detected type
         if ocr_mode == "auto":
             ocr_mode = detected_type
-            print(f"Auto-detection: Using {detected_type} processing mode")
+            log.debug("Auto-detection: using %s processing mode", detected_type)
         
         # Apply specialized processing based on detected or selected type
         if detected_type == "certificate" and self._is_likely_certificate(image):
-            print("Detected certificate-like document - applying specialized processing")
+            count("preprocess.certificate")
             return self._enhance_certificate(image)
         elif ocr_mode == "screenshot" or (ocr_mode == "auto" and detected_type == "screenshot"):
-            print("Detected screenshot - applying specialized screenshot processing")
+            count("preprocess.screenshot")
             return self._enhance_screenshot(image)
         elif ocr_mode == "document" or (ocr_mode == "auto" and detected_type == "document"):
-            print("Detected text document - applying document optimization")
+            count("preprocess.document")
             return self._enhance_document(image)
         elif ocr_mode == "single" or (ocr_mode == "auto" and detected_type == "single"):
-            print("Detected single line text - applying text optimization")
+            count("preprocess.single")
             return self._enhance_single_line(image)
         
         # If no specialized handling or user explicitly chose processing type, 
@@ -629,7 +700,7 @@ class OCRApp:
                     processed_img = Image.fromarray(img_np)
                     
         except Exception as e:
-            print(f"Advanced preprocessing error: {str(e)}")
+            log.warning("Advanced preprocessing error: %s", e)
             # Fall back to PIL-based processing if numpy/OpenCV fails
             
             if preproc_type == "contrast":
@@ -662,6 +733,7 @@ class OCRApp:
         
         return processed_img
     
+    @traced("features:detect-type")
     def _detect_image_type(self, image):
         """Auto-detect the type of image for optimal processing"""
         try:
@@ -763,7 +835,7 @@ class OCRApp:
                 
             # Determine the highest scoring type
             max_type = max(scores, key=scores.get)
-            print(f"Image type scores: {scores}")
+            log.debug("Image type scores: %s", scores)
             
             # If the mode is clearly determined, use it
             if scores[max_type] > 12 and scores[max_type] > max(scores.values()) - scores[max_type]:
@@ -773,9 +845,10 @@ class OCRApp:
             return "document"
             
         except Exception as e:
-            print(f"Error in image type detection: {str(e)}")
+            log.warning("Error in image type detection: %s", e)
             return "document"  # Default to document type as fallback
     
+    @traced("features:certificate-check")
     def _is_likely_certificate(self, image):
         """Detect if image is likely a certificate or formal document"""
         try:
@@ -823,9 +896,10 @@ class OCRApp:
             return False
             
         except Exception as e:
-            print(f"Certificate detection error: {str(e)}")
+            log.warning("Certificate detection error: %s", e)
             return False
     
+    @traced("preprocess:certificate")
     def _enhance_certificate(self, image):
         """Apply specialized preprocessing for certificates"""
         try:
@@ -842,34 +916,40 @@ class OCRApp:
             processed_versions = []
             
             # Version 1: Basic contrast enhancement
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            enhanced = clahe.apply(gray)
-            processed_versions.append(enhanced)
+            with span("preprocess:certificate:clahe"):
+                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+                enhanced = clahe.apply(gray)
+                processed_versions.append(enhanced)
             
             # Version 2: Strong contrast with binary threshold
-            _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            processed_versions.append(binary)
+            with span("preprocess:certificate:otsu"):
+                _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                processed_versions.append(binary)
             
             # Version 3: Adaptive threshold for variable backgrounds
-            adaptive = cv2.adaptiveThreshold(
-                enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY, 11, 2
-            )
-            processed_versions.append(adaptive)
+            with span("preprocess:certificate:adaptive"):
+                adaptive = cv2.adaptiveThreshold(
+                    enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                    cv2.THRESH_BINARY, 11, 2
+                )
+                processed_versions.append(adaptive)
             
             # Version 4: Noise reduction without affecting text
-            denoised = cv2.fastNlMeansDenoising(enhanced, None, 10, 7, 21)
-            processed_versions.append(denoised)
+            with span("preprocess:certificate:denoise"):
+                denoised = cv2.fastNlMeansDenoising(enhanced, None, 10, 7, 21)
+                processed_versions.append(denoised)
             
             # Version 5: Edge enhancement for better text definition
-            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-            sharpened = cv2.filter2D(enhanced, -1, kernel)
-            processed_versions.append(sharpened)
+            with span("preprocess:certificate:sharpen"):
+                kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+                sharpened = cv2.filter2D(enhanced, -1, kernel)
+                processed_versions.append(sharpened)
             
             # Version 6: Morphological operations to connect broken text
-            kernel = np.ones((1, 1), np.uint8)
-            morph = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
-            processed_versions.append(morph)
+            with span("preprocess:certificate:morph-close"):
+                kernel = np.ones((1, 1), np.uint8)
+                morph = cv2.morphologyEx(binary, cv2.MORPH_CLOSE, kernel)
+                processed_versions.append(morph)
             
             # Store all versions for multi-pass OCR
             self.processing_results = processed_versions
@@ -880,19 +960,19 @@ class OCRApp:
             return processed_img
             
         except Exception as e:
-            print(f"Certificate enhancement error: {str(e)}")
+            log.warning("Certificate enhancement error: %s", e)
             return image  # Return original if processing fails
             
     def _extract_certificate_text(self, image, config):
         """Specialized text extraction for certificates and formal documents"""
-        print("Using specialized certificate text extraction")
+        count("extract.certificate")
         
         try:
             # For certificates, we'll try multiple approaches and combine results
             all_results = []
             
             # 1. Standard approach with the certificate-optimized image
-            result1 = pytesseract.image_to_string(image, config=config).strip()
+            result1 = self._ocr_pass(image, config, "certificate:base")
             all_results.append(result1)
             
             # 2. Try with different processing techniques if available
@@ -904,22 +984,22 @@ class OCRApp:
                         
                         # Try different OCR configurations
                         if i == 0:  # For enhanced contrast
-                            proc_result = pytesseract.image_to_string(pil_img, config=config).strip()
+                            proc_result = self._ocr_pass(pil_img, config, f"certificate:variant{i}")
                         elif i == 1:  # For binary threshold
                             # Use a config optimized for clean binary images
                             binary_config = config.replace("--oem 1", "--oem 0")  # Legacy engine can be better for binary
-                            proc_result = pytesseract.image_to_string(pil_img, config=binary_config).strip()
+                            proc_result = self._ocr_pass(pil_img, binary_config, f"certificate:variant{i}")
                         elif i == 2:  # For adaptive threshold
                             # Try with single column assumption
                             adapt_config = config.replace("--psm 3", "--psm 4")
-                            proc_result = pytesseract.image_to_string(pil_img, config=adapt_config).strip()
+                            proc_result = self._ocr_pass(pil_img, adapt_config, f"certificate:variant{i}")
                         else:
                             # Use standard config
-                            proc_result = pytesseract.image_to_string(pil_img, config=config).strip()
+                            proc_result = self._ocr_pass(pil_img, config, f"certificate:variant{i}")
                             
                         all_results.append(proc_result)
                     except Exception as e:
-                        print(f"Error processing image version {i}: {str(e)}")
+                        log.warning("Error processing image version %d: %s", i, e)
             
             # 3. Try segmenting the image to focus on title and content separately
             try:
@@ -934,15 +1014,15 @@ class OCRApp:
                 
                 # Use single-line mode for the title (with a hint it's a title)
                 title_config = config.replace("--psm 3", "--psm 7") + " -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ "
-                title_text = pytesseract.image_to_string(top_third, config=title_config).strip()
+                title_text = self._ocr_pass(top_third, title_config, "certificate:title")
                 
                 # Use text block mode for the body
                 body_config = config.replace("--psm 3", "--psm 6")
-                body_text = pytesseract.image_to_string(middle, config=body_config).strip()
+                body_text = self._ocr_pass(middle, body_config, "certificate:body")
                 
                 # Use sparse text mode for the bottom (often signatures)
                 sig_config = config.replace("--psm 3", "--psm 11")
-                sig_text = pytesseract.image_to_string(bottom, config=sig_config).strip()
+                sig_text = self._ocr_pass(bottom, sig_config, "certificate:signature")
                 
                 # Combine the results with proper formatting
                 sectioned_text = f"{title_text}\n\n{body_text}\n\n{sig_text}"
@@ -967,12 +1047,12 @@ class OCRApp:
                     middle_enhanced = Image.fromarray(middle_adaptive)
                     
                     # OCR with optimized settings
-                    middle_enhanced_text = pytesseract.image_to_string(middle_enhanced, config=body_config).strip()
+                    middle_enhanced_text = self._ocr_pass(middle_enhanced, body_config, "certificate:body-adaptive")
                     
                     # Add to results
                     all_results.append(f"{title_text}\n\n{middle_enhanced_text}\n\n{sig_text}")
             except Exception as e:
-                print(f"Certificate segmentation error: {str(e)}")
+                log.warning("Certificate segmentation error: %s", e)
             
             # 4. Try special handling for just the certificate text (common in middle section)
             # This will catch "CERTIFICATE" text and the main content
@@ -996,12 +1076,12 @@ class OCRApp:
                 
                 # Try to find the word "CERTIFICATE" and nearby text
                 cert_config = config + " -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ "
-                cert_text = pytesseract.image_to_string(cert_img, config=cert_config).strip()
+                cert_text = self._ocr_pass(cert_img, cert_config, "certificate:headline")
                 
                 # Add to results
                 all_results.append(cert_text)
             except Exception as e:
-                print(f"Certificate text extraction error: {str(e)}")
+                log.warning("Certificate text extraction error: %s", e)
             
             # Choose the best result based on content quality
             best_result = self._select_best_certificate_result(all_results)
@@ -1012,94 +1092,15 @@ class OCRApp:
             return final_result
             
         except Exception as e:
-            print(f"Certificate OCR error: {str(e)}")
+            log.warning("Certificate OCR error: %s", e)
             # Fall back to standard OCR
-            return pytesseract.image_to_string(image, config=config).strip()
+            return self._ocr_pass(image, config, "certificate:fallback")
             
     def _post_process_certificate_text(self, text):
         """Apply specialized post-processing for certificate text"""
-        if not text:
-            return text
-            
-        # Fix common certificate words that might be misrecognized
-        certificate_corrections = {
-            'certif': 'certificate',
-            'certificat': 'certificate',
-            'certificare': 'certificate',
-            'certiticate': 'certificate',
-            'certificste': 'certificate',
-            'certlficate': 'certificate',
-            'aword': 'award',
-            'awerd': 'award',
-            'awasd': 'award',
-            'achievenent': 'achievement',
-            'achievernent': 'achievement',
-            'completion': 'completion',
-            'cornpletion': 'completion',
-            'presentet': 'presented',
-            'presentec': 'presented',
-            'recegnition': 'recognition',
-            'recogniton': 'recognition',
-            'recogn': 'recognition',
-            'perfarmance': 'performance',
-            'performonce': 'performance',
-            'excellonce': 'excellence',
-            'excellance': 'excellence',
-            'euthorized': 'authorized',
-            'authorlzed': 'authorized',
-            'authorised': 'authorized',
-            'slgnature': 'signature',
-            'signafure': 'signature',
-            'signatore': 'signature',
-            'signoture': 'signature',
-            'direcfor': 'director',
-            'directar': 'director',
-            'presidont': 'president',
-            'presidont': 'president',
-            'chaiperson': 'chairperson',
-            'chairparson': 'chairperson',
-            'chairnran': 'chairman',
-            'chairwan': 'chairman',
-            'opproval': 'approval',
-            'appraval': 'approval',
-            'approvel': 'approval'
-        }
-        
-        # Apply corrections
-        words = text.split()
-        corrected_words = []
-        
-        for word in words:
-            word_lower = word.lower()
-            if word_lower in certificate_corrections:
-                # Preserve capitalization
-                if word.isupper():
-                    corrected_words.append(certificate_corrections[word_lower].upper())
-                elif word[0].isupper():
-                    corrected_words.append(certificate_corrections[word_lower].capitalize())
-                else:
-                    corrected_words.append(certificate_corrections[word_lower])
-            else:
-                corrected_words.append(word)
-        
-        corrected_text = ' '.join(corrected_words)
-        
-        # Fix common format issues in certificates
-        
-        # Ensure certificate headings are uppercase and on their own line
-        for heading in ['CERTIFICATE', 'AWARD', 'RECOGNITION', 'ACHIEVEMENT']:
-            pattern = r'([^\n]*)(' + heading + r')([^\n]*)'
-            corrected_text = re.sub(pattern, r'\1\n' + heading + r'\n\3', corrected_text, flags=re.IGNORECASE)
-        
-        # Ensure "presented to" and "awarded to" are on their own line
-        for phrase in ['presented to', 'awarded to', 'given to', 'granted to']:
-            pattern = r'([^\n]*)(' + phrase + r')([^\n]*)'
-            corrected_text = re.sub(pattern, r'\1\n\2\n\3', corrected_text, flags=re.IGNORECASE)
-        
-        # Remove excessive newlines
-        corrected_text = re.sub(r'\n{3,}', '\n\n', corrected_text)
-        
-        return corrected_text.strip()
+        return self._cleaned(post_process_certificate_text(
+            text, lexicon=spelling_lexicon(CERTIFICATE_DOMAINS), confusions=confusion_table(),
+            uncertain=self._uncertain_words(text), language_model=language_model()))
     
     def scan_image(self):
         if not self.current_image_path:
@@ -1118,15 +1119,6 @@ class OCRApp:
                 self.status_var.set("OCR aborted - Tesseract not configured")
                 return
         
-        if self.current_image is None:
-            # If for some reason the image wasn't loaded properly, try to reload it
-            try:
-                self.current_image = Image.open(self.current_image_path)
-            except Exception as e:
-                messagebox.showerror("Error", f"Could not load image for processing: {str(e)}")
-                self.status_var.set("Error loading image")
-                return
-        
         # Show processing indicator on the image
         self.show_processing_indicator()
         
@@ -1148,6 +1140,7 @@ class OCRApp:
         
         # Show status in preview area
         self.preview_status.config(text="Image processing in progress...")
+        self.progress_status_text = "Image processing in progress..."
         
         # Start hashtag animation
         self.pulsating = True
@@ -1161,7 +1154,7 @@ class OCRApp:
         self.status_var.set("OCR processing in progress...")
         
         # Clear text box but don't show animation in it
-        self.text_box.delete(1.0, tk.END)
+        self._clear_text_box()
         
         # Ensure text frame maintains its size
         self.text_frame.config(height=150)
@@ -1172,8 +1165,9 @@ class OCRApp:
     
     def hide_processing_indicator(self):
         """Hide the processing indicator"""
-        # Stop animation
+        # Stop animation and progress estimation
         self.pulsating = False
+        self.progress_estimator = None
         
         # Hide the indicators - with error handling
         try:
@@ -1302,7 +1296,7 @@ class OCRApp:
                 new_width = int(w * scale_factor)
                 new_height = int(h * scale_factor)
                 img_cv = cv2.resize(img_cv, (new_width, new_height), interpolation=cv2.INTER_AREA)
-                print(f"Downscaled image from {w}x{h} to {new_width}x{new_height} for faster processing")
+                log.debug("Downscaled image from %dx%d to %dx%d for faster processing", w, h, new_width, new_height)
             
             # Convert to grayscale if not already
             if len(img_cv.shape) == 3:
@@ -1311,7 +1305,7 @@ class OCRApp:
                 gray = img_cv
             
             # Update progress
-            self._update_progress(10, "Initial image processing...")
+            self._set_status("Initial image processing...")
             
             # Create a multi-approach results array to try different methods
             processed_images = []
@@ -1319,7 +1313,7 @@ class OCRApp:
             # For each mode, apply specialized processing
             if ocr_mode == "screenshot":
                 # Approach 1: Optimize for clean digital text
-                self._update_progress(20, "Optimizing screenshot...")
+                self._set_status("Optimizing screenshot...")
                 
                 # Apply CLAHE for better contrast
                 clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
@@ -1337,7 +1331,7 @@ class OCRApp:
                 
             elif ocr_mode == "document":
                 # Approach 1: Optimize for document scans
-                self._update_progress(20, "Optimizing document scan...")
+                self._set_status("Optimizing document scan...")
                 
                 # Apply CLAHE for better contrast
                 clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
@@ -1367,7 +1361,7 @@ class OCRApp:
                 
             elif ocr_mode == "single":
                 # Optimize for single line text
-                self._update_progress(20, "Optimizing button/text...")
+                self._set_status("Optimizing button/text...")
                 
                 # Approach 1: Scale up small images for better detail
                 if min(gray.shape) < 100:
@@ -1396,7 +1390,7 @@ class OCRApp:
                 
             else:  # Auto detect or fallback
                 # Apply multiple techniques for auto mode
-                self._update_progress(20, "Applying multiple enhancement techniques...")
+                self._set_status("Applying multiple enhancement techniques...")
                 
                 # Approach 1: Adaptive threshold
                 result1 = cv2.adaptiveThreshold(
@@ -1423,7 +1417,7 @@ class OCRApp:
             self.multi_processing_available = True
             
             # Update progress
-            self._update_progress(80, "Finalizing enhanced image...")
+            self._set_status("Finalizing enhanced image...")
             
             # Choose the first result as the default
             result = processed_images[0] if processed_images else gray
@@ -1432,118 +1426,65 @@ class OCRApp:
             enhanced_img = Image.fromarray(result)
             
             # Update progress
-            self._update_progress(90, "Image enhancement complete")
+            self._set_status("Image enhancement complete")
             
-            self.status_var.set("AI enhancement applied")
+            self._set_status("AI enhancement applied")
             return enhanced_img
             
         except Exception as e:
-            print(f"AI enhancement error: {str(e)}")
-            self.status_var.set("AI enhancement failed, using original image")
+            log.warning("AI enhancement error: %s", e)
+            self._set_status("AI enhancement failed, using original image")
             return image
     
     def _process_ocr(self):
         """Process OCR in a separate thread with progress indication"""
         try:
-            # Don't use separate toplevel progress dialog - use in-frame progress instead
-            self.status_var.set("Processing image...")
-            
-            # Show processing indicator directly in the main window
-            self.show_processing_indicator()
+            # The processing indicator was already shown by scan_image on the main thread;
+            # from here on the UI is only updated through the progress bus
+            self._set_status("Processing image...")
+            
+            # Huge uncompressed scans are read strip by strip from a memory map
+            large_source = open_strips(self.current_image_path)
+            if large_source is not None:
+                self._process_large_image(large_source)
+                return
             
-            # Make sure UI is updated
-            self.root.update()
+            # Multi-page TIFF/PDF files are streamed page by page
+            if streams_pages(self.current_image_path):
+                self._process_pages()
+                return
             
             start_time = time.time()
             
-            # Apply preprocessing to a copy of the image
-            self._update_progress(5, "Preparing image...")
-            processed_image = self.preprocess_image(self.current_image.copy())
-            
-            # Debug info
-            print(f"Processing image: {self.current_image_path}")
-            print(f"Image format: {processed_image.format}")
-            print(f"Image size: {processed_image.size}")
-            print(f"Image mode: {processed_image.mode}")
-            print(f"AI enhancement: {'Yes' if self.ai_var.get() else 'No'}")
-            print(f"Preprocessing: {self.preproc_var.get()}")
-            print(f"OCR Mode: {self.mode_var.get()}")
-            
-            # Force conversion to RGB if needed
-            if processed_image.mode not in ['RGB', 'L']:
-                processed_image = processed_image.convert('RGB')
-            
-            # Optimize processing for large images
-            w, h = processed_image.size
-            if w * h > 1000000:  # For images larger than 1 megapixel
-                # Resize for faster OCR processing
-                scale_factor = min(1.0, 1000000 / (w * h))
-                new_w = int(w * scale_factor)
-                new_h = int(h * scale_factor)
-                processed_image = processed_image.resize((new_w, new_h), Image.LANCZOS)
-                print(f"Resized image for OCR: {w}x{h} -> {new_w}x{new_h}")
-            
-            # Get OCR configuration based on mode
-            config = self._get_ocr_config()
-            print(f"Using OCR config: {config}")
-            
-            # Update progress
-            self._update_progress(95, "Extracting text...")
-            
-            # Use optimized OCR approach based on image type
-            text = self._fast_ocr(processed_image, config)
-            
-            # Post-process text to clean up gibberish
-            text = self._clean_text(text)
-            
-            # If the result is just dashes or placeholders, try with a different approach
-            if not text or re.match(r'^[-_=.…]+$', text.strip()):
-                print("Initial OCR result appears to be just dashes or placeholders, trying again with different settings")
-                # Try with a different OCR engine mode
-                alt_config = f"--psm 6 --oem 3 -l {self.lang_var.get()}"
-                print(f"Using alternate OCR config: {alt_config}")
-                text = pytesseract.image_to_string(processed_image, config=alt_config).strip()
-                text = self._clean_text(text)
-                
-                # If still no good results, try one more time with another approach
-                if not text or re.match(r'^[-_=.…]+$', text.strip()):
-                    # Try with the original image without preprocessing
-                    print("Still no good results, trying with original image")
-                    orig_img = self.current_image.copy()
-                    if orig_img.mode not in ['RGB', 'L']:
-                        orig_img = orig_img.convert('RGB')
-                    text = pytesseract.image_to_string(orig_img, config="--psm 3 --oem 3 -l eng").strip()
-                    text = self._clean_text(text)
+            # Run the full preprocessing + OCR pipeline
+            with span("job", path=self.current_image_path):
+                result, processed_image = self._run_ocr_pipeline(self._working_image().copy())
+            result.path = self.current_image_path
+            text = result.text
             
             # Measure and log processing time
             end_time = time.time()
             processing_time = end_time - start_time
-            print(f"OCR processing time: {processing_time:.2f} seconds")
-            
-            print(f"Extracted text length: {len(text)}")
-            print(f"First 100 chars: {text[:100]}")
+            log.info("OCR processing time: %.2f seconds", processing_time)
+            log.info("Stage timings: %s", lazy(_format_stages, result))
             
-            # Save the processed image for debugging if needed
-            debug_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug")
-            os.makedirs(debug_dir, exist_ok=True)
-            debug_path = os.path.join(debug_dir, "last_processed.png")
-            processed_image.save(debug_path)
-            print(f"Saved debug image to: {debug_path}")
+            log.info("Extracted text length: %d", len(text))
+            log.log(TRACE, "Extracted text: %s", text)
             
             # Update progress
-            self._update_progress(100, "Completed!")
+            self._set_status("Completed!")
+            
+            # Keep the result (text plus timings) for callers on the main thread
+            self.progress_bus.call(lambda: setattr(self, 'last_result', result))
             
             # Hide the processing indicator
-            self.root.after(0, self.hide_processing_indicator)
+            self.progress_bus.call(self.hide_processing_indicator)
             
             # Display the extracted text in the main thread
-            self.root.after(0, lambda: self._update_text_box(text))
-            
-            # Enable the view processed image button
-            self.root.after(0, lambda: self.view_processed_btn.config(state=tk.NORMAL))
+            self.progress_bus.call(lambda: self._update_text_box(text))
             
         except Exception as e:
-            print(f"OCR Error: {str(e)}")
+            log.error("OCR error: %s", e)
             error_message = str(e)  # Store error message in a local variable
             
             # Special handling for tessdata errors
@@ -1552,15 +1493,343 @@ class OCRApp:
             
             # Hide the processing indicator safely
             try:
-                self.root.after(0, self.hide_processing_indicator)
+                self.progress_bus.call(self.hide_processing_indicator)
             except Exception as dialog_error:
-                print(f"Error hiding processing indicator: {str(dialog_error)}")
+                log.warning("Error hiding processing indicator: %s", dialog_error)
                 
             # Show error in the main thread using a local variable that won't be lost in the lambda
             try:
-                self.root.after(0, lambda msg=error_message: self._show_error(msg))
+                self.progress_bus.call(lambda msg=error_message: self._show_error(msg))
             except Exception as ui_error:
-                print(f"Error showing error message: {str(ui_error)}")
+                log.warning("Error showing error message: %s", ui_error)
+    
+    def _process_large_image(self, source):
+        """OCR a huge image strip by strip and show the result (worker thread)"""
+        result = self._recognize_large_image(source)
+        text = result.text
+        log.info("Stage timings: %s", lazy(_format_stages, result))
+        self._set_status("Completed!")
+        self.progress_bus.call(lambda: setattr(self, 'last_result', result))
+        self.progress_bus.call(self.hide_processing_indicator)
+        self.progress_bus.call(lambda: self._update_text_box(text))
+    
+    def _process_pages(self):
+        """OCR every page of a multi-page file, showing each page as soon as it is done"""
+        # Imported here because the engine module itself imports this one
+        from ocr_engine import OCREngine
+        
+        path = self.current_image_path
+        total = page_count(path)
+        options = {
+            "mode": self.mode_var.get(),
+            "preprocessing": self.preproc_var.get(),
+            "ai_enhancement": self.ai_var.get(),
+            "lang": self.lang_var.get(),
+            "check_tesseract": False,
+        }
+        
+        # One engine preprocesses page N+1 while the other recognizes page N
+        prepare_engine = OCREngine(**options)
+        recognize_engine = OCREngine(**options)
+        prepare_engine.debug_sink = recognize_engine.debug_sink = self.debug_sink
+        
+        self.progress_bus.call(self._start_page_output)
+        results = []
+        for done, page in enumerate(process_pages(path, prepare_engine, recognize_engine), start=1):
+            if page.error:
+                log.error("OCR error on page %d: %s", page.page, page.error)
+                text = f"[Page {page.page} could not be processed: {page.error}]"
+            else:
+                results.append(page.result)
+                text = page.result.text
+            self._update_progress(100 * done / max(1, total), f"Page {done} of {total} done")
+            self.progress_bus.call(lambda number=page.page, t=text: self._append_page_text(number, t))
+        
+        combined = OCRResult.from_pages(results, path=path)
+        self.progress_bus.call(lambda: setattr(self, 'last_result', combined))
+        self.progress_bus.call(self.hide_processing_indicator)
+        self.progress_bus.call(lambda: self._finish_page_output(total))
+    
+    def _start_page_output(self):
+        """Clear the text box before pages start arriving (called in main thread)"""
+        self._clear_text_box()
+        self.extracted_text = ""
+        self._page_texts = []
+    
+    def _append_page_text(self, number, text):
+        """Append one page of extracted text (called in main thread)"""
+        page_text = f"--- Page {number} ---\n{text}\n\n"
+        self._insert_text_chunks(page_text)
+        # Joined once at the end rather than re-copying everything for every page
+        self._page_texts.append(page_text)
+    
+    def _finish_page_output(self, total):
+        """Report completion of a multi-page scan (called in main thread)"""
+        self.extracted_text = "".join(self._page_texts)
+        self._page_texts = []
+        self.status_var.set(f"OCR completed: {total} pages")
+        self.text_box.see("1.0")
+    
+    def _reset_job_state(self):
+        """Forget per-image state left over from a previous scan"""
+        for attr in JOB_STATE_ATTRS:
+            if hasattr(self, attr):
+                delattr(self, attr)
+    
+    def _run_ocr_pipeline(self, image, timer=None):
+        """Preprocess an image and extract its text, returning (OCRResult, processed_image)"""
+        prepared = self._prepare_image(image, timer=timer)
+        return self._recognize(prepared), prepared.processed
+    
+    def _working_image(self):
+        """The current file decoded for OCR, at reduced resolution where that loses nothing"""
+        if self.current_image is None:
+            # Single-page scans are OCR'd from their first page
+            if is_multipage(self.current_image_path):
+                self.current_image = first_page(self.current_image_path)
+            else:
+                self.current_image = open_image(self.current_image_path, min_pixels=OCR_MAX_PIXELS)
+        return self.current_image
+    
+    def _full_resolution_image(self, prepared):
+        """A copy of the original image at full resolution, decoding the file again if it was reduced"""
+        image = prepared.original
+        if prepared.path and full_size(image) != image.size:
+            log.debug("Decoding full resolution image: %s -> %s", image.size, full_size(image))
+            return open_image(prepared.path)
+        return image.copy()
+    
+    def _prepare_image(self, image, timer=None):
+        """Detect the image type and preprocess it, capturing everything recognition needs"""
+        self._reset_job_state()
+        
+        # Time every stage and pass; callers may have started the timer already (e.g. for decoding)
+        self.stage_timer = timer or StageTimer()
+        timing_store = get_timing_store()
+        if getattr(self, 'debug_sink', None) is not None:
+            self.debug_job = self.debug_sink.new_job(self.current_image_path)
+        # Results and word boxes use the size of the file, even when it was decoded reduced
+        image_size = full_size(image)
+        size_bucket = megapixel_bucket(*image.size)
+        mode = self.mode_var.get()
+        self.progress_bus.estimate(timing_store.expected(mode, size_bucket))
+        
+        # Apply preprocessing to a copy of the image
+        self._begin_stage("preprocess")
+        self._set_status("Preparing image...")
+        processed_image = self.preprocess_image(image)
+        
+        # Once the image type is known, switch to that mode's measured timings
+        if mode == "auto" and hasattr(self, 'detected_type'):
+            mode = self.detected_type
+            self.progress_bus.estimate(timing_store.expected(mode, size_bucket))
+        
+        # Debug info
+        log.debug("Processing image %s: format %s, size %s, mode %s, AI enhancement %s, preprocessing %s, OCR mode %s",
+                  self.current_image_path, processed_image.format, processed_image.size, processed_image.mode,
+                  self.ai_var.get(), self.preproc_var.get(), self.mode_var.get())
+        
+        # Force conversion to RGB if needed
+        if processed_image.mode not in ['RGB', 'L']:
+            processed_image = processed_image.convert('RGB')
+        
+        # Optimize processing for large images
+        w, h = processed_image.size
+        if w * h > OCR_MAX_PIXELS:  # For images larger than 1 megapixel
+            # Resize for faster OCR processing
+            scale_factor = min(1.0, OCR_MAX_PIXELS / (w * h))
+            new_w = int(w * scale_factor)
+            new_h = int(h * scale_factor)
+            processed_image = processed_image.resize((new_w, new_h), Image.LANCZOS)
+            log.debug("Resized image for OCR: %dx%d -> %dx%d", w, h, new_w, new_h)
+        
+        self._capture_debug("processed", processed_image, on_written=self._processed_image_written)
+        
+        return PreparedImage(
+            original=self.current_image,
+            processed=processed_image,
+            path=self.current_image_path,
+            mode=mode,
+            size_bucket=size_bucket,
+            image_size=image_size,
+            state={attr: getattr(self, attr) for attr in JOB_STATE_ATTRS if hasattr(self, attr)},
+        )
+    
+    def _recognize(self, prepared):
+        """Run the OCR passes and text cleanup on a PreparedImage, returning an OCRResult"""
+        # Prepared images may come from another engine (e.g. a page pipeline's preprocessing thread)
+        self._reset_job_state()
+        for attr, value in prepared.state.items():
+            setattr(self, attr, value)
+        self.current_image = prepared.original
+        self.current_image_path = prepared.path
+        processed_image = prepared.processed
+        mode = prepared.mode
+        timing_store = get_timing_store()
+        
+        # Word tables and timing records of this job's passes by text; passes may run on several threads
+        self.pass_words = {}
+        self.pass_records = {}
+        # Extractor outputs that were already cleaned, which _clean_text leaves alone
+        self.cleaned_texts = set()
+        
+        # Get OCR configuration based on mode
+        config = self._get_ocr_config()
+        log.debug("Using OCR config: %s", config)
+        
+        # Update progress
+        self._begin_stage("ocr")
+        self._set_status("Extracting text...")
+        
+        # Use optimized OCR approach based on image type
+        text = self._fast_ocr(processed_image, config)
+        words = self._words_for(text, prepared)
+        
+        # Post-process text to clean up gibberish
+        self._begin_stage("clean")
+        text = self._clean_text(text)
+        
+        # If the result is just dashes or placeholders, try with a different approach
+        if not text or is_placeholder(text):
+            count("retry.psm6")
+            log.info("Initial OCR result appears to be just dashes or placeholders, trying again with different settings")
+            # Try with a different OCR engine mode
+            alt_config = f"--psm 6 --oem 3 -l {self.lang_var.get()}"
+            log.debug("Using alternate OCR config: %s", alt_config)
+            text = self._ocr_pass(processed_image, alt_config, "retry:psm6")
+            words = self._words_for(text, prepared)
+            text = self._clean_text(text)
+            
+            # If still no good results, try one more time with another approach
+            if not text or is_placeholder(text):
+                # Try with the original image without preprocessing
+                count("retry.original")
+                log.info("Still no good results, trying with original image")
+                orig_img = self._full_resolution_image(prepared)
+                if orig_img.mode not in ['RGB', 'L']:
+                    orig_img = orig_img.convert('RGB')
+                text = self._ocr_pass(orig_img, "--psm 3 --oem 3 -l eng", "retry:original")
+                words = self._words_for(text, prepared)
+                text = self._clean_text(text)
+        
+        self._begin_stage("done")
+        
+        # Fold this job into the rolling averages that drive future progress estimates
+        timings = self.stage_timer.as_dict()
+        timing_store.update(mode, prepared.size_bucket, timings)
+        timing_store.maybe_save()
+        pass_stats = get_pass_stats()
+        pass_stats.update(timings["passes"])
+        pass_stats.maybe_save()
+        
+        return OCRResult(text, mode=mode, image_size=prepared.image_size, timings=timings,
+                         path=prepared.path, words=words)
+    
+    def _recognize_large_image(self, source, timer=None):
+        """
+        OCR a huge image from its memory-mapped rows (see ocr_strips), one tile
+        at a time, so memory use doesn't grow with the image. Debug images are
+        not captured: the queued tiles would hold that memory anyway.
+        """
+        self._reset_job_state()
+        self.stage_timer = timer or StageTimer()
+        self.current_image = None
+        self.current_image_path = source.path
+        self.pass_words = {}
+        mode = self.mode_var.get()
+        width, height = source.size
+        count("extract.large")
+        log.info("Large image (%dx%d): OCR strip by strip", width, height)
+        
+        config = self._get_ocr_config()
+        log.debug("Using OCR config: %s", config)
+        
+        self._begin_stage("ocr")
+        tables = []
+        tops = []
+        for top, rows in iter_tiles(source):
+            self._update_progress(100 * top / height, f"Extracting text (row {top} of {height})...")
+            text = self._ocr_pass(Image.fromarray(rows), config, "large:tile")
+            tables.append(self.pass_words.pop(text))
+            tops.append(top)
+        words = WordTable.stack(tables, tops, source.size)
+        
+        self._begin_stage("clean")
+        text = self._clean_text(words.text)
+        self._begin_stage("done")
+        
+        # Large images get their own size bucket, so they don't skew the estimates of ordinary scans
+        timings = self.stage_timer.as_dict()
+        timing_store = get_timing_store()
+        timing_store.update(mode, megapixel_bucket(width, height), timings)
+        timing_store.maybe_save()
+        
+        return OCRResult(text, mode=mode, image_size=source.size, timings=timings,
+                         path=source.path, words=words)
+    
+    def _capture_debug(self, label, image, on_written=None):
+        """Queue an image of the running job for the debug sink, if debug artifacts are on"""
+        sink = getattr(self, 'debug_sink', None)
+        job = getattr(self, 'debug_job', None)
+        if sink is not None and job is not None:
+            sink.capture(job, label, image, on_written=on_written)
+    
+    def _processed_image_written(self, path):
+        """Make a saved processed image viewable (called on the debug writer thread)"""
+        # Render its thumbnail now so "View Processed Image" opens at once
+        self.thumbnails.request("processed", path, PROCESSED_VIEW_SIZE)
+        self.progress_bus.call(lambda: setattr(self, 'last_processed_path', path))
+        self.progress_bus.call(lambda: self.view_processed_btn.config(state=tk.NORMAL))
+    
+    def _ocr_pass(self, image, config, label):
+        """
+        Run one tesseract pass and record how long it took.
+        
+        The pass reads word boxes and confidences along with the text, and keeps
+        them by text so the winning pass's WordTable can go into the OCRResult
+        without running tesseract again.
+        
+        Passes auto-prune has dropped return no text without running (see ocr_passes).
+        """
+        if label in getattr(self, 'skipped_passes', ()):
+            return ""
+        self._capture_debug(label, image)
+        started = time.perf_counter()
+        text = None
+        try:
+            with span("tesseract", label=label, config=config, size=list(image.size)) as traced_pass:
+                data = pytesseract.image_to_data(image, config=config, output_type=pytesseract.Output.DICT)
+                words = WordTable.from_tesseract(data, image_size=image.size)
+                traced_pass.set(words=len(words))
+            pass_words = getattr(self, 'pass_words', None)
+            if pass_words is not None:
+                pass_words[words.text] = words
+            text = words.text
+            return text
+        finally:
+            timer = getattr(self, 'stage_timer', None)
+            if timer is not None:
+                record = timer.record_pass(label, time.perf_counter() - started)
+                pass_records = getattr(self, 'pass_records', None)
+                if pass_records is not None and text is not None:
+                    # Selections see some texts stripped, so records are found by stripped text
+                    pass_records.setdefault(text.strip(), []).append(record)
+                    if getattr(self, 'keep_pass_text', False):
+                        record["text"] = text
+    
+    def _words_for(self, text, prepared):
+        """
+        WordTable of the pass (or consensus) that produced text, in original
+        image coordinates, or None. Extractors return their selection cleaned,
+        so text not read by a pass gets the table of the text selected last.
+        """
+        pass_words = getattr(self, 'pass_words', {})
+        words = pass_words.get(text)
+        if words is None:
+            words = pass_words.get(getattr(self, 'selected_text', None))
+        if words is not None and prepared.image_size:
+            words = words.scaled(prepared.image_size)
+        return words
     
     def _fast_ocr(self, image, config):
         """Optimized OCR process for extremely accurate text extraction"""
@@ -1594,14 +1863,14 @@ class OCRApp:
             # For smaller images, use multiple OCR approaches
             if w * h < 500000:
                 # First pass - standard OCR with selected config
-                result1 = pytesseract.image_to_string(image, config=config).strip()
+                result1 = self._ocr_pass(image, config, "auto:base")
                 all_results.append(result1)
                 
                 # Second pass - try with different PSM mode
                 alt_config = config.replace("--psm 3", "--psm 6").replace("--psm 7", "--psm 6")
                 if alt_config == config:  # If no replacement was made
                     alt_config = config.replace("--psm 6", "--psm 3")
-                result2 = pytesseract.image_to_string(image, config=alt_config).strip()
+                result2 = self._ocr_pass(image, alt_config, "auto:alt-psm")
                 all_results.append(result2)
                 
                 # Third pass - try with enhanced image
@@ -1623,19 +1892,19 @@ class OCRApp:
                     enhanced_img = Image.fromarray(img_thresh)
                     
                     # Run OCR on enhanced image
-                    result3 = pytesseract.image_to_string(enhanced_img, config=config).strip()
+                    result3 = self._ocr_pass(enhanced_img, config, "auto:adaptive")
                     all_results.append(result3)
                 except Exception as e:
-                    print(f"Enhancement error in multi-pass OCR: {str(e)}")
+                    log.warning("Enhancement error in multi-pass OCR: %s", e)
                     # Skip this result
                 
                 # Choose the best result based on length and quality
                 result = self._select_best_ocr_result(all_results)
-                print(f"Selected best result from {len(all_results)} OCR passes")
+                log.debug("Selected best result from %d OCR passes", len(all_results))
                 return result
             
             # For larger images, split into regions and process in parallel with multiple approaches
-            print("Using parallel multi-pass OCR processing for large image")
+            count("extract.regions")
             
             # Determine number of regions (vertical splits)
             num_regions = min(4, max(2, h // 500))  # Max 4 regions, min 2 if large
@@ -1657,13 +1926,13 @@ class OCRApp:
                 # For each region, submit multiple OCR tasks
                 for region in regions:
                     # Submit standard OCR
-                    future1 = executor.submit(pytesseract.image_to_string, region, config=config)
+                    future1 = executor.submit(self._ocr_pass, region, config, "auto:region")
                     
                     # Submit with alternate config
                     alt_config = config.replace("--psm 3", "--psm 6").replace("--psm 7", "--psm 6")
                     if alt_config == config:  # If no replacement was made
                         alt_config = config.replace("--psm 6", "--psm 3")
-                    future2 = executor.submit(pytesseract.image_to_string, region, config=alt_config)
+                    future2 = executor.submit(self._ocr_pass, region, alt_config, "auto:region-alt-psm")
                     
                     # Add to results
                     region_results.append((future1, future2))
@@ -1677,7 +1946,7 @@ class OCRApp:
                             text = future.result().strip()
                             region_texts.append(text)
                         except Exception as e:
-                            print(f"Error in region OCR: {str(e)}")
+                            log.warning("Error in region OCR: %s", e)
                     
                     # Choose best result for this region
                     if region_texts:
@@ -1686,24 +1955,24 @@ class OCRApp:
             
             # Combine region results
             combined_text = "\n".join(combined_results)
-            print(f"Combined multi-pass OCR result: '{combined_text}'")
+            log.debug("Combined multi-pass OCR result: %d characters", len(combined_text))
             return combined_text
             
         except Exception as e:
-            print(f"Fast OCR error: {str(e)}")
+            log.warning("Fast OCR error: %s", e)
             # Fall back to standard OCR
-            return pytesseract.image_to_string(image, config=config).strip()
+            return self._ocr_pass(image, config, "auto:fallback")
     
     def _extract_document_text(self, image, config):
         """Specialized text extraction for document images"""
-        print("Using specialized document text extraction")
+        count("extract.document")
         
         try:
             # For documents, we'll try multiple approaches and combine results
             all_results = []
             
             # 1. Standard approach with optimized image
-            result1 = pytesseract.image_to_string(image, config=config).strip()
+            result1 = self._ocr_pass(image, config, "document:base")
             all_results.append(result1)
             
             # 2. Try with different processing techniques if available
@@ -1716,21 +1985,21 @@ class OCRApp:
                         # Try different OCR configurations based on processing type
                         if i == 0:  # Enhanced contrast
                             doc_config = config.replace("--psm 3", "--psm 4")  # Single column assumption
-                            proc_result = pytesseract.image_to_string(pil_img, config=doc_config).strip()
+                            proc_result = self._ocr_pass(pil_img, doc_config, f"document:variant{i}")
                         elif i == 1:  # Adaptive threshold
                             # Default config usually works well for adaptive
-                            proc_result = pytesseract.image_to_string(pil_img, config=config).strip()
+                            proc_result = self._ocr_pass(pil_img, config, f"document:variant{i}")
                         elif i == 3:  # Otsu threshold
                             # Legacy engine can work better for clean binary
                             binary_config = config.replace("--oem 1", "--oem 0")
-                            proc_result = pytesseract.image_to_string(pil_img, config=binary_config).strip()
+                            proc_result = self._ocr_pass(pil_img, binary_config, f"document:variant{i}")
                         else:
                             # Use standard config
-                            proc_result = pytesseract.image_to_string(pil_img, config=config).strip()
+                            proc_result = self._ocr_pass(pil_img, config, f"document:variant{i}")
                             
                         all_results.append(proc_result)
                     except Exception as e:
-                        print(f"Error processing document image version {i}: {str(e)}")
+                        log.warning("Error processing document image version %d: %s", i, e)
             
             # 3. Try multi-column detection for complex layouts
             try:
@@ -1757,7 +2026,8 @@ class OCRApp:
                 # If we found potential column boundaries and there's more than 2
                 # (indicating at least one column), process columns separately
                 if len(col_boundaries) >= 4 and gray.shape[1] > 600:
-                    print(f"Detected possible multi-column layout with {len(col_boundaries)} boundaries")
+                    count("layout.multi_column")
+                    log.debug("Detected possible multi-column layout with %d boundaries", len(col_boundaries))
                     
                     # Group boundaries into column regions
                     col_regions = []
@@ -1775,7 +2045,7 @@ class OCRApp:
                         
                         # Process with document-specific settings
                         column_config = config.replace("--psm 3", "--psm 4")  # Single column mode
-                        column_text = pytesseract.image_to_string(column_img, config=column_config).strip()
+                        column_text = self._ocr_pass(column_img, column_config, "document:column")
                         column_texts.append(column_text)
                     
                     # Combine column results
@@ -1783,7 +2053,7 @@ class OCRApp:
                         column_result = "\n\n".join(column_texts)
                         all_results.append(column_result)
             except Exception as e:
-                print(f"Multi-column detection error: {str(e)}")
+                log.warning("Multi-column detection error: %s", e)
             
             # Choose the best result
             best_result = self._select_best_document_result(all_results)
@@ -1794,20 +2064,20 @@ class OCRApp:
             return final_result
             
         except Exception as e:
-            print(f"Document OCR error: {str(e)}")
+            log.warning("Document OCR error: %s", e)
             # Fall back to standard OCR
-            return pytesseract.image_to_string(image, config=config).strip()
+            return self._ocr_pass(image, config, "document:fallback")
     
     def _extract_screenshot_text(self, image, config):
         """Specialized text extraction for screenshot images"""
-        print("Using specialized screenshot text extraction")
+        count("extract.screenshot")
         
         try:
             # For screenshots, we'll try multiple approaches optimized for UI text
             all_results = []
             
             # 1. Standard approach with the optimized image
-            result1 = pytesseract.image_to_string(image, config=config).strip()
+            result1 = self._ocr_pass(image, config, "screenshot:base")
             all_results.append(result1)
             
             # 2. Try with different processing techniques if available
@@ -1819,15 +2089,15 @@ class OCRApp:
                         
                         # For screenshots, we want to keep layout, so use sparse text mode
                         sparse_config = config.replace("--psm 3", "--psm 11")
-                        proc_result = pytesseract.image_to_string(pil_img, config=sparse_config).strip()
+                        proc_result = self._ocr_pass(pil_img, sparse_config, f"screenshot:variant{i}-sparse")
                         all_results.append(proc_result)
                         
                         # Also try with block mode for UI elements
                         block_config = config.replace("--psm 3", "--psm 6")
-                        block_result = pytesseract.image_to_string(pil_img, config=block_config).strip()
+                        block_result = self._ocr_pass(pil_img, block_config, f"screenshot:variant{i}-block")
                         all_results.append(block_result)
                     except Exception as e:
-                        print(f"Error processing screenshot version {i}: {str(e)}")
+                        log.warning("Error processing screenshot version %d: %s", i, e)
             
             # 3. Try to detect and process UI elements separately
             try:
@@ -1877,7 +2147,7 @@ class OCRApp:
                         else:
                             region_config = config.replace("--psm 3", "--psm 6")
                             
-                        region_text = pytesseract.image_to_string(region_img, config=region_config).strip()
+                        region_text = self._ocr_pass(region_img, region_config, "screenshot:ui-region")
                         
                         if region_text:
                             ui_texts.append(region_text)
@@ -1887,7 +2157,7 @@ class OCRApp:
                         ui_result = "\n".join(ui_texts)
                         all_results.append(ui_result)
             except Exception as e:
-                print(f"UI element detection error: {str(e)}")
+                log.warning("UI element detection error: %s", e)
             
             # Choose the best result
             best_result = self._select_best_screenshot_result(all_results)
@@ -1898,13 +2168,13 @@ class OCRApp:
             return final_result
             
         except Exception as e:
-            print(f"Screenshot OCR error: {str(e)}")
+            log.warning("Screenshot OCR error: %s", e)
             # Fall back to standard OCR
-            return pytesseract.image_to_string(image, config=config).strip()
+            return self._ocr_pass(image, config, "screenshot:fallback")
     
     def _extract_single_line_text(self, image, config):
         """Specialized text extraction for single line text"""
-        print("Using specialized single line text extraction")
+        count("extract.single")
         
         try:
             # For single line text, we'll try multiple optimized approaches
@@ -1912,7 +2182,7 @@ class OCRApp:
             
             # 1. Use single line mode as default
             single_config = config.replace("--psm 3", "--psm 7")
-            result1 = pytesseract.image_to_string(image, config=single_config).strip()
+            result1 = self._ocr_pass(image, single_config, "single:base")
             all_results.append(result1)
             
             # 2. Try with different processing techniques if available
@@ -1929,10 +2199,10 @@ class OCRApp:
                         else:
                             proc_config = config.replace("--psm 3", "--psm 8")
                             
-                        proc_result = pytesseract.image_to_string(pil_img, config=proc_config).strip()
+                        proc_result = self._ocr_pass(pil_img, proc_config, f"single:variant{i}")
                         all_results.append(proc_result)
                     except Exception as e:
-                        print(f"Error processing single line version {i}: {str(e)}")
+                        log.warning("Error processing single line version %d: %s", i, e)
             
             # 3. Try with different character whitelist approaches
             # For single line text, we can try different character sets to improve accuracy
@@ -1952,15 +2222,15 @@ class OCRApp:
                 
                 # Try with alphanumeric whitelist
                 alpha_config = single_config + " -c preserve_interword_spaces=1"
-                alpha_result = pytesseract.image_to_string(binary_img, config=alpha_config).strip()
+                alpha_result = self._ocr_pass(binary_img, alpha_config, "single:binary-spaces")
                 all_results.append(alpha_result)
                 
                 # Try with simple custom config without problematic whitelist
                 full_config = single_config + " -c textord_space_size_is_variable=0"
-                full_result = pytesseract.image_to_string(binary_img, config=full_config).strip()
+                full_result = self._ocr_pass(binary_img, full_config, "single:binary-fixed")
                 all_results.append(full_result)
             except Exception as e:
-                print(f"Character whitelist error: {str(e)}")
+                log.warning("Character whitelist error: %s", e)
             
             # Choose the best result - for single line, just take the longest non-empty result
             best_result = ""
@@ -1971,6 +2241,12 @@ class OCRApp:
             # If no good result, use the first one
             if not best_result and all_results:
                 best_result = all_results[0]
+            self.selected_text = best_result
+
+            # Length is the score here, so pass statistics see the margins in characters
+            candidates = sorted((result for result in all_results if result and result.strip()), key=len, reverse=True)
+            if candidates:
+                record_outcomes(getattr(self, 'pass_records', {}), [(len(text), text) for text in candidates])
             
             # Apply single-line specific post-processing
             final_result = self._clean_text(best_result)
@@ -1978,379 +2254,103 @@ class OCRApp:
             # Remove any newlines for single line text
             final_result = final_result.replace('\n', ' ').strip()
             
-            return final_result
+            return self._cleaned(final_result)
             
         except Exception as e:
-            print(f"Single line OCR error: {str(e)}")
+            log.warning("Single line OCR error: %s", e)
             # Fall back to standard OCR with single line mode
             single_config = config.replace("--psm 3", "--psm 7")
-            return pytesseract.image_to_string(image, config=single_config).strip()
+            return self._ocr_pass(image, single_config, "single:fallback")
     
     def _select_best_certificate_result(self, results):
         """Select the best OCR result for certificates based on specialized criteria"""
+        return self._select_best_result(results, "certificate", report=True)
+    
+    def _select_best_result(self, results, mode, report=False):
+        """Select the highest-scoring of several OCR results using the mode's weights (see ocr_scoring)"""
         if not results:
             return ""
             
         if len(results) == 1:
             return results[0]
         
-        # Filter out empty results
-        non_empty = [r for r in results if r.strip()]
-        if not non_empty:
+        # Empty results are never candidates
+        with span("select", mode=mode, candidates=len(results)):
+            scores = ranked(results, mode)
+        if not scores:
             return ""
-            
-        # Calculate scores for each result with certificate-specific criteria
-        scores = []
-        for result in non_empty:
-            score = 0
-            
-            # Look for certificate-specific keywords
-            certificate_keywords = ['certificate', 'certify', 'award', 'recognition', 'presented', 
-                                   'completion', 'achievement', 'hereby', 'issued', 'granted',
-                                   'honored', 'date', 'signature', 'authorized', 'official']
-            
-            # Count matches for certificate keywords (case insensitive)
-            result_lower = result.lower()
-            keyword_count = sum(1 for keyword in certificate_keywords if keyword in result_lower)
-            score += keyword_count * 10  # High weight for certificate keywords
-            
-            # Prefer results with more lines (certificates usually have multiple sections)
-            lines = result.split('\n')
-            non_empty_lines = [line for line in lines if line.strip()]
-            score += min(len(non_empty_lines), 10) * 5
-            
-            # Prefer results with a good ratio of text to total length
-            text_ratio = sum(1 for c in result if c.isalnum()) / max(1, len(result))
-            score += text_ratio * 50
-            
-            # Check for date patterns (common in certificates)
-            date_patterns = [
-                r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}',  # MM/DD/YYYY or similar
-                r'\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{2,4}',  # DD Mon YYYY
-                r'(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{2,4}'  # Mon DD, YYYY
-            ]
-            
-            has_date = any(re.search(pattern, result, re.IGNORECASE) for pattern in date_patterns)
-            if has_date:
-                score += 30  # Bonus for having a date format
-            
-            scores.append((score, result))
-        
-        # Return the result with the highest score
-        scores.sort(reverse=True)
-        print(f"Selected best certificate result with score {scores[0][0]}")
+        record_outcomes(getattr(self, 'pass_records', {}), scores)
+        
+        if mode in CONSENSUS_MODES and len(scores) > 1:
+            # Vote word by word across the passes, best-scored first, weighted by tesseract's confidences
+            texts = [text for _, text in scores]
+            with span("select:consensus", mode=mode, candidates=len(texts)):
+                merged, origins = merge(texts, [self._pass_confidences(text) for text in texts])
+            record_votes(getattr(self, 'pass_records', {}), texts, origins)
+            self._keep_merged_words(merged, texts, origins)
+            count(f"select.{mode}.consensus")
+            self.selected_text = merged
+            return merged
+        
+        if report:
+            count(f"select.{mode}.best")
+            log.debug("Selected best %s result with score %s", mode, scores[0][0])
+        self.selected_text = scores[0][1]
         return scores[0][1]
     
+    def _keep_merged_words(self, merged, texts, origins):
+        """Keep a WordTable of a consensus text with the passes', each word boxed as in the pass it came from"""
+        pass_words = getattr(self, 'pass_words', None)
+        if pass_words is None or merged in pass_words:
+            return
+        tables = [pass_words.get(text) for text in texts]
+        sizes = [table.page_sizes[0] for table in tables if table is not None and table.page_sizes]
+        size = sizes[0] if sizes else None
+        if size:
+            tables = [table.scaled(size) if table is not None else None for table in tables]
+        sources = [(tables[text], word) if tables[text] is not None and word < len(tables[text]) else None
+                   for text, word in origins]
+        pass_words[merged] = WordTable.gather(merged, sources, size)
+    
+    def _pass_confidences(self, text):
+        """Word confidences of the pass that produced text, or None if it wasn't a single pass"""
+        words = getattr(self, 'pass_words', {}).get(text)
+        return words.columns["conf"] if words is not None else None
+
     def _select_best_ocr_result(self, results):
         """Select the best OCR result from multiple passes"""
-        if not results:
-            return ""
-            
-        if len(results) == 1:
-            return results[0]
-        
-        # Filter out empty results
-        non_empty = [r for r in results if r.strip()]
-        if not non_empty:
-            return ""
-            
-        # Calculate scores for each result
-        scores = []
-        for result in non_empty:
-            score = 0
-            
-            # Longer text usually means better recognition (unless it's just noise)
-            words = result.split()
-            score += min(len(words), 50)  # Cap at 50 words to avoid bias toward extremely long gibberish
-            
-            # More real words = better score
-            real_word_count = sum(1 for word in words if len(word) > 1 and word.isalpha())
-            score += real_word_count * 2
-            
-            # Higher ratio of alphanumeric characters is usually better
-            alphanumeric_ratio = sum(c.isalnum() or c.isspace() for c in result) / max(1, len(result))
-            score += alphanumeric_ratio * 50
-            
-            # Penalize excessive special characters
-            special_char_ratio = sum(not (c.isalnum() or c.isspace()) for c in result) / max(1, len(result))
-            score -= special_char_ratio * 30
-            
-            scores.append((score, result))
-        
-        # Return the result with the highest score
-        scores.sort(reverse=True)
-        return scores[0][1]
+        return self._select_best_result(results, "ocr")
     
+    @traced("clean")
     def _clean_text(self, text):
         """Clean up the extracted text to remove gibberish and improve accuracy"""
-        if not text:
+        if not text or text in getattr(self, 'cleaned_texts', ()):
+            # Cleaned text is no pass's output, so a second spelling correction would lack its confidences
             return text
         
-        # Debug the cleaning process
-        print(f"Cleaning text: '{text}'")
-            
-        # Replace common OCR errors with more accurate characters
-        replacements = {
-            '|': 'I',      # Pipe character often mistaken for 'I'
-            '1': 'l',      # 1 often mistaken for 'l' in some fonts
-            '[': '(',      # Common bracket mistakes
-            ']': ')',
-            '{': '(',
-            '}': ')',
-            '$': 'S',      # Dollar sign often mistaken for 'S'
-            '<': '(',      # Angle brackets confused with parentheses
-            '>': ')',
-            '`': "'",      # Backtick confused with apostrophe
-            '¢': 'c',      # Cent sign confused with 'c'
-            '©': 'c',      # Copyright symbol confused with 'c'
-            '®': 'R',      # Registered symbol confused with 'R'
-            '°': '0',      # Degree symbol confused with '0'
-            '—': '-',      # Em dash to hyphen
-            '–': '-',      # En dash to hyphen
-            '"': '"',      # Smart quotes to regular quotes
-            '"': '"',
-            "'": "'",      # Smart apostrophes to regular apostrophes
-            "'": "'",
-            '…': '...',    # Ellipsis to three periods
-            '•': '*',      # Bullet to asterisk
-            'é': 'e',      # Common accented characters
-            'è': 'e',
-            'ê': 'e',
-            'à': 'a',
-            'â': 'a',
-            'ô': 'o',
-            'ö': 'o'
-        }
+        cleaned_text = clean_text(text, lexicon=spelling_lexicon(), confusions=confusion_table(),
+                                  uncertain=self._uncertain_words(text), language_model=language_model())
         
-        for original, replacement in replacements.items():
-            text = text.replace(original, replacement)
-        
-        # Remove lines that are mostly special characters (likely gibberish)
-        cleaned_lines = []
-        for line in text.split('\n'):
-            # Skip empty lines
-            if not line.strip():
-                cleaned_lines.append('')
-                continue
-                
-            # Skip lines that are just dashes or other placeholder characters
-            if re.match(r'^[-_=.…]+$', line.strip()):
-                continue
-                
-            # Count alphanumeric characters vs special characters
-            alpha_count = sum(c.isalnum() or c.isspace() for c in line)
-            if alpha_count / len(line) >= 0.3:  # At least 30% should be alphanumeric or space
-                # Further cleanup on the line
-                line = re.sub(r'[^\w\s.,;:!?()\'"-]', '', line)  # Remove rare special chars
-                cleaned_lines.append(line)
-                
-        # Join lines back together
-        cleaned_text = '\n'.join(cleaned_lines)
-        
-        # Remove repeated whitespace
-        cleaned_text = re.sub(r'\s+', ' ', cleaned_text)
-        cleaned_text = re.sub(r'^\s+|\s+$', '', cleaned_text, flags=re.MULTILINE)
-        
-        # Remove isolated single characters that aren't words
-        # (but keep 'a', 'A', 'I' which are valid single-letter words)
-        cleaned_text = re.sub(r'\s[b-hj-zA-HJ-Z]\s', ' ', cleaned_text)
-        
-        # Fix up some common word pattern errors
-        cleaned_text = re.sub(r'([a-z])([A-Z])', r'\1 \2', cleaned_text)  # Add space between lowercase and uppercase
-        
-        # Fix common number/letter confusions
-        cleaned_text = re.sub(r'([a-zA-Z])0([a-zA-Z])', r'\1o\2', cleaned_text)  # 0 between letters is usually 'o'
-        cleaned_text = re.sub(r'([a-zA-Z])1([a-zA-Z])', r'\1l\2', cleaned_text)  # 1 between letters is usually 'l'
-        
-        # Advanced post-processing with language model principles
-        # Split into words and correct those that look like mistakes
-        words = cleaned_text.split()
-        corrected_words = []
-        
-        for word in words:
-            # Skip very short words, numbers, and words with special characters
-            if len(word) <= 2 or word.isdigit() or not word.isalpha():
-                corrected_words.append(word)
-                continue
-                
-            # Check for common OCR errors in longer words
-            # For example: "tbe" is probably "the", "bave" is probably "have"
-            common_corrections = {
-                # Common OCR errors with 'h' being read as 'b'
-                'tbe': 'the',
-                'bave': 'have',
-                'tbat': 'that',
-                'tban': 'than',
-                'witb': 'with',
-                'lf': 'If',
-                'tbis': 'this',
-                'wbat': 'what',
-                'wben': 'when',
-                'wbere': 'where',
-                'wby': 'why',
-                'bere': 'here',
-                'tbere': 'there',
-                'tbeir': 'their',
-                'tbey': 'they',
-                'tbem': 'them',
-                'tbese': 'these',
-                'tbose': 'those',
-                'bome': 'home',
-                'bouse': 'house',
-                'bour': 'hour',
-                'bead': 'head',
-                'beart': 'heart',
-                'bope': 'hope',
-                'bigh': 'high',
-                'band': 'hand',
-                'batb': 'bath',
-                'botb': 'both',
-                'bard': 'hard',
-                'belp': 'help',
-                'bealth': 'health',
-                'buman': 'human',
-                'sbould': 'should',
-                'bowever': 'however',
-                'bebind': 'behind',
-                'perbaps': 'perhaps',
-                'bimself': 'himself',
-                'berself': 'herself',
-                
-                # Common OCR errors with 'rn' being read as 'm'
-                'modem': 'modern',
-                'leam': 'learn',
-                'bum': 'burn',
-                'tum': 'turn',
-                'retum': 'return',
-                'pattem': 'pattern',
-                'concem': 'concern',
-                'intem': 'intern',
-                'govemment': 'government',
-                
-                # Common OCR errors with 'I' and 'l' confusion
-                'Iike': 'like',
-                'Iife': 'life',
-                'Iist': 'list',
-                'Iine': 'line',
-                'Iight': 'light',
-                'Iittle': 'little',
-                'Iong': 'long',
-                'Iove': 'love',
-                'Iook': 'look',
-                'Iarge': 'large',
-                'Iater': 'later',
-                'Ieft': 'left',
-                'Ievel': 'level',
-                'Iearn': 'learn',
-                'Iast': 'last',
-                'Ieast': 'least',
-                
-                # Common OCR errors with 'O' and '0' confusion
-                '0ne': 'One',
-                '0nly': 'Only',
-                '0ther': 'Other',
-                '0ver': 'Over',
-                '0pen': 'Open',
-                '0ff': 'Off',
-                '0ut': 'Out',
-                '0ur': 'Our',
-                'g0': 'go',
-                'd0': 'do',
-                't0': 'to',
-                'n0': 'no',
-                's0': 'so',
-                
-                # Other common OCR errors
-                'arid': 'and',
-                'iri': 'in',
-                'ori': 'on',
-                'frorn': 'from',
-                'rnay': 'may',
-                'sorne': 'some',
-                'tirne': 'time',
-                'cornputer': 'computer',
-                'systern': 'system',
-                'inforrnation': 'information',
-                'prograrns': 'programs',
-                'rnanagement': 'management',
-                'developrnent': 'development',
-                'docurnent': 'document',
-                'environrnent': 'environment',
-                'irnportant': 'important',
-                'rnore': 'more',
-                'rnust': 'must',
-                'nurnber': 'number',
-                'sarne': 'same',
-                'cornpany': 'company',
-                'rnethod': 'method',
-                'cornmon': 'common',
-                'rnain': 'main',
-                'rnake': 'make',
-                'rnean': 'mean',
-                'arnount': 'amount',
-                'alrnost': 'almost',
-                'cornplete': 'complete',
-                'cornponent': 'component',
-                'rnernory': 'memory',
-                'cornmand': 'command',
-                'cornmunity': 'community',
-                'cornpare': 'compare',
-                'cornplex': 'complex',
-                'rnernber': 'member',
-                'rnonth': 'month',
-                'rnedia': 'media',
-                'rnessage': 'message',
-                'rnove': 'move',
-                'rnodel': 'model',
-                'rnorning': 'morning',
-                'rnernory': 'memory',
-                'rnachine': 'machine',
-                'rnaterial': 'material',
-                'rneasure': 'measure',
-                'rnedical': 'medical',
-                'rnany': 'many',
-                'rnight': 'might',
-                'rnarket': 'market',
-                'rnoney': 'money',
-                'rneet': 'meet',
-                'rnile': 'mile',
-                'rnind': 'mind',
-                
-                # Double letter issues
-                'nurnber': 'number',
-                'cornrnand': 'command',
-                'surnrnary': 'summary',
-                'surnrner': 'summer',
-                'cornrnunity': 'community',
-                'cornrnent': 'comment',
-                'cornrnon': 'common',
-                'cornrnittee': 'committee',
-                'cornrnunicate': 'communicate',
-                'cornrnunication': 'communication',
-                'cornrnercial': 'commercial',
-                'cornrnission': 'commission',
-                'prograrnrning': 'programming'
-            }
-            
-            if word.lower() in common_corrections:
-                # Preserve case
-                if word.isupper():
-                    corrected_words.append(common_corrections[word.lower()].upper())
-                elif word[0].isupper():
-                    corrected_words.append(common_corrections[word.lower()].capitalize())
-                else:
-                    corrected_words.append(common_corrections[word.lower()])
-            else:
-                corrected_words.append(word)
-        
-        # Recombine corrected words
-        final_text = ' '.join(corrected_words)
-        
-        # Final formatting adjustments - ensure proper spacing after punctuation
-        final_text = re.sub(r'([.,;:!?])([^\s])', r'\1 \2', final_text)
-        
-        print(f"Cleaned result: '{final_text.strip()}'")
-        return final_text.strip()
+        # Text bodies can be very large, so they are only logged at TRACE
+        log.debug("Cleaned text: %d -> %d characters", len(text), len(cleaned_text))
+        log.log(TRACE, "Text before cleaning: %s", text)
+        log.log(TRACE, "Text after cleaning: %s", cleaned_text)
+        return self._cleaned(cleaned_text)
+    
+    def _cleaned(self, text):
+        """Remember an extractor's cleaned output, so the job doesn't clean it again; returns text"""
+        cleaned_texts = getattr(self, 'cleaned_texts', None)
+        if cleaned_texts is not None:
+            cleaned_texts.add(text)
+        return text
+    
+    def _uncertain_words(self, text):
+        """
+        Which words of text spelling correction may change: those the pass that
+        produced it read with low confidence, or by default those that look misread
+        """
+        words = getattr(self, 'pass_words', {}).get(text)
+        return uncertain_words(words) if words is not None else None
     
     def _get_ocr_config(self):
         """Get highly optimized OCR configuration based on selected mode and document type"""
@@ -2360,7 +2360,7 @@ class OCRApp:
         # If auto-detect was used, get the detected mode
         if mode == "auto" and hasattr(self, 'detected_type'):
             mode = self.detected_type
-            print(f"Using detected type {mode} for OCR configuration")
+            log.debug("Using detected type %s for OCR configuration", mode)
         
         # Set base engine mode: OEM 1 = LSTM only, OEM 3 = default, OEM 0 = legacy engine
         # For different document types, different engines might work better
@@ -2442,15 +2442,15 @@ class OCRApp:
         if custom_params:
             config += " " + " ".join(custom_params)
         
-        print(f"Using OCR config: {config}")
+        log.debug("Using OCR config: %s", config)
         return config
     
     def _update_text_box(self, text):
         """Update the text box with extracted text (called in main thread)"""
-        self.text_box.delete(1.0, tk.END)
+        self._clear_text_box()
         
         # Debug the text content
-        print(f"Updating text box with: '{text}'")
+        log.debug("Updating text box with %d characters", len(text or ''))
         
         # Ensure all the text containers maintain their height
         if hasattr(self, 'bottom_section'):
@@ -2464,11 +2464,11 @@ class OCRApp:
         # If there's text, display it
         if text and text.strip():
             # Remove any non-printable characters
-            cleaned_text = ''.join(c if c.isprintable() or c in ['\n', '\t'] else ' ' for c in text)
+            cleaned_text = printable_text(text)
             
             # Ensure we're not just displaying placeholders or dashes
             if cleaned_text.strip('-').strip():
-                self.text_box.insert(tk.END, cleaned_text)
+                self._insert_text_chunks(cleaned_text)
                 self.extracted_text = cleaned_text
                 self.status_var.set("OCR completed successfully")
                 
@@ -2504,9 +2504,40 @@ class OCRApp:
             
         # Ensure text box has focus and is visible
         self.text_box.focus_set()
-        
-        # Force UI update of the entire application
-        self.root.update()
+    
+    def _clear_text_box(self):
+        """Empty the text box, dropping any text still waiting to be inserted (called in main thread)"""
+        self._pending_text.clear()
+        self.text_box.delete(1.0, tk.END)
+    
+    def _insert_text_chunks(self, text):
+        """
+        Append text to the text box a chunk at a time (called in main thread).
+        
+        Each chunk is inserted on its own event loop tick, so the window keeps
+        redrawing and responding while a very large result is added. Texts
+        queued while an earlier one is still going in are appended after it.
+        """
+        if not text:
+            return
+        self._pending_text.append([text, 0])
+        if len(self._pending_text) == 1:
+            self._insert_next_chunk()
+    
+    def _insert_next_chunk(self):
+        """Insert the next chunk of pending text and schedule the one after it"""
+        if not self._pending_text:
+            return
+        entry = self._pending_text[0]
+        text, start = entry
+        end = start + TEXT_INSERT_CHARS
+        self.text_box.insert(tk.END, text[start:end])
+        if end < len(text):
+            entry[1] = end
+        else:
+            self._pending_text.popleft()
+        if self._pending_text:
+            self.root.after(1, self._insert_next_chunk)
     
     def _show_error(self, error_msg):
         """Show error message (called in main thread)"""
@@ -2514,15 +2545,15 @@ class OCRApp:
             messagebox.showerror("OCR Error", f"Error during OCR processing: {error_msg}")
             self.status_var.set("Error during OCR processing")
         except Exception as e:
-            print(f"Error showing error dialog: {str(e)}")
+            log.warning("Error showing error dialog: %s", e)
             # If UI is not responding, at least print to console
-            print(f"OCR Error: {error_msg}")
+            log.error("OCR error: %s", error_msg)
     
     def _show_progress_dialog(self, message):
         """Show a progress dialog during AI processing - DEPRECATED, use in-frame progress instead"""
         # This method is kept for compatibility but we no longer use it
         # Instead, we update the status and use the hashtag loading animation
-        self.status_var.set(message)
+        self._set_status(message)
         self._update_progress(10, message)
     
     def _update_progress_dialog(self):
@@ -2531,13 +2562,61 @@ class OCRApp:
         pass
         
     def _update_progress(self, value, status_text=None):
-        """Update the progress bar value and status text"""
+        """Report progress from any thread; the main loop draws it on its next poll"""
+        self.progress_bus.progress(value, status_text)
+    
+    def _set_status(self, status_text):
+        """Report a status message from any thread"""
+        self.progress_bus.status(status_text)
+    
+    def _begin_stage(self, stage):
+        """Time and report the start of a pipeline stage"""
+        timer = getattr(self, 'stage_timer', None)
+        if timer is not None:
+            timer.begin(stage)
+        self.progress_bus.stage(stage)
+    
+    def _drain_progress_events(self):
+        """Apply queued worker events on the main thread, coalescing bursts of progress"""
+        try:
+            for kind, value, text in coalesce(self.progress_bus.drain()):
+                if kind == PROGRESS:
+                    self._apply_progress(value, text)
+                elif kind == ESTIMATE:
+                    if self.progress_estimator is None:
+                        self.progress_estimator = ProgressEstimator(value, stages=("preprocess", "ocr", "clean"))
+                    else:
+                        self.progress_estimator.set_expected(value)
+                elif kind == STAGE:
+                    self.current_stage = text
+                    if self.progress_estimator is not None:
+                        self.progress_estimator.begin(text)
+                elif kind == CALL:
+                    value()
+            
+            # Move the bar from measured stage timings rather than fixed checkpoints
+            if self.progress_estimator is not None:
+                if self.progress_estimator.finished:
+                    self.progress_estimator = None
+                else:
+                    percent, eta = self.progress_estimator.estimate()
+                    self._apply_progress(percent, eta=eta)
+        except Exception as e:
+            log.warning("Error applying progress events: %s", e)
+        
+        try:
+            self.root.after(self.PROGRESS_POLL_MS, self._drain_progress_events)
+        except:
+            pass  # Ignore errors if the application is closing
+    
+    def _apply_progress(self, value, status_text=None, eta=None):
+        """Update the progress bar value, status text and ETA (called in main thread)"""
         # Update side progress bar
-        if hasattr(self, 'side_progress_var'):
+        if value is not None and hasattr(self, 'side_progress_var'):
             self.side_progress_var.set(value)
             
         # Update hashtag bar to match progress
-        if hasattr(self, 'hashtag_count'):
+        if value is not None and hasattr(self, 'hashtag_count'):
             # Calculate hashtags based on progress
             hashtag_count = int((value / 100) * 20)
             if hashtag_count > 0:  # Ensure at least one hashtag is showing if progress started
@@ -2555,21 +2634,21 @@ class OCRApp:
                     except:
                         pass  # Ignore errors if the widget was destroyed
             
-        if status_text and hasattr(self, 'preview_status'):
+        if status_text:
+            self.progress_status_text = status_text
+            
+        if (status_text or eta is not None) and hasattr(self, 'preview_status'):
+            preview_text = self.progress_status_text
+            if eta is not None and eta >= 1:
+                preview_text = f"{preview_text} (about {eta:.0f}s left)"
             try:
-                self.preview_status.config(text=status_text)
+                self.preview_status.config(text=preview_text)
             except:
                 pass  # Ignore errors if the widget was destroyed
             
         # Also update main status bar
         if status_text:
             self.status_var.set(status_text)
-            
-        # Force UI update for smoother progress indication
-        try:
-            self.root.update_idletasks()
-        except:
-            pass  # Ignore errors if the application is closing
     
     def save_text(self):
         if not self.extracted_text:
@@ -2592,9 +2671,9 @@ class OCRApp:
     
     def view_processed_image(self):
         """View the last processed image for debugging"""
-        debug_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "debug", "last_processed.png")
+        debug_path = self.last_processed_path
         
-        if os.path.exists(debug_path):
+        if debug_path and os.path.exists(debug_path):
             # Create a new window to display the processed image
             debug_window = tk.Toplevel(self.root)
             debug_window.title("Processed Image")
@@ -2604,39 +2683,38 @@ class OCRApp:
             img_frame = tk.Frame(debug_window)
             img_frame.pack(fill=tk.BOTH, expand=True, padx=20, pady=20)
             
-            # Load and display the image
-            try:
-                img = Image.open(debug_path)
-                
-                # Calculate the size to maintain aspect ratio
-                img_width, img_height = img.size
-                window_width = 760
-                window_height = 500
-                
-                ratio = min(window_width / img_width, window_height / img_height)
-                new_width = int(img_width * ratio)
-                new_height = int(img_height * ratio)
-                
-                img = img.resize((new_width, new_height), Image.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                
-                img_label = tk.Label(img_frame, image=photo)
-                img_label.image = photo  # Keep a reference
-                img_label.pack(fill=tk.BOTH, expand=True)
-                
-                # Add info label
-                info_text = f"Image Size: {img_width}x{img_height}\n"
-                info_text += f"Processing: {'AI Enhanced' if self.ai_var.get() else 'Standard'}, "
-                info_text += f"Mode: {self.mode_var.get()}, Language: {self.lang_var.get()}"
-                
-                info_label = tk.Label(debug_window, text=info_text, font=("Arial", 10))
-                info_label.pack(pady=(0, 10))
-                
-            except Exception as e:
-                tk.Label(img_frame, text=f"Error loading image: {str(e)}").pack()
+            # Placeholder until the thumbnail is ready (usually at once: scans render it ahead)
+            img_label = tk.Label(img_frame, text="Loading image...")
+            img_label.pack(fill=tk.BOTH, expand=True)
+            
+            def deliver(img, error):
+                self.progress_bus.call(lambda: self._show_processed_image(debug_window, img_label, img, error))
+            
+            self.thumbnails.request("processed", debug_path, PROCESSED_VIEW_SIZE, deliver)
         else:
             messagebox.showinfo("No Image", "No processed image found. Please scan an image first.")
     
+    def _show_processed_image(self, debug_window, img_label, img, error):
+        """Fill the processed image window with its thumbnail (main thread)"""
+        if not debug_window.winfo_exists():
+            return
+        if error is not None:
+            img_label.config(text=f"Error loading image: {str(error)}")
+            return
+        
+        photo = ImageTk.PhotoImage(img)
+        img_label.config(image=photo, text="")
+        img_label.image = photo  # Keep a reference
+        
+        # Add info label
+        img_width, img_height = full_size(img)
+        info_text = f"Image Size: {img_width}x{img_height}\n"
+        info_text += f"Processing: {'AI Enhanced' if self.ai_var.get() else 'Standard'}, "
+        info_text += f"Mode: {self.mode_var.get()}, Language: {self.lang_var.get()}"
+        
+        info_label = tk.Label(debug_window, text=info_text, font=("Arial", 10))
+        info_label.pack(pady=(0, 10))
+    
     def refresh_app(self):
         """Reset the application state to handle a new image"""
         # Clear current image data
@@ -2645,7 +2723,7 @@ class OCRApp:
         self.extracted_text = ""
         
         # Reset UI elements
-        self.text_box.delete(1.0, tk.END)
+        self._clear_text_box()
         self.preview_label.config(image="", text="")
         self.preview_label.image = None
         
@@ -2689,6 +2767,7 @@ class OCRApp:
         # Update the width of the preview frame window
         self.preview_canvas.itemconfig(self.preview_frame_window, width=event.width)
     
+    @traced("preprocess:screenshot")
     def _enhance_screenshot(self, image):
         """Apply specialized preprocessing for screenshots"""
         try:
@@ -2705,21 +2784,24 @@ class OCRApp:
             processed_versions = []
             
             # Version 1: Sharp contrast for UI text
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            processed_versions.append(binary)
+            with span("preprocess:screenshot:otsu"):
+                _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                processed_versions.append(binary)
             
             # Version 2: Edge enhancement for crisp text
-            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-            sharpened = cv2.filter2D(gray, -1, kernel)
-            _, sharp_binary = cv2.threshold(sharpened, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            processed_versions.append(sharp_binary)
+            with span("preprocess:screenshot:sharpen-otsu"):
+                kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+                sharpened = cv2.filter2D(gray, -1, kernel)
+                _, sharp_binary = cv2.threshold(sharpened, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                processed_versions.append(sharp_binary)
             
             # Version 3: Adaptive threshold for variable backgrounds
-            adaptive = cv2.adaptiveThreshold(
-                gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY, 11, 2
-            )
-            processed_versions.append(adaptive)
+            with span("preprocess:screenshot:adaptive"):
+                adaptive = cv2.adaptiveThreshold(
+                    gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                    cv2.THRESH_BINARY, 11, 2
+                )
+                processed_versions.append(adaptive)
             
             # Store all versions for multi-pass OCR
             self.processing_results = processed_versions
@@ -2730,9 +2812,10 @@ class OCRApp:
             return processed_img
             
         except Exception as e:
-            print(f"Screenshot enhancement error: {str(e)}")
+            log.warning("Screenshot enhancement error: %s", e)
             return image  # Return original if processing fails
     
+    @traced("preprocess:document")
     def _enhance_document(self, image):
         """Apply specialized preprocessing for text documents"""
         try:
@@ -2749,29 +2832,34 @@ class OCRApp:
             processed_versions = []
             
             # Version 1: Enhanced contrast
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            enhanced = clahe.apply(gray)
-            processed_versions.append(enhanced)
+            with span("preprocess:document:clahe"):
+                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+                enhanced = clahe.apply(gray)
+                processed_versions.append(enhanced)
             
             # Version 2: Adaptive threshold for handling shadows and uneven lighting
-            adaptive = cv2.adaptiveThreshold(
-                enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                cv2.THRESH_BINARY, 11, 2
-            )
-            processed_versions.append(adaptive)
+            with span("preprocess:document:adaptive"):
+                adaptive = cv2.adaptiveThreshold(
+                    enhanced, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                    cv2.THRESH_BINARY, 11, 2
+                )
+                processed_versions.append(adaptive)
             
             # Version 3: Denoised for cleaner text
-            denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
-            processed_versions.append(denoised)
+            with span("preprocess:document:denoise"):
+                denoised = cv2.fastNlMeansDenoising(gray, None, 10, 7, 21)
+                processed_versions.append(denoised)
             
             # Version 4: Otsu's threshold for clean black and white text
-            _, otsu = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            processed_versions.append(otsu)
+            with span("preprocess:document:otsu"):
+                _, otsu = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                processed_versions.append(otsu)
             
             # Version 5: Light morphological operations to connect broken text
-            kernel = np.ones((1, 1), np.uint8)
-            morph = cv2.morphologyEx(otsu, cv2.MORPH_CLOSE, kernel)
-            processed_versions.append(morph)
+            with span("preprocess:document:morph-close"):
+                kernel = np.ones((1, 1), np.uint8)
+                morph = cv2.morphologyEx(otsu, cv2.MORPH_CLOSE, kernel)
+                processed_versions.append(morph)
             
             # Store all versions for multi-pass OCR
             self.processing_results = processed_versions
@@ -2782,9 +2870,10 @@ class OCRApp:
             return processed_img
             
         except Exception as e:
-            print(f"Document enhancement error: {str(e)}")
+            log.warning("Document enhancement error: %s", e)
             return image  # Return original if processing fails
     
+    @traced("preprocess:single-line")
     def _enhance_single_line(self, image):
         """Apply specialized preprocessing for single line text/buttons"""
         try:
@@ -2807,23 +2896,27 @@ class OCRApp:
             processed_versions = []
             
             # Version 1: Basic contrast enhancement
-            clahe = cv2.createCLAHE(clipLimit=2.5, tileGridSize=(4, 4))
-            enhanced = clahe.apply(gray)
-            processed_versions.append(enhanced)
+            with span("preprocess:single-line:clahe"):
+                clahe = cv2.createCLAHE(clipLimit=2.5, tileGridSize=(4, 4))
+                enhanced = clahe.apply(gray)
+                processed_versions.append(enhanced)
             
             # Version 2: Strong threshold for clear contrast
-            _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            processed_versions.append(binary)
+            with span("preprocess:single-line:otsu"):
+                _, binary = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                processed_versions.append(binary)
             
             # Version 3: Edge enhancement for better definition
-            kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
-            sharpened = cv2.filter2D(enhanced, -1, kernel)
-            processed_versions.append(sharpened)
+            with span("preprocess:single-line:sharpen"):
+                kernel = np.array([[-1,-1,-1], [-1,9,-1], [-1,-1,-1]])
+                sharpened = cv2.filter2D(enhanced, -1, kernel)
+                processed_versions.append(sharpened)
             
             # Version 4: Dilate slightly to connect broken characters
-            kernel = np.ones((2, 2), np.uint8)
-            dilated = cv2.dilate(binary, kernel, iterations=1)
-            processed_versions.append(dilated)
+            with span("preprocess:single-line:dilate"):
+                kernel = np.ones((2, 2), np.uint8)
+                dilated = cv2.dilate(binary, kernel, iterations=1)
+                processed_versions.append(dilated)
             
             # Store all versions for multi-pass OCR
             self.processing_results = processed_versions
@@ -2834,104 +2927,25 @@ class OCRApp:
             return processed_img
             
         except Exception as e:
-            print(f"Single line enhancement error: {str(e)}")
+            log.warning("Single line enhancement error: %s", e)
             return image  # Return original if processing fails
     
     def _select_best_document_result(self, results):
         """Select the best OCR result for document images"""
-        if not results:
-            return ""
-            
-        if len(results) == 1:
-            return results[0]
-        
-        # Filter out empty results
-        non_empty = [r for r in results if r.strip()]
-        if not non_empty:
-            return ""
-            
-        # Calculate scores for each result
-        scores = []
-        for result in non_empty:
-            score = 0
-            
-            # Longer text usually means better recognition (unless it's just noise)
-            words = result.split()
-            score += min(len(words), 100)  # Cap at 100 words to avoid bias
-            
-            # More real words = better score (words with at least 3 chars)
-            real_word_count = sum(1 for word in words if len(word) > 2 and word.isalpha())
-            score += real_word_count * 2
-            
-            # Higher ratio of alphanumeric characters is better
-            alphanumeric_ratio = sum(c.isalnum() or c.isspace() for c in result) / max(1, len(result))
-            score += alphanumeric_ratio * 100
-            
-            # Penalize excessive special characters
-            special_char_ratio = sum(not (c.isalnum() or c.isspace()) for c in result) / max(1, len(result))
-            score -= special_char_ratio * 50
-            
-            # Bonus for having paragraphs (indicates good structure detection)
-            paragraphs = [p for p in result.split('\n\n') if p.strip()]
-            score += min(len(paragraphs), 10) * 5
-            
-            scores.append((score, result))
-        
-        # Return the result with the highest score
-        scores.sort(reverse=True)
-        print(f"Selected best document result with score {scores[0][0]}")
-        return scores[0][1]
+        return self._select_best_result(results, "document", report=True)
     
     def _select_best_screenshot_result(self, results):
         """Select the best OCR result for screenshot images"""
-        if not results:
-            return ""
-            
-        if len(results) == 1:
-            return results[0]
-        
-        # Filter out empty results
-        non_empty = [r for r in results if r.strip()]
-        if not non_empty:
-            return ""
-            
-        # Calculate scores for each result
-        scores = []
-        for result in non_empty:
-            score = 0
-            
-            # For screenshots, we want to preserve structure
-            # More lines likely means better UI element detection
-            lines = [line for line in result.split('\n') if line.strip()]
-            score += min(len(lines), 30) * 3
-            
-            # Look for UI element keywords
-            ui_keywords = ['menu', 'file', 'edit', 'view', 'window', 'help', 'options', 
-                          'tools', 'settings', 'preferences', 'button', 'click', 'select',
-                          'save', 'cancel', 'ok', 'yes', 'no', 'submit', 'login', 'sign']
-            
-            # Count matches for UI keywords (case insensitive)
-            result_lower = result.lower()
-            keyword_count = sum(1 for keyword in ui_keywords if keyword in result_lower)
-            score += keyword_count * 8
-            
-            # For screenshots, shorter words are often UI elements
-            avg_word_length = sum(len(word) for word in result.split()) / max(1, len(result.split()))
-            if avg_word_length < 6:  # UI text tends to be shorter
-                score += 20
-            
-            # Penalize excessive punctuation (UI elements typically have little)
-            punct_ratio = sum(c in ',.;:!?' for c in result) / max(1, len(result))
-            score -= punct_ratio * 40
-            
-            scores.append((score, result))
-        
-        # Return the result with the highest score
-        scores.sort(reverse=True)
-        print(f"Selected best screenshot result with score {scores[0][0]}")
-        return scores[0][1]
+        return self._select_best_result(results, "screenshot", report=True)
 
 def main():
+    configure_logging(default="info")
+    
+    # OCR_TRACE=trace.json records a trace of every scan, written when the window closes
+    trace_path = os.environ.get(TRACE_ENV)
+    if trace_path:
+        enable_tracing()
+    
     root = tk.Tk()
     app = OCRApp(root)
     root.update()  # Update to get correct window sizes
@@ -2940,6 +2954,12 @@ def main():
     root.minsize(900, 700)
     
     root.mainloop()
+    
+    counters = format_counters()
+    if counters:
+        log.info("Session totals:\n%s", counters)
+    if trace_path:
+        print(f"Wrote {write_trace(trace_path)} spans to {trace_path}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
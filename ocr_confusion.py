@@ -0,0 +1,264 @@
+"""
+OCR Confusion Model
+-------------------
+A table of character confusions ("rn" read for "m", "b" for "h", "0" for "o")
+with how often each one was seen. Applying the confusions to a doubtful token
+generates the words it may have been misread from; the ones found in the
+lexicon are ranked by how likely the confusions are and how common the word
+is. This replaces listing every misspelled word by hand: a handful of
+confusions covers any word in the lexicon.
+
+Tables are plain text files named confusions.txt, with one confusion per line:
+the observed text, the intended text and a count, separated by whitespace.
+The bundled table lives in lexicons/; a confusions.txt in ~/.ocr_app/lexicons/
+is merged into it and is where learned confusions are saved. Confusions are
+learned by aligning OCR output with ground-truth text (see learn_confusions).
+"""
+
+import os
+import math
+import threading
+from collections import Counter
+from difflib import SequenceMatcher
+from itertools import combinations
+
+from ocr_lexicon import lexicon_dirs
+from ocr_paths import data_path
+
+
+CONFUSIONS_FILE = "confusions.txt"
+
+# At most this many confusions are undone in one token
+MAX_EDITS = 2
+
+# Pseudo-count for an observed string being correct as it stands, which keeps
+# rarely seen confusions from being treated as near-certain
+KEEP_WEIGHT = 10
+
+# How much a common word is preferred over a rare one, against confusion likelihood
+FREQUENCY_WEIGHT = 0.5
+
+# How much a candidate that reads like the language model's text is preferred
+LANGUAGE_WEIGHT = 0.5
+
+# Shortest token that is corrected, and shortest capitalized one (often a name);
+# valid words missing from the bundled word lists are common below these lengths
+MIN_CORRECTION_LENGTH = 4
+MIN_CAPITALIZED_LENGTH = 6
+
+# Longest observed or intended string learned from an alignment
+MAX_SPAN = 3
+
+
+def read_confusions(path):
+    """Counter of (observed, intended) pairs in a confusion table file"""
+    counts = Counter()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 2 or fields[0].startswith('#'):
+                continue
+            count = int(fields[2]) if len(fields) > 2 and fields[2].isdigit() else 1
+            counts[fields[0], fields[1]] += count
+    return counts
+
+
+def write_confusions(counts, path):
+    """Save a Counter of (observed, intended) pairs as a confusion table file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("# observed intended count\n")
+        for (observed, intended), count in sorted(counts.items(), key=lambda item: (-item[1], item[0])):
+            f.write(f"{observed}\t{intended}\t{count}\n")
+    os.replace(tmp_path, path)
+
+
+def learn_confusions(pairs, max_span=MAX_SPAN):
+    """
+    Count character confusions in (ocr_text, true_text) pairs.
+
+    Each pair is aligned character by character, and every short substituted
+    span becomes an (observed, intended) confusion. Insertions and deletions
+    are not counted; whitespace is never part of a confusion.
+    """
+    counts = Counter()
+    for observed, truth in pairs:
+        matcher = SequenceMatcher(None, observed, truth, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag != 'replace' or i2 - i1 > max_span or j2 - j1 > max_span:
+                continue
+            wrong, right = observed[i1:i2], truth[j1:j2]
+            if any(char.isspace() for char in wrong + right):
+                continue
+            counts[wrong, right] += 1
+    return counts
+
+
+def _split_token(token):
+    """(leading punctuation, core, trailing punctuation)"""
+    start = 0
+    end = len(token)
+    while start < end and not token[start].isalnum():
+        start += 1
+    while end > start and not token[end - 1].isalnum():
+        end -= 1
+    return token[:start], token[start:end], token[end:]
+
+
+def _tidy_case(word):
+    """A candidate in lower, upper or title case; undoing a confusion like l -> I can leave it mixed"""
+    if word.islower() or word.isupper() or word.istitle():
+        return word
+    letters = [char for char in word if char.isalpha()]
+    if sum(char.isupper() for char in letters) > len(letters) / 2:
+        return word.upper()
+    return word.capitalize() if word[0].isupper() else word.lower()
+
+
+class ConfusionTable:
+    """Character confusions and the candidates they generate for a token"""
+
+    def __init__(self, counts):
+        self.counts = Counter(counts)
+        totals = Counter()
+        for (observed, _), count in self.counts.items():
+            totals[observed] += count
+
+        # observed -> [(intended, log probability)]
+        self._rules = {}
+        for (observed, intended), count in self.counts.items():
+            if observed == intended:
+                continue
+            probability = count / (totals[observed] + KEEP_WEIGHT)
+            self._rules.setdefault(observed, []).append((intended, math.log(probability)))
+        self._lengths = sorted({len(observed) for observed in self._rules}, reverse=True)
+
+        # Corrections already worked out, by (token, lexicon)
+        self._corrections = {}
+
+    @classmethod
+    def load(cls, paths=None):
+        """Merge every confusion table file found in the lexicon directories"""
+        if paths is None:
+            paths = [os.path.join(directory, CONFUSIONS_FILE) for directory in lexicon_dirs()]
+        counts = Counter()
+        for path in paths:
+            if os.path.isfile(path):
+                counts.update(read_confusions(path))
+        return cls(counts)
+
+    def __len__(self):
+        return len(self._rules)
+
+    def _sites(self, word):
+        """(start, end, [(intended, log probability)]) for every place a confusion applies"""
+        sites = []
+        for start in range(len(word)):
+            for length in self._lengths:
+                if start + length > len(word):
+                    continue
+                rules = self._rules.get(word[start:start + length])
+                if rules:
+                    sites.append((start, start + length, rules))
+        return sites
+
+    def candidates(self, word, max_edits=MAX_EDITS):
+        """{candidate: log probability} for words that word may have been misread from"""
+        sites = self._sites(word)
+        found = {}
+        for edits in range(1, max_edits + 1):
+            for chosen in combinations(sites, edits):
+                # Skip overlapping sites; combinations keep them in start order
+                if any(chosen[i][1] > chosen[i + 1][0] for i in range(len(chosen) - 1)):
+                    continue
+                variants = [("", 0.0, 0)]
+                for start, end, rules in chosen:
+                    variants = [
+                        (text + word[position:start] + intended, score + log_probability, end)
+                        for text, score, position in variants
+                        for intended, log_probability in rules
+                    ]
+                for text, score, position in variants:
+                    candidate = text + word[position:]
+                    if score > found.get(candidate, -math.inf):
+                        found[candidate] = score
+        return found
+
+    def correction(self, token, lexicon, max_edits=MAX_EDITS, language_model=None):
+        """
+        The most likely lexicon word a token was misread from, or None.
+
+        Punctuation around the token is kept. Tokens that are already lexicon
+        words are left alone, and so are tokens whose best candidates tie,
+        tokens shorter than MIN_CORRECTION_LENGTH and capitalized tokens
+        shorter than MIN_CAPITALIZED_LENGTH.
+        With a language model (an ocr_ngram.NgramModel), candidates are also
+        ranked by how likely their spelling is under it.
+        """
+        key = (token, id(lexicon), id(language_model))
+        try:
+            return self._corrections[key]
+        except KeyError:
+            pass
+
+        leading, core, trailing = _split_token(token)
+        correction = None
+        if self._correctable(core) and core.lower() not in lexicon:
+            # Spellings of one word that differ only in case are one candidate, not a tie
+            best = {}
+            for candidate, log_probability in self.candidates(core, max_edits).items():
+                count = lexicon.count(candidate)
+                if count:
+                    score = log_probability + FREQUENCY_WEIGHT * math.log(count)
+                    if language_model is not None:
+                        score += LANGUAGE_WEIGHT * language_model.log_probability(candidate)
+                    word = candidate.lower()
+                    if word not in best or score > best[word][0]:
+                        best[word] = (score, candidate)
+            ranked = sorted(best.values(), reverse=True)
+            if ranked and (len(ranked) == 1 or ranked[1][0] < ranked[0][0]):
+                correction = leading + _tidy_case(ranked[0][1]) + trailing
+
+        if len(self._corrections) < 100000:
+            self._corrections[key] = correction
+        return correction
+
+
+    @staticmethod
+    def _correctable(core):
+        if len(core) < MIN_CORRECTION_LENGTH:
+            return False
+        return len(core) >= MIN_CAPITALIZED_LENGTH or not (core[0].isupper() and not core.isupper())
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_confusions():
+    """Process-wide ConfusionTable, loaded on first use"""
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = ConfusionTable.load()
+        return _table
+
+
+def learned_confusions_path():
+    """Where confusions learned from this installation's ground truth are kept"""
+    return data_path("lexicons", CONFUSIONS_FILE)
+
+
+def save_learned_confusions(pairs):
+    """Learn confusions from (ocr_text, true_text) pairs and merge them into the user table"""
+    global _table
+    path = learned_confusions_path()
+    counts = read_confusions(path) if os.path.isfile(path) else Counter()
+    learned = learn_confusions(pairs)
+    counts.update(learned)
+    write_confusions(counts, path)
+    with _table_lock:
+        _table = None
+    return learned
@@ -0,0 +1,176 @@
+"""
+OCR Consensus
+-------------
+Word-level voting across OCR passes (ROVER: Recognizer Output Voting Error
+Reduction).
+
+Rather than keeping the single best pass, the passes are aligned word by word
+and every position is decided by a vote weighted by tesseract's confidence in
+each word. A pass that misreads one line is outvoted on that line but still
+contributes the lines it read well.
+
+The passes are merged into a word network one at a time, starting from the
+best-ranked one. Each pass is aligned to the network with difflib over word
+tokens. Matched words vote in their position. Words missing from the pass
+vote for "nothing here", and extra words open new positions. Line breaks are
+tokens too, so the merged text keeps the layout the passes agree on. merge()
+also tells which pass and word each merged word came from, so the word boxes
+of the merged text can be taken from the passes' word tables.
+"""
+
+import re
+from difflib import SequenceMatcher
+
+
+# Weight of a word or gap when the pass has no confidence for it (confidences are 0-100)
+DEFAULT_CONFIDENCE = 80
+
+# Passes with fewer or more words than this fraction / multiple of the first
+# pass are left out: they read a different part of the image or a different
+# layout, and would vote the other passes' words away
+MIN_LENGTH_RATIO = 0.5
+MAX_LENGTH_RATIO = 2.0
+
+_TOKEN = re.compile(r'\n+|[^\s]+')
+
+
+def tokenize(text):
+    """Words and line breaks of text; blank lines become a single paragraph break"""
+    return ['\n\n' if token.startswith('\n\n') else token for token in _TOKEN.findall(text)]
+
+
+def join_tokens(tokens):
+    """Inverse of tokenize: words separated by spaces, line breaks as they are"""
+    pieces = []
+    previous_word = False
+    for token in tokens:
+        if token.startswith('\n'):
+            pieces.append(token)
+            previous_word = False
+        else:
+            if previous_word:
+                pieces.append(' ')
+            pieces.append(token)
+            previous_word = True
+    return ''.join(pieces).strip()
+
+
+class _Column:
+    """One position in the word network: the votes for each token (None for no word)"""
+
+    __slots__ = ("token", "votes", "origins")
+
+    def __init__(self, token, votes, origin):
+        # The token other passes are aligned against
+        self.token = token
+        self.votes = votes
+        # (text index, word index) of the first (best-ranked) pass to vote for each token
+        self.origins = {token: origin}
+
+    def vote(self, token, weight, origin=None):
+        self.votes[token] = self.votes.get(token, 0.0) + weight
+        if token is not None:
+            self.origins.setdefault(token, origin)
+
+    def winner(self):
+        # max() keeps the first of equal votes, and the earliest voter is the better-ranked pass
+        return max(self.votes.items(), key=lambda item: item[1])[0]
+
+
+def _weights(tokens, confidences):
+    """Weight of every token: the word's confidence, or the pass's mean for line breaks"""
+    known = [conf for conf in confidences or () if conf >= 0]
+    mean = sum(known) / len(known) if known else DEFAULT_CONFIDENCE
+
+    weights = []
+    words = iter(confidences or ())
+    for token in tokens:
+        if token.startswith('\n'):
+            weights.append(mean)
+            continue
+        conf = next(words, -1)
+        weights.append(conf if conf >= 0 else mean)
+    return weights, mean
+
+
+def _word_numbers(tokens):
+    """Index of every token among the words of its text; None for line breaks"""
+    numbers = []
+    count = 0
+    for token in tokens:
+        if token.startswith('\n'):
+            numbers.append(None)
+        else:
+            numbers.append(count)
+            count += 1
+    return numbers
+
+
+def consensus(texts, confidences=None):
+    """
+    Merge several OCR readings of the same image into one text by voting.
+
+    texts are ordered best first; ties go to the earlier text. confidences, if
+    given, holds one entry per text: a sequence of word confidences (0-100,
+    -1 for unknown) in the order of the text's words, or None.
+    """
+    return merge(texts, confidences)[0]
+
+
+def merge(texts, confidences=None):
+    """
+    consensus() and where its words came from: (text, origins), with one
+    (index into texts, index among that text's words) per word of text.
+    """
+    if confidences is None:
+        confidences = [None] * len(texts)
+    indexed = [(number, text, conf) for number, (text, conf) in enumerate(zip(texts, confidences))
+               if text and text.strip()]
+    if not indexed:
+        return "", []
+
+    source, text, conf = indexed[0]
+    first = tokenize(text)
+    first_words = sum(1 for token in first if not token.startswith('\n'))
+    weights, gap = _weights(first, conf)
+    columns = [_Column(token, {token: weight}, (source, number))
+               for token, weight, number in zip(first, weights, _word_numbers(first))]
+    # Sum of the gap weights of the passes merged so far, which new positions start with
+    absent = gap
+    merged = 1
+
+    for source, text, conf in indexed[1:]:
+        tokens = tokenize(text)
+        words = sum(1 for token in tokens if not token.startswith('\n'))
+        if not MIN_LENGTH_RATIO * first_words <= words <= MAX_LENGTH_RATIO * first_words:
+            continue
+        weights, gap = _weights(tokens, conf)
+        numbers = _word_numbers(tokens)
+
+        matcher = SequenceMatcher(None, [column.token for column in columns], tokens, autojunk=False)
+        merged_columns = []
+        for _, i1, i2, j1, j2 in matcher.get_opcodes():
+            # Pair positions in order; what is left over on either side is a gap or a new position
+            paired = min(i2 - i1, j2 - j1)
+            for offset in range(paired):
+                column = columns[i1 + offset]
+                column.vote(tokens[j1 + offset], weights[j1 + offset], (source, numbers[j1 + offset]))
+                merged_columns.append(column)
+            for column in columns[i1 + paired:i2]:
+                column.vote(None, gap)
+                merged_columns.append(column)
+            for j in range(j1 + paired, j2):
+                merged_columns.append(_Column(tokens[j], {None: absent, tokens[j]: weights[j]},
+                                              (source, numbers[j])))
+        columns = merged_columns
+        absent += gap
+        merged += 1
+
+    if merged == 1:
+        source, text, _ = indexed[0]
+        return text, [(source, number) for number in range(first_words)]
+    winners = [(column.winner(), column) for column in columns]
+    tokens = [token for token, _ in winners if token is not None]
+    origins = [column.origins[token] for token, column in winners
+               if token is not None and not token.startswith('\n')]
+    return join_tokens(tokens), origins
@@ -0,0 +1,161 @@
+"""
+Debug Artifacts
+---------------
+Saves the images the pipeline works on (the preprocessed image and every
+variant an OCR pass reads) for looking into bad results.
+
+Images are handed to a background writer thread, so encoding never holds up
+a scan. When the queue is full, new images are dropped rather than waited for.
+Every job gets its own file name prefix (time, file name, process and a
+counter), so concurrent scans and worker processes never overwrite each
+other. The directory is pruned to an age and total size limit as files are
+written.
+
+The GUI saves artifacts to ~/.ocr_app/debug; batch and watch runs only do so
+when given --debug-dir.
+"""
+
+import os
+import re
+import time
+import queue
+import itertools
+import threading
+
+from ocr_paths import data_path
+from ocr_log import get_logger
+
+log = get_logger("debug")
+
+
+# Format name -> (file extension, PIL save option the compression setting goes to, default)
+FORMATS = {
+    "png": (".png", "compress_level", 1),   # zlib level 0-9; 1 is fast and still small for scans
+    "jpeg": (".jpg", "quality", 90),
+    "webp": (".webp", "quality", 80),
+}
+
+# Retention limits of the debug directory
+MAX_BYTES = 256 * 1024 * 1024
+MAX_AGE_DAYS = 7
+
+# Images waiting to be written; more are dropped
+QUEUE_SIZE = 32
+
+# Retention is enforced when the writer starts and after this many files
+PRUNE_EVERY = 50
+
+_UNSAFE = re.compile(r'[^\w.-]+')
+
+
+def _safe(name):
+    return _UNSAFE.sub('-', name).strip('-') or "image"
+
+
+class DebugSink:
+    """Background writer of debug images with per-job names and a retention policy"""
+
+    def __init__(self, directory=None, fmt="png", compression=None, max_bytes=MAX_BYTES,
+                 max_age_days=MAX_AGE_DAYS, queue_size=QUEUE_SIZE):
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown debug image format: {fmt}")
+        self.directory = directory or data_path("debug")
+        self.fmt = fmt
+        extension, option, default = FORMATS[fmt]
+        self.extension = extension
+        self.save_options = {option: default if compression is None else compression}
+        self.max_bytes = max_bytes
+        self.max_age_days = max_age_days
+
+        self.written = 0
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._jobs = itertools.count(1)
+        self._images = itertools.count(1)
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def new_job(self, path=None):
+        """File name prefix for the artifacts of one scan"""
+        stem = os.path.splitext(os.path.basename(path))[0] if path else "image"
+        return f"{time.strftime('%Y%m%d-%H%M%S')}-{_safe(stem)[:40]}-{os.getpid()}-{next(self._jobs)}"
+
+    def capture(self, job, label, image, on_written=None):
+        """
+        Queue an image to be written as <job>-<n>-<label>; returns its path, or
+        None if the queue was full. on_written(path) is called on the writer
+        thread once the file is complete.
+        """
+        path = os.path.join(self.directory, f"{job}-{next(self._images):04d}-{_safe(label)}{self.extension}")
+        self._start()
+        try:
+            self._queue.put_nowait((path, image, on_written))
+        except queue.Full:
+            self.dropped += 1
+            return None
+        return path
+
+    def flush(self):
+        """Wait until every queued image is written"""
+        if self._thread is not None:
+            self._queue.join()
+
+    def _start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._write_loop, name="debug-writer", daemon=True)
+                self._thread.start()
+
+    def _write_loop(self):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            self.prune()
+        except OSError as e:
+            log.warning("Debug directory unavailable: %s", e)
+        while True:
+            path, image, on_written = self._queue.get()
+            try:
+                self._write(path, image)
+                self.written += 1
+                if on_written is not None:
+                    on_written(path)
+                if self.written % PRUNE_EVERY == 0:
+                    self.prune()
+            except Exception as e:
+                log.warning("Could not write debug image %s: %s", os.path.basename(path), e)
+            finally:
+                self._queue.task_done()
+
+    def _write(self, path, image):
+        if self.fmt == "jpeg" and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        tmp_path = f"{path}.tmp"
+        image.save(tmp_path, format=self.fmt.upper(), **self.save_options)
+        os.replace(tmp_path, path)
+
+    def prune(self):
+        """Remove artifacts older than max_age_days, then the oldest ones over max_bytes"""
+        cutoff = time.time() - self.max_age_days * 86400
+        files = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_file() or not entry.name.endswith(tuple(ext for ext, _, _ in FORMATS.values())):
+                continue
+            stat = entry.stat()
+            if stat.st_mtime < cutoff:
+                self._remove(entry.path)
+            else:
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,187 @@
+"""
+Near-Duplicate Detection
+------------------------
+Recognizes images that were already OCR'd in another file: the same form or
+screenshot saved again at another quality or resolution. An exact-byte hash
+misses those. A perceptual hash catches them, because it changes little when
+the image is re-encoded or rescaled.
+
+The hash is a 64-bit dHash: the image shrunk to 9x8 gray pixels, one bit per
+pair of horizontal neighbours telling whether brightness falls to the right.
+Hashes of earlier results are kept in a SQLite database shared by all worker
+processes. Each process also keeps them in a BK-tree, a metric tree that finds
+every hash within a Hamming distance without comparing against all of them,
+and loads new rows from other processes before each lookup.
+
+A perceptual match only says the images look alike, and two copies of a form
+filled in differently look alike too. So a match is verified before its
+result is reused: the new image and the earlier one are read by the same fast
+tesseract pass, and the earlier result is reused only when both read the same
+word for word, ignoring case, punctuation and spacing (see
+OCREngine.process_file). A different name or amount changes a word, so the
+form is read in full. Readings are stored with the hashes, and only taken when
+there is a match: an image with no near-duplicate costs no extra pass, and an
+earlier image is read again at most once, when it is first matched.
+"""
+
+import re
+import time
+import sqlite3
+import threading
+
+from PIL import Image
+
+from ocr_paths import data_path
+from ocr_trace import traced
+
+
+DEDUP_FILE = "dedup.db"
+
+# Largest Hamming distance between the 64-bit hashes of near-duplicates
+MAX_DISTANCE = 8
+
+# Words of a reading: runs of letters and digits
+_WORD_RE = re.compile(r"[^\W_]+")
+
+
+@traced("dedup:hash")
+def dhash(image):
+    """64-bit difference hash of a PIL image"""
+    pixels = list(image.convert('L').resize((9, 8), Image.BOX).getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def fingerprint(text):
+    """
+    The words of a reading, lowercased and without punctuation. Re-encoding or
+    rescaling an image can change the case, punctuation and spacing one pass
+    reads, but not its words.
+    """
+    return " ".join(_WORD_RE.findall(text.lower()))
+
+
+def hamming(a, b):
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """Burkhard-Keller tree of integer hashes under Hamming distance"""
+
+    def __init__(self):
+        # Node: [key, values, {distance: child node}]
+        self._root = None
+        self.size = 0
+
+    def add(self, key, value):
+        self.size += 1
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def find(self, key, max_distance):
+        """(distance, value) for every entry within max_distance of key, nearest first"""
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(key, node[0])
+            if distance <= max_distance:
+                found.extend((distance, value) for value in node[1])
+            # Triangle inequality: only children at distance d from the node can be within range
+            for edge, child in node[2].items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    stack.append(child)
+        found.sort(key=lambda item: item[0])
+        return found
+
+
+class DedupIndex:
+    """Perceptual hashes of OCR'd images with their results, shared across processes"""
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS images (
+            id INTEGER PRIMARY KEY,
+            hash TEXT NOT NULL,
+            path TEXT NOT NULL,
+            mode TEXT,
+            text TEXT NOT NULL,
+            added_at REAL NOT NULL,
+            reading TEXT
+        )
+    """
+
+    FIELDS = ("id", "hash", "path", "mode", "text", "reading")
+
+    def __init__(self, path=None, max_distance=MAX_DISTANCE):
+        self.path = path or data_path(DEDUP_FILE)
+        self.max_distance = max_distance
+        self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(self.SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(images)")}
+        if "reading" not in columns:
+            self._db.execute("ALTER TABLE images ADD COLUMN reading TEXT")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._tree = BKTree()
+        self._last_id = 0
+
+    def _refresh(self):
+        """Add rows written since the last lookup, by this or another process"""
+        rows = self._db.execute("SELECT id, hash FROM images WHERE id > ? ORDER BY id", (self._last_id,))
+        for row_id, key in rows:
+            self._tree.add(int(key, 16), row_id)
+            self._last_id = row_id
+
+    def find(self, key):
+        """
+        (distance, {"id", "hash", "path", "mode", "text", "reading"}) of every
+        earlier image within max_distance, nearest first; reading is None until
+        one is stored
+        """
+        with self._lock:
+            self._refresh()
+            matches = self._tree.find(key, self.max_distance)
+            found = []
+            for distance, row_id in matches:
+                row = self._db.execute(f"SELECT {', '.join(self.FIELDS)} FROM images WHERE id = ?",
+                                       (row_id,)).fetchone()
+                found.append((distance, dict(zip(self.FIELDS, row))))
+        return found
+
+    def add(self, key, path, result, reading=None):
+        """Remember an OCRResult, and the verification pass's reading if one was taken, under the hash of its image"""
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO images (hash, path, mode, text, added_at, reading) VALUES (?, ?, ?, ?, ?, ?)",
+                (f"{key:016x}", path, result.mode, result.text, time.time(),
+                 fingerprint(reading) if reading is not None else None))
+            self._db.commit()
+
+    def set_reading(self, row_id, reading):
+        """Store the verification pass's reading of an earlier image; returns its fingerprint"""
+        words = fingerprint(reading)
+        with self._lock:
+            self._db.execute("UPDATE images SET reading = ? WHERE id = ?", (words, row_id))
+            self._db.commit()
+        return words
+
+    def close(self):
+        self._db.close()
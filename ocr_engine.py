@@ -0,0 +1,218 @@
+"""
+Headless OCR Engine
+-------------------
+Runs the OCRApp processing pipeline without creating a Tk window so the same
+preprocessing and multi-pass extraction can be used from batch jobs and
+worker processes.
+"""
+
+from PIL import Image
+import pytesseract
+
+from ocr_app import OCRApp, OCR_MAX_PIXELS
+from ocr_events import ProgressBus
+from ocr_timing import StageTimer
+from ocr_result import OCRResult
+from ocr_pages import streams_pages, process_pages, open_image, full_size
+from ocr_debug import DebugSink
+from ocr_strips import open_strips
+from ocr_dedup import DedupIndex, dhash, fingerprint
+from ocr_passes import get_pass_stats, EXPLORE_EVERY
+from ocr_text import spelling_lexicon, confusion_table, language_model, CERTIFICATE_DOMAINS
+from ocr_log import get_logger, count
+
+log = get_logger("engine")
+
+
+class _Setting:
+    """Stand-in for a Tk variable when running without a window"""
+
+    def __init__(self, value=None):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+    def set(self, value):
+        self._value = value
+
+
+class OCREngine(OCRApp):
+    """The OCRApp pipeline with the Tk user interface stripped away"""
+
+    def __init__(self, mode="auto", preprocessing="none", ai_enhancement=False, lang="eng",
+                 check_tesseract=True, debug=None, dedup=None, auto_prune=False, keep_pass_text=False):
+        # No Tk root: progress is only published to the event bus below
+        self.root = None
+
+        # Plain settings in place of the Tk variables the pipeline reads
+        self.mode_var = _Setting(mode)
+        self.preproc_var = _Setting(preprocessing)
+        self.ai_var = _Setting(ai_enhancement)
+        self.lang_var = _Setting(lang)
+        self.status_var = _Setting("Ready")
+
+        # Progress events are kept for callers that want to poll them; the bound
+        # stops the queue from growing when nobody does
+        self.progress_bus = ProgressBus(maxlen=256)
+
+        self.current_image = None
+        self.current_image_path = None
+        self.extracted_text = ""
+
+        # Second engine that preprocesses the next page of a multi-page file, created on demand
+        self._page_preparer = None
+
+        # Debug artifacts are off unless DebugSink options are given
+        self.debug_sink = DebugSink(**debug) if debug is not None else None
+
+        # Near-duplicates of earlier images reuse their results when DedupIndex options are given
+        self.dedup = DedupIndex(**dedup) if dedup is not None else None
+
+        # Auto-prune skips passes that rarely improve the answer for their time (see ocr_passes)
+        self.auto_prune = auto_prune
+        self.skipped_passes = ()
+        self._jobs = 0
+
+        # The benchmark measures every candidate pass's CER, so it needs their texts
+        self.keep_pass_text = keep_pass_text
+
+        # Configure tesseract path based on OS
+        self.configure_tesseract()
+
+        # Probing spawns `tesseract --version`, so callers that already did it can skip it
+        if check_tesseract:
+            self.tesseract_installed, self.tesseract_message = self.check_tesseract_installed()
+        else:
+            self.tesseract_installed, self.tesseract_message = True, "Tesseract check skipped"
+
+    def warm_up(self):
+        """Run a tiny OCR pass so tesseract pages in its language data before the first real job"""
+        blank = Image.new("L", (64, 32), 255)
+        pytesseract.image_to_string(blank, config=f"-l {self.lang_var.get()} --psm 7")
+
+        # Map (or build, the first time) the spelling lexicons, confusions and language model
+        spelling_lexicon()
+        spelling_lexicon(CERTIFICATE_DOMAINS)
+        confusion_table()
+        language_model()
+
+    def process_file(self, image_path):
+        """Load an image (or every page of a multi-page file) and return its OCRResult"""
+        if self.auto_prune:
+            self._choose_skipped_passes()
+
+        # Huge uncompressed scans are read strip by strip from a memory map
+        large_source = open_strips(image_path)
+        if large_source is not None:
+            return self._recognize_large_image(large_source)
+
+        if streams_pages(image_path):
+            pages = []
+            for page in self.iter_file_pages(image_path):
+                if page.error:
+                    raise RuntimeError(f"Page {page.page}: {page.error}")
+                pages.append(page.result)
+            return OCRResult.from_pages(pages, path=image_path)
+
+        timer = StageTimer()
+        timer.begin("decode")
+        image = open_image(image_path, min_pixels=OCR_MAX_PIXELS)
+        if self.dedup is None:
+            return self.process_image(image, image_path, timer=timer)
+
+        key = dhash(image)
+        matches = self.dedup.find(key)
+        reading = None
+        if matches:
+            reading = self._dedup_reading(image, timer)
+            reused = self._reuse_duplicate(image, image_path, matches, reading, timer)
+            if reused is not None:
+                return reused
+        count("cache.dedup.miss")
+        result = self.process_image(image, image_path, timer=timer)
+        result.dedup = {"match": matches[0][1]["path"] if matches else None,
+                        "distance": matches[0][0] if matches else None, "reused": False}
+        self.dedup.add(key, image_path, result, reading)
+        return result
+
+    def _dedup_reading(self, image, timer=None):
+        """The text of the fast tesseract pass near-duplicates are compared by"""
+        if timer is not None:
+            self._reset_job_state()
+            self.stage_timer = timer
+            timer.begin("dedup")
+        return self._ocr_pass(image.convert('L'), f"--psm 3 --oem 1 -l {self.lang_var.get()}", "dedup:verify")
+
+    def _prior_reading(self, prior):
+        """
+        Stored reading of an earlier image, taking it now if it has none; None
+        when the earlier file is gone or no longer the image that was indexed
+        """
+        if prior["reading"] is not None:
+            return prior["reading"]
+        try:
+            image = open_image(prior["path"], min_pixels=OCR_MAX_PIXELS)
+        except Exception as e:
+            log.debug("Cannot read %s again to verify a near-duplicate: %s", prior["path"], e)
+            return None
+        if dhash(image) != int(prior["hash"], 16):
+            return None
+        return self.dedup.set_reading(prior["id"], self._dedup_reading(image))
+
+    def _reuse_duplicate(self, image, image_path, matches, reading, timer):
+        """
+        The earlier result of the nearest near-duplicate image whose reading has
+        the same words as this image's; None when the full pipeline must run.
+        """
+        words = fingerprint(reading)
+        for distance, prior in matches:
+            if self._prior_reading(prior) != words:
+                continue
+            timer.begin("done")
+            result = OCRResult(prior["text"], mode=prior["mode"], image_size=full_size(image),
+                               timings=timer.as_dict(), path=image_path)
+            result.dedup = {"match": prior["path"], "distance": distance, "reused": True}
+            count("cache.dedup.hit")
+            return result
+        count("dedup.rejected")
+        log.info("%s: looks like %s (distance %d) but reads differently",
+                 image_path, matches[0][1]['path'], matches[0][0])
+        return None
+
+    def _choose_skipped_passes(self):
+        """Skip the pruned passes, except on every EXPLORE_EVERY-th job, which refreshes the choice"""
+        if self._jobs % EXPLORE_EVERY == 0:
+            self.skipped_passes = ()
+            self._pruned = get_pass_stats().pruned()
+            if self._pruned:
+                log.info("Auto-prune: skipping %s (except every %dth job)", ", ".join(sorted(self._pruned)), EXPLORE_EVERY)
+        else:
+            self.skipped_passes = self._pruned
+        self._jobs += 1
+
+    def process_image(self, image, image_path=None, timer=None):
+        """Run the OCR pipeline on a PIL image and return its OCRResult"""
+        self.current_image = image
+        self.current_image_path = image_path
+
+        result, _ = self._run_ocr_pipeline(image.copy(), timer=timer)
+
+        self.extracted_text = result.text
+        return result
+
+    def _processed_image_written(self, path):
+        """No processed image viewer to update without a window"""
+
+    def iter_file_pages(self, path, max_in_flight=2):
+        """Yield a PageResult per page, preprocessing page N+1 while page N is recognized"""
+        if self._page_preparer is None:
+            self._page_preparer = OCREngine(
+                mode=self.mode_var.get(),
+                preprocessing=self.preproc_var.get(),
+                ai_enhancement=self.ai_var.get(),
+                lang=self.lang_var.get(),
+                check_tesseract=False,
+            )
+            self._page_preparer.debug_sink = self.debug_sink
+        return process_pages(path, self._page_preparer, self, max_in_flight=max_in_flight)
@@ -0,0 +1,100 @@
+"""
+Progress Event Bus
+------------------
+Carries progress, status and stage events from the OCR worker thread to the
+Tk main loop. The worker only appends to a deque (atomic, no locks, never
+blocks on the GUI); the main loop drains the queue on a timer and collapses
+bursts of progress updates into a single redraw.
+"""
+
+import time
+from collections import deque, namedtuple
+
+
+ProgressEvent = namedtuple("ProgressEvent", "kind value text timestamp")
+
+# Event kinds
+PROGRESS = "progress"  # value = percent complete, text = optional status text
+STATUS = "status"      # text = status bar message
+STAGE = "stage"        # text = name of the pipeline stage that just started
+CALL = "call"          # value = callable to run on the main thread, in order
+ESTIMATE = "estimate"  # value = {stage: expected seconds} for the running job
+
+
+class ProgressBus:
+    """Lock-free single-consumer queue of progress events"""
+
+    def __init__(self, maxlen=None):
+        # deque.append and deque.popleft are atomic, so producers and the
+        # consumer never need a lock
+        self._events = deque(maxlen=maxlen)
+
+    def publish(self, kind, value=None, text=None):
+        """Queue an event; safe to call from any thread"""
+        self._events.append(ProgressEvent(kind, value, text, time.monotonic()))
+
+    def progress(self, value, text=None):
+        """Report percent complete with an optional status message"""
+        self.publish(PROGRESS, value, text)
+
+    def status(self, text):
+        """Report a status bar message"""
+        self.publish(STATUS, None, text)
+
+    def stage(self, name):
+        """Report that a pipeline stage has started"""
+        self.publish(STAGE, None, name)
+
+    def estimate(self, expected):
+        """Report how long each stage of the running job is expected to take"""
+        self.publish(ESTIMATE, dict(expected))
+
+    def call(self, func):
+        """Ask the consumer to run func on its own thread"""
+        self.publish(CALL, func)
+
+    def drain(self):
+        """Remove and return every queued event in publish order"""
+        events = []
+        pop = self._events.popleft
+        while True:
+            try:
+                events.append(pop())
+            except IndexError:
+                return events
+
+    def __len__(self):
+        return len(self._events)
+
+
+def coalesce(events):
+    """
+    Collapse a burst of events into the minimum set of UI updates.
+
+    Yields ("progress", value, text) tuples plus (kind, value, text) for every
+    other event. Consecutive progress and status events are merged so only the latest
+    value and message are drawn; calls and stage changes keep their position so
+    completion callbacks are never overtaken by stale progress.
+    """
+    value = None
+    text = None
+    pending = False
+
+    for event in events:
+        if event.kind == PROGRESS:
+            value = event.value
+            if event.text:
+                text = event.text
+            pending = True
+        elif event.kind == STATUS:
+            text = event.text
+            pending = True
+        else:
+            if pending:
+                yield (PROGRESS, value, text)
+                value = text = None
+                pending = False
+            yield (event.kind, event.value, event.text)
+
+    if pending:
+        yield (PROGRESS, value, text)
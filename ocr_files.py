@@ -0,0 +1,68 @@
+"""
+Input and Output Files
+----------------------
+Which files are OCR'd, how their contents are fingerprinted, and where their
+text and word-table outputs are written. Shared by the batch command, the hot
+folder watcher and the full-text index.
+"""
+
+import os
+import hashlib
+
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.tif', '.tiff', '.pdf')
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """SHA-256 of a file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _has_namesake(image_path):
+    """Whether another image with the same name but a different extension is in the same folder"""
+    stem, extension = os.path.splitext(image_path)
+    for other in IMAGE_EXTENSIONS:
+        for variant in (other, other.upper()):
+            if variant != extension and os.path.exists(stem + variant):
+                return True
+    return False
+
+
+def output_path_for(image_path, output_dir=None, root=None):
+    """
+    Text output path for an image: next to it, or inside output_dir. With root,
+    the image's folder relative to root is kept under output_dir, so images of
+    the same name in different subfolders don't overwrite each other. The name
+    is the image's with .txt in place of its extension (scan.png -> scan.txt),
+    or after it (scan.png.txt) when an image of the same name with another
+    extension is next to it.
+    """
+    name = os.path.basename(image_path)
+    if not _has_namesake(image_path):
+        name = os.path.splitext(name)[0]
+    base = name + ".txt"
+    if not output_dir:
+        return os.path.join(os.path.dirname(image_path), base)
+    if root:
+        relative = os.path.relpath(os.path.dirname(os.path.abspath(image_path)), os.path.abspath(root))
+        if relative != os.curdir and not relative.startswith(os.pardir):
+            return os.path.join(output_dir, relative, base)
+    return os.path.join(output_dir, base)
+
+
+def write_result(result, output_dir=None, words_format=None, root=None):
+    """Write a JobResult's text, and its word table if words_format is set; returns the text path"""
+    output_path = output_path_for(result.path, output_dir, root)
+    os.makedirs(os.path.dirname(output_path) or os.curdir, exist_ok=True)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write(result.text)
+
+    words = result.result.words if result.result is not None else None
+    if words_format and words is not None:
+        from ocr_words import EXPORT_EXTENSIONS
+        words.export(words_format, os.path.splitext(output_path)[0] + EXPORT_EXTENSIONS[words_format])
+    return output_path
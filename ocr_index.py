@@ -0,0 +1,201 @@
+"""
+Full-Text Index
+---------------
+A SQLite FTS5 index of OCR output, kept up to date as batch and watch results
+come in and searched with `run_ocr.py search`.
+
+Each indexed file is one row in `documents`, with its path and the SHA-256 of
+its contents. Each line of its text is one row in `lines`, with its page,
+line number and, when the result had word boxes, the index of its first word
+in the word table and its bounding box. Hits therefore point back to where the
+text is on the page. `lines_fts` is an external-content FTS5 table over
+`lines`, kept in sync by triggers.
+
+Indexing a file again replaces only that file's rows, and is skipped if its
+contents have not changed.
+"""
+
+import time
+import sqlite3
+
+from ocr_paths import data_path
+from ocr_files import file_hash
+
+
+INDEX_FILE = "ocr_index.db"
+
+# Results per transaction when indexing from a sink
+INDEX_BATCH_SIZE = 100
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    sha256 TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS lines (
+    id INTEGER PRIMARY KEY,
+    doc INTEGER NOT NULL REFERENCES documents(id),
+    page INTEGER NOT NULL,
+    line INTEGER NOT NULL,
+    first_word INTEGER,
+    words INTEGER,
+    left INTEGER, top INTEGER, right INTEGER, bottom INTEGER,
+    text TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS lines_doc ON lines(doc);
+CREATE VIRTUAL TABLE IF NOT EXISTS lines_fts USING fts5(text, content='lines', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS lines_insert AFTER INSERT ON lines BEGIN
+    INSERT INTO lines_fts(rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS lines_delete AFTER DELETE ON lines BEGIN
+    INSERT INTO lines_fts(lines_fts, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+
+def index_path():
+    """Default location of the index"""
+    return data_path(INDEX_FILE)
+
+
+def word_lines(words):
+    """
+    (page, line, first_word, word_count, text, (left, top, right, bottom)) for
+    every text line of a WordTable; pages are numbered from 1 and lines from 1
+    within each page.
+    """
+    columns = words.columns
+    keys = list(zip(columns["page"], columns["block"], columns["par"], columns["line"]))
+    line = 0
+    first = 0
+    for index in range(1, len(keys) + 1):
+        if index < len(keys) and keys[index] == keys[first]:
+            continue
+        page = keys[first][0]
+        line = line + 1 if first and keys[first - 1][0] == page else 1
+        start = columns["start"][first]
+        end = columns["start"][index - 1] + columns["length"][index - 1]
+        left = min(columns["left"][first:index])
+        top = min(columns["top"][first:index])
+        right = max(l + w for l, w in zip(columns["left"][first:index], columns["width"][first:index]))
+        bottom = max(t + h for t, h in zip(columns["top"][first:index], columns["height"][first:index]))
+        yield page + 1, line, first, index - first, words.text[start:end], (left, top, right, bottom)
+        first = index
+
+
+def text_lines(result):
+    """The same tuples for a result without word boxes, from its text (page by page when it has pages)"""
+    pages = [page.text for page in result.pages] if result.pages else [result.text]
+    for page, text in enumerate(pages, start=1):
+        for line, line_text in enumerate((text or "").splitlines(), start=1):
+            if line_text.strip():
+                yield page, line, None, None, line_text, (None, None, None, None)
+
+
+class TextIndex:
+    """SQLite FTS5 index of OCR results"""
+
+    def __init__(self, path=None):
+        self.path = path or index_path()
+        self.db = sqlite3.connect(self.path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.db.commit()
+
+    def add(self, path, result, sha256=None):
+        """Index an OCRResult for the file at path, replacing that file's earlier rows; False if unchanged"""
+        sha256 = sha256 or file_hash(path)
+        row = self.db.execute("SELECT id, sha256 FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[1] == sha256:
+            return False
+        if row is not None:
+            # Only this file's rows change; the triggers take them out of the FTS index
+            self.db.execute("DELETE FROM lines WHERE doc = ?", (row[0],))
+            self.db.execute("UPDATE documents SET sha256 = ?, indexed_at = ? WHERE id = ?",
+                            (sha256, time.time(), row[0]))
+            doc = row[0]
+        else:
+            doc = self.db.execute("INSERT INTO documents (path, sha256, indexed_at) VALUES (?, ?, ?)",
+                                  (path, sha256, time.time())).lastrowid
+
+        lines = word_lines(result.words) if result.words is not None else text_lines(result)
+        self.db.executemany(
+            "INSERT INTO lines (doc, page, line, first_word, words, left, top, right, bottom, text) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ((doc, page, line, first, count, *box, text) for page, line, first, count, text, box in lines))
+        return True
+
+    def remove(self, path):
+        """Drop a file from the index"""
+        row = self.db.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self.db.execute("DELETE FROM lines WHERE doc = ?", (row[0],))
+            self.db.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+
+    def commit(self):
+        self.db.commit()
+
+    def search(self, query, limit=20, raw=False):
+        """
+        Best matching lines for query, as dicts ordered by BM25 rank. Words in
+        the query must all appear in a line; with raw=True the query is passed
+        to FTS5 as is (phrases, prefix*, OR, NEAR).
+        """
+        if not raw:
+            query = " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+        if not query:
+            return []
+        rows = self.db.execute(
+            "SELECT d.path, l.page, l.line, l.first_word, l.words, l.left, l.top, l.right, l.bottom, "
+            "       snippet(lines_fts, 0, '[', ']', '...', 16), bm25(lines_fts) AS rank "
+            "FROM lines_fts JOIN lines l ON l.id = lines_fts.rowid JOIN documents d ON d.id = l.doc "
+            "WHERE lines_fts MATCH ? ORDER BY rank LIMIT ?", (query, limit)).fetchall()
+        return [{"path": path, "page": page, "line": line, "first_word": first, "words": count,
+                 "box": [left, top, right, bottom] if left is not None else None,
+                 "snippet": snippet, "rank": rank}
+                for path, page, line, first, count, left, top, right, bottom, snippet, rank in rows]
+
+    def stats(self):
+        documents = self.db.execute("SELECT count(*) FROM documents").fetchone()[0]
+        lines = self.db.execute("SELECT count(*) FROM lines").fetchone()[0]
+        return {"documents": documents, "lines": lines}
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+
+class IndexSink:
+    """Result sink (see ocr_sinks) that keeps a TextIndex up to date"""
+
+    name = "index"
+
+    def __init__(self, path=None, batch_size=INDEX_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        # Opened on the writer thread, which owns the connection
+        self._index = None
+        self._pending = 0
+
+    def write(self, job):
+        if job.error or job.result is None:
+            return
+        if self._index is None:
+            self._index = TextIndex(self.path)
+        self._index.add(job.path, job.result)
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._index is not None and self._pending:
+            self._index.commit()
+            self._pending = 0
+
+    def close(self):
+        if self._index is not None:
+            self._index.close()
+            self._index = None
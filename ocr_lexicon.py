@@ -0,0 +1,385 @@
+"""
+Lexicon Spelling Correction
+---------------------------
+Corrects OCR misreadings against word lists ("lexicons") using a symmetric
+delete index (the SymSpell approach): every word is stored under each string
+obtainable by deleting up to max_distance characters from its prefix, so a
+lookup only has to generate the deletes of the misread word and look them up,
+with no scan over the vocabulary.
+
+The index is built once per set of lexicon files and cached on disk as a flat
+hash table in CSR layout (bucket offsets, entry hashes, entry word ids), which
+is memory-mapped on later runs instead of being rebuilt, and shared between
+forked worker processes.
+
+Lexicons are plain text files with one word per line, optionally followed by
+a frequency count. The bundled lists live in lexicons/ next to this module;
+files with the same name in ~/.ocr_app/lexicons/ are merged in, and new names
+there add domains.
+"""
+
+import os
+import sys
+import mmap
+import struct
+import hashlib
+import threading
+from array import array
+from collections import namedtuple
+
+from ocr_paths import data_path
+
+
+BUNDLED_LEXICON_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lexicons")
+
+DEFAULT_DOMAINS = ("english",)
+
+# Deletes are generated from at most this many leading characters, which keeps
+# the index small; candidates are always checked against the full word
+PREFIX_LENGTH = 7
+MAX_DISTANCE = 2
+
+# Words shorter than this are too ambiguous to correct
+MIN_CORRECTION_LENGTH = 4
+
+Suggestion = namedtuple("Suggestion", "term distance count")
+
+_MAGIC = b"OCRLEX01"
+# magic, max_distance, prefix_length, words, buckets, entries, word bytes
+_HEADER = struct.Struct("=8s6I")
+
+
+def lexicon_dirs():
+    """Directories searched for lexicon files, bundled first"""
+    return [BUNDLED_LEXICON_DIR, data_path("lexicons")]
+
+
+def lexicon_files(domain):
+    """Every file that contributes words to a domain"""
+    return [
+        os.path.join(directory, domain + ".txt")
+        for directory in lexicon_dirs()
+        if os.path.isfile(os.path.join(directory, domain + ".txt"))
+    ]
+
+
+def read_lexicon(path):
+    """{word: count} from a lexicon file; missing counts follow line order"""
+    with open(path, 'r', encoding='utf-8') as f:
+        lines = [line.split() for line in f if line.strip() and not line.lstrip().startswith('#')]
+
+    words = {}
+    for rank, fields in enumerate(lines):
+        word = fields[0].lower()
+        count = int(fields[1]) if len(fields) > 1 and fields[1].isdigit() else len(lines) - rank
+        # A count of zero would read as "not in the lexicon"
+        count = max(count, 1)
+        words[word] = max(words.get(word, 0), count)
+    return words
+
+
+def _delete_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _deletes(word, max_distance):
+    """word itself plus every string made by deleting up to max_distance characters"""
+    found = {word}
+    frontier = [word]
+    for _ in range(max_distance):
+        next_frontier = []
+        for item in frontier:
+            if len(item) <= 1:
+                continue
+            for index in range(len(item)):
+                shorter = item[:index] + item[index + 1:]
+                if shorter not in found:
+                    found.add(shorter)
+                    next_frontier.append(shorter)
+        frontier = next_frontier
+    return found
+
+
+def edit_distance(a, b, max_distance):
+    """Optimal string alignment distance, or max_distance + 1 if it is larger"""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+
+    # A shared prefix or suffix never changes the distance
+    start = 0
+    limit = min(len(a), len(b))
+    while start < limit and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < limit - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a = a[start:len(a) - end]
+    b = b[start:len(b) - end]
+    if not a or not b:
+        return len(a) or len(b)
+
+    too_far = max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        char = a[i - 1]
+        current = [i] + [too_far] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            value = previous[j - 1] if char == b[j - 1] else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if (previous_previous is not None and j > 1 and char == b[j - 2] and a[i - 2] == b[j - 1]
+                    and previous_previous[j - 2] + 1 < value):
+                value = previous_previous[j - 2] + 1
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return too_far
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else too_far
+
+
+def _section(buffer, offset, count, typecode, itemsize):
+    """(memoryview of count items, offset of the next 8-byte aligned section)"""
+    end = offset + count * itemsize
+    view = buffer[offset:end]
+    if typecode != 'B':
+        view = view.cast(typecode)
+    return view, (end + 7) & ~7
+
+
+class LexiconIndex:
+    """Memory-mapped symmetric delete index over a fixed vocabulary"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = buffer = memoryview(self._map)
+
+        magic, self.max_distance, self.prefix_length, word_count, bucket_count, entry_count, word_bytes = \
+            _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not a lexicon index")
+
+        offset = (_HEADER.size + 7) & ~7
+        self._word_offsets, offset = _section(buffer, offset, word_count + 1, 'I', 4)
+        self._counts, offset = _section(buffer, offset, word_count, 'I', 4)
+        self._words, offset = _section(buffer, offset, word_bytes, 'B', 1)
+        self._bucket_offsets, offset = _section(buffer, offset, bucket_count + 1, 'I', 4)
+        self._entry_hashes, offset = _section(buffer, offset, entry_count, 'Q', 8)
+        self._entry_words, offset = _section(buffer, offset, entry_count, 'I', 4)
+        self._mask = bucket_count - 1
+        self.word_count = word_count
+
+    @staticmethod
+    def build(words, path, max_distance=MAX_DISTANCE, prefix_length=PREFIX_LENGTH):
+        """Write the index for {word: count} to path"""
+        vocabulary = sorted(words)
+        postings = {}
+        for word_id, word in enumerate(vocabulary):
+            for delete in _deletes(word[:prefix_length], max_distance):
+                postings.setdefault(_delete_hash(delete), []).append(word_id)
+
+        # Power-of-two bucket count with at most one key per bucket on average
+        bucket_count = 1
+        while bucket_count < len(postings):
+            bucket_count *= 2
+        mask = bucket_count - 1
+
+        bucket_offsets = array('I', [0]) * (bucket_count + 1)
+        entry_hashes = array('Q')
+        entry_words = array('I')
+        for key in sorted(postings, key=lambda key: (key & mask, key)):
+            for word_id in postings[key]:
+                entry_hashes.append(key)
+                entry_words.append(word_id)
+            bucket_offsets[(key & mask) + 1] += len(postings[key])
+        for bucket in range(bucket_count):
+            bucket_offsets[bucket + 1] += bucket_offsets[bucket]
+
+        encoded = [word.encode('utf-8') for word in vocabulary]
+        word_offsets = array('I', [0])
+        for item in encoded:
+            word_offsets.append(word_offsets[-1] + len(item))
+        counts = array('I', (min(words[word], 0xFFFFFFFF) for word in vocabulary))
+        blob = b''.join(encoded)
+
+        sections = [word_offsets.tobytes(), counts.tobytes(), blob, bucket_offsets.tobytes(),
+                    entry_hashes.tobytes(), entry_words.tobytes()]
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            header = _HEADER.pack(_MAGIC, max_distance, prefix_length, len(vocabulary),
+                                  bucket_count, len(entry_hashes), len(blob))
+            f.write(header)
+            for section in [b''] + sections:
+                f.write(b'\0' * (-f.tell() % 8))
+                f.write(section)
+        os.replace(tmp_path, path)
+
+    def word(self, word_id):
+        return bytes(self._words[self._word_offsets[word_id]:self._word_offsets[word_id + 1]]).decode('utf-8')
+
+    def _word_ids(self, text):
+        key = _delete_hash(text)
+        bucket = key & self._mask
+        hashes = self._entry_hashes
+        ids = self._entry_words
+        for entry in range(self._bucket_offsets[bucket], self._bucket_offsets[bucket + 1]):
+            if hashes[entry] == key:
+                yield ids[entry]
+
+    def count(self, word):
+        """Frequency count of a vocabulary word, or 0 if it is not in the vocabulary"""
+        for word_id in self._word_ids(word[:self.prefix_length]):
+            if self.word(word_id) == word:
+                return self._counts[word_id]
+        return 0
+
+    def __contains__(self, word):
+        return self.count(word) > 0
+
+    def lookup(self, word, max_distance=None):
+        """Vocabulary words within max_distance edits of word, closest and most frequent first"""
+        max_distance = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        prefix = word[:self.prefix_length]
+
+        candidates = set()
+        for delete in _deletes(prefix, max_distance):
+            candidates.update(self._word_ids(delete))
+
+        suggestions = []
+        for word_id in candidates:
+            term = self.word(word_id)
+            distance = edit_distance(word, term, max_distance)
+            if distance <= max_distance:
+                suggestions.append(Suggestion(term, distance, self._counts[word_id]))
+        suggestions.sort(key=lambda s: (s.distance, -s.count, s.term))
+        return suggestions
+
+    def close(self):
+        # Views into the map must be released before it can be closed
+        for view in (self._word_offsets, self._counts, self._words, self._bucket_offsets,
+                     self._entry_hashes, self._entry_words, self._buffer):
+            view.release()
+        self._map.close()
+        self._file.close()
+
+
+class Lexicon:
+    """Spelling corrector for one or more lexicon domains"""
+
+    def __init__(self, domains=DEFAULT_DOMAINS, extra_words=(), max_distance=MAX_DISTANCE):
+        self.domains = tuple(domains)
+        self.files = [path for domain in self.domains for path in lexicon_files(domain)]
+        self.extra_words = sorted({word.lower() for word in extra_words})
+        self.max_distance = max_distance
+        self.index = self._load_index()
+        # Corrections already worked out, by word; OCR output repeats words a lot
+        self._corrections = {}
+
+    def _fingerprint(self):
+        """Identifies the inputs of the index, so edited lexicons trigger a rebuild"""
+        digest = hashlib.blake2b(digest_size=8)
+        digest.update(f"{_MAGIC!r} {self.max_distance} {PREFIX_LENGTH} {sys.byteorder}".encode())
+        for path in self.files:
+            stat = os.stat(path)
+            digest.update(f"{os.path.abspath(path)} {stat.st_size} {stat.st_mtime_ns}\n".encode())
+        digest.update("\n".join(self.extra_words).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _load_index(self):
+        cache_dir = data_path("lexicon_cache")
+        name = '+'.join(self.domains)
+        path = os.path.join(cache_dir, f"{name}-{self._fingerprint()}.idx")
+        if not os.path.exists(path):
+            words = {}
+            for lexicon_path in self.files:
+                for word, count in read_lexicon(lexicon_path).items():
+                    words[word] = max(words.get(word, 0), count)
+            for word in self.extra_words:
+                words.setdefault(word, 1)
+            LexiconIndex.build(words, path, max_distance=self.max_distance)
+            self._remove_stale_indexes(cache_dir, name, path)
+        return LexiconIndex(path)
+
+    @staticmethod
+    def _remove_stale_indexes(cache_dir, name, current):
+        """Delete indexes of this domain set built from older lexicon files"""
+        for entry in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, entry)
+            if entry.startswith(name + "-") and entry.endswith(".idx") and path != current:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def __contains__(self, word):
+        return word.lower() in self.index
+
+    def count(self, word):
+        return self.index.count(word.lower())
+
+    def lookup(self, word, max_distance=None):
+        return self.index.lookup(word.lower(), max_distance)
+
+    def correction(self, word):
+        """
+        The lexicon word a token was most likely misread from, or None.
+
+        Deliberately conservative, since a word missing from the lexicon is
+        more often a rare word than a misreading: only alphabetic words of at
+        least MIN_CORRECTION_LENGTH letters are considered, words shorter than
+        eight letters only get single-edit corrections, capitalized words
+        (often names) only get them from six letters up, and nothing is
+        changed unless exactly one lexicon word is closest.
+        """
+        if len(word) < MIN_CORRECTION_LENGTH or not word.isalpha():
+            return None
+        if word[0].isupper() and not word.isupper():
+            if len(word) < 6:
+                return None
+            max_distance = 1
+        else:
+            max_distance = 1 if len(word) < 8 else self.max_distance
+
+        key = word.lower()
+        try:
+            return self._corrections[key, max_distance]
+        except KeyError:
+            pass
+
+        correction = None
+        if key not in self.index:
+            suggestions = self.index.lookup(key, max_distance)
+            if suggestions and (len(suggestions) == 1 or suggestions[1].distance > suggestions[0].distance):
+                correction = suggestions[0].term
+
+        if len(self._corrections) < 100000:
+            self._corrections[key, max_distance] = correction
+        return correction
+
+    def close(self):
+        self.index.close()
+
+
+_lexicons = {}
+_lexicons_lock = threading.Lock()
+
+
+def get_lexicon(domains=DEFAULT_DOMAINS, extra_words=()):
+    """Process-wide Lexicon for a set of domains, built or mapped on first use"""
+    key = tuple(domains)
+    with _lexicons_lock:
+        if key not in _lexicons:
+            _lexicons[key] = Lexicon(key, extra_words=extra_words)
+        return _lexicons[key]
@@ -0,0 +1,112 @@
+"""
+Logging and Counters
+--------------------
+Diagnostics of the pipeline go through the standard logging module, under the
+"ocr" logger, with one level below DEBUG: TRACE, the only level at which text
+bodies are logged. Messages use logging's lazy %-formatting, so a message
+below the configured level costs a method call and nothing else.
+
+What used to be printed for every scan (which extractor ran, how a result was
+selected, retries) is counted instead. Counters are cheap, are added up across
+the worker pool, and are reported once at the end of a batch or watch run.
+
+The level comes from --log-level or the OCR_LOG_LEVEL environment variable.
+It defaults to INFO in the desktop application and WARNING in batch and watch
+runs, where console output would cost time and interleave across workers.
+"""
+
+import os
+import logging
+import threading
+from collections import Counter
+
+
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+LOG_ENV = "OCR_LOG_LEVEL"
+
+LEVELS = ("trace", "debug", "info", "warning", "error")
+
+LOG_FORMAT = "%(levelname)s %(processName)s %(name)s: %(message)s"
+
+
+def get_logger(name):
+    """Logger for one module of the pipeline"""
+    return logging.getLogger(f"ocr.{name}")
+
+
+def configure(level=None, default="info"):
+    """
+    Send the "ocr" loggers to stderr at level (a name from LEVELS), else at
+    OCR_LOG_LEVEL, else at default. The level is exported in the environment,
+    so worker processes started later configure themselves the same way.
+    """
+    name = (level or os.environ.get(LOG_ENV) or default).lower()
+    os.environ[LOG_ENV] = name
+    logger = logging.getLogger("ocr")
+    logger.setLevel(TRACE if name == "trace" else getattr(logging, name.upper()))
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        logger.addHandler(handler)
+        logger.propagate = False
+    return logger
+
+
+class lazy:
+    """Log argument computed only if the message is emitted: lazy(func, *args)"""
+
+    __slots__ = ("func", "args")
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+_counters = Counter()
+_counters_lock = threading.Lock()
+
+
+def count(name, amount=1):
+    """Add to a named counter"""
+    with _counters_lock:
+        _counters[name] += amount
+
+
+def drain_counters():
+    """This process's counts since the last drain, as a plain dict"""
+    with _counters_lock:
+        counts = dict(_counters)
+        _counters.clear()
+    return counts
+
+
+def merge_counters(counts):
+    """Add counts drained in another process"""
+    if counts:
+        with _counters_lock:
+            _counters.update(counts)
+
+
+def reset_counters():
+    with _counters_lock:
+        _counters.clear()
+
+
+def counters():
+    """Current totals of the counters, as a plain dict"""
+    with _counters_lock:
+        return dict(_counters)
+
+
+def format_counters():
+    """The counters as report lines, grouped by their first dotted component"""
+    groups = {}
+    for name, value in sorted(counters().items()):
+        group, _, rest = name.partition(".")
+        groups.setdefault(group, []).append(f"{rest or group} {value}")
+    return "\n".join(f"Counters {group}: {', '.join(items)}" for group, items in groups.items())
@@ -0,0 +1,365 @@
+"""
+Metrics
+-------
+Counters, gauges and histograms of a batch or watch run, in the Prometheus
+text exposition format: jobs and their outcome, queue depth, per-mode job and
+tesseract pass latency, tesseract calls, cache hits and worker memory.
+
+They can be served on a local HTTP endpoint (run_ocr.py batch/watch
+--metrics-port PORT, then http://127.0.0.1:PORT/metrics) and written to a file
+every few seconds (--metrics-file FILE), which node_exporter's textfile
+collector can pick up or a person can simply read.
+
+Histograms have a fixed array of bucket bounds: an observation is one bisect
+and two additions, with no allocation. Metrics are updated on the pool's
+result thread, one job at a time. A scrape copies the list of series under
+the metric's lock, since new label values may be added meanwhile, but reads
+the values without locking, so it may see a histogram's sum one observation
+ahead of its buckets.
+"""
+
+import os
+import sys
+import time
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ocr_log
+from ocr_paths import write_text_atomic
+
+log = ocr_log.get_logger("metrics")
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Upper bounds, in seconds, of the latency buckets
+JOB_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+PASS_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0)
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"') for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount=1):
+        self.value += amount
+
+
+class _GaugeValue(_CounterValue):
+    __slots__ = ()
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+
+class _HistogramValue:
+    __slots__ = ("bounds", "counts", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # One count per bucket plus the +Inf bucket; cumulated only when rendered
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class Metric:
+    """
+    A named metric with label names. labels(*values) returns the series for
+    one set of label values (create it once and keep it on hot paths). A metric
+    given a function has no series of its own: function() returns its value,
+    or {label values tuple: value} when it has labels, whenever it is rendered.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.function = function
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _new_series(self):
+        raise NotImplementedError
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        series = self._series.get(key)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(key, self._new_series())
+        return series
+
+    def series(self):
+        """(label values, series) pairs, sorted; a copy, so new series may be added meanwhile"""
+        with self._lock:
+            return sorted(self._series.items(), key=lambda item: item[0])
+
+    def _samples(self):
+        """(suffix, label names, label values, value) of every sample"""
+        if self.function is not None:
+            values = self.function()
+            if not self.labelnames:
+                values = {(): values}
+            for key, value in sorted(values.items()):
+                if value is not None:
+                    yield "", self.labelnames, key, value
+            return
+        for key, series in self.series():
+            yield "", self.labelnames, key, series.value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, names, values, value in self._samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_series(self):
+        return _CounterValue()
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def _new_series(self):
+        return _GaugeValue()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=JOB_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_series(self):
+        return _HistogramValue(self.buckets)
+
+    def _samples(self):
+        names = self.labelnames + ("le",)
+        for key, series in self.series():
+            counts = list(series.counts)
+            total = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                total += bucket_count
+                yield "_bucket", names, key + (_format_value(bound),), total
+            yield "_sum", self.labelnames, key, series.sum
+            yield "_count", self.labelnames, key, total
+
+
+class Registry:
+    """The metrics rendered together on one endpoint or snapshot"""
+
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+_started = time.time()
+
+# The worker pool being measured, set by track_pool
+_pool = None
+
+# Latest resident set size of each worker process, by pid, most recent report last
+_worker_rss = OrderedDict()
+_worker_rss_lock = threading.Lock()
+
+
+def track_pool(pool):
+    """Report the queue depth and workers of an OCRWorkerPool"""
+    global _pool
+    _pool = pool
+    with _worker_rss_lock:
+        _worker_rss.clear()
+
+
+def current_rss():
+    """Resident set size of this process in bytes, or None where it cannot be read"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    # Only the peak is available here: kilobytes on Linux, bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _jobs_per_second():
+    elapsed = time.time() - _started
+    done = sum(series.value for _, series in JOBS.series())
+    return done / elapsed if elapsed > 0 else 0.0
+
+
+def _worker_rss_values():
+    # Workers are recycled, so only as many pids as the pool has workers are current
+    with _worker_rss_lock:
+        current = list(_worker_rss.items())[-_pool.workers:] if _pool is not None else []
+    return {(str(pid),): rss for pid, rss in current}
+
+
+def _cache_requests():
+    requests = {}
+    for name, value in ocr_log.counters().items():
+        group, _, rest = name.partition(".")
+        cache, _, result = rest.partition(".")
+        if group == "cache" and result:
+            requests[(cache, result)] = value
+    return requests
+
+
+def _events():
+    return {(name,): value for name, value in ocr_log.counters().items() if not name.startswith("cache.")}
+
+
+JOBS = REGISTRY.register(Counter("ocr_jobs_total", "OCR jobs finished, by outcome", ["status"]))
+THROUGHPUT = REGISTRY.register(Gauge("ocr_jobs_per_second", "Jobs finished per second since start",
+                                     function=_jobs_per_second))
+QUEUE_DEPTH = REGISTRY.register(Gauge("ocr_queue_depth", "Jobs submitted to the worker pool and not finished",
+                                      function=lambda: _pool.pending if _pool is not None else 0))
+WORKERS = REGISTRY.register(Gauge("ocr_workers", "Worker processes in the pool",
+                                  function=lambda: _pool.workers if _pool is not None else 0))
+JOB_SECONDS = REGISTRY.register(Histogram("ocr_job_duration_seconds", "Latency of OCR jobs, by detected mode",
+                                          ["mode"], buckets=JOB_BUCKETS))
+PASS_SECONDS = REGISTRY.register(Histogram("ocr_tesseract_pass_duration_seconds",
+                                           "Latency of single tesseract passes, by mode", ["mode"],
+                                           buckets=PASS_BUCKETS))
+TESSERACT_CALLS = REGISTRY.register(Counter("ocr_tesseract_calls_total", "Tesseract invocations, by mode", ["mode"]))
+CACHE_REQUESTS = REGISTRY.register(Counter("ocr_cache_requests_total", "Cache lookups, by cache and hit or miss",
+                                           ["cache", "result"], function=_cache_requests))
+EVENTS = REGISTRY.register(Counter("ocr_events_total", "Pipeline events counted by the workers (see ocr_log)",
+                                   ["event"], function=_events))
+WORKER_RSS = REGISTRY.register(Gauge("ocr_worker_rss_bytes", "Resident memory of each worker after its latest job",
+                                     ["pid"], function=_worker_rss_values))
+PROCESS_RSS = REGISTRY.register(Gauge("ocr_process_rss_bytes", "Resident memory of the parent process",
+                                      function=current_rss))
+UPTIME = REGISTRY.register(Gauge("ocr_uptime_seconds", "Seconds since the metrics started",
+                                 function=lambda: time.time() - _started))
+
+
+def record_job(job):
+    """Add one JobResult of the worker pool"""
+    JOBS.labels("failed" if job.error else "ok").inc()
+    if job.rss is not None:
+        with _worker_rss_lock:
+            _worker_rss.pop(job.worker_pid, None)
+            _worker_rss[job.worker_pid] = job.rss
+    result = job.result
+    mode = (result.mode if result is not None else None) or "unknown"
+    JOB_SECONDS.labels(mode).observe(job.seconds)
+    if result is not None and result.timings:
+        passes = result.timings["passes"]
+        TESSERACT_CALLS.labels(mode).inc(len(passes))
+        pass_seconds = PASS_SECONDS.labels(mode)
+        for item in passes:
+            pass_seconds.observe(item["seconds"])
+
+
+class _Handler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug("%s " + format, self.address_string(), *args)
+
+
+class MetricsServer:
+    """GET /metrics on a local port, served from a background thread"""
+
+    def __init__(self, port, host="127.0.0.1", registry=REGISTRY):
+        handler = type("MetricsHandler", (_Handler,), {"registry": registry})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="metrics-http", daemon=True)
+        self._thread.start()
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/metrics"
+
+    def close(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+
+class SnapshotWriter:
+    """Rewrites the metrics to a file every interval seconds, and once more on close"""
+
+    def __init__(self, path, interval=15.0, registry=REGISTRY):
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="metrics-snapshot", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.write()
+
+    def write(self):
+        try:
+            write_text_atomic(self.path, self.registry.render(), suffix=".prom")
+        except OSError as e:
+            log.warning("Could not write metrics to %s: %s", self.path, e)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.write()
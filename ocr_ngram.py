@@ -0,0 +1,217 @@
+"""
+Character N-gram Language Model
+-------------------------------
+How much a piece of text looks like real language, from character 5-gram
+counts. This is the measure candidate selection needs: word counts and
+letter ratios can't tell "Tbe rneeting" from "The meeting", but the n-gram
+counts can.
+
+N-grams are taken over the UTF-8 bytes of the text, which for English are its
+characters. Counts for every n-gram up to the model order are stored in one
+flat table of 32-bit counters addressed by a CRC-32 of the n-gram (collisions
+just add counts). The table is written once, by build() from a text corpus, and then
+memory-mapped, so loading costs nothing and forked workers share the pages.
+Text is scored with stupid backoff: the probability of each character given
+the previous order - 1, falling back to shorter contexts at a fixed discount
+when the longer one was never seen.
+
+A model built from a corpus with `run_ocr.py build-language-model` is saved
+in ~/.ocr_app/models/. Until one exists, a model of the words in the lexicons
+is built and cached next to the lexicon indexes.
+"""
+
+import os
+import re
+import sys
+import math
+import mmap
+import zlib
+import struct
+import hashlib
+import threading
+from array import array
+from collections import Counter
+
+from ocr_lexicon import DEFAULT_DOMAINS, lexicon_files, read_lexicon
+from ocr_paths import data_path
+
+
+ORDER = 5
+
+# 2**TABLE_BITS counters of 4 bytes each (4 MB); a word list needs far fewer
+TABLE_BITS = 20
+LEXICON_TABLE_BITS = 16
+
+# Probability factor for each step back to a shorter context
+BACKOFF = 0.4
+
+MODEL_FILE = "char5.ngram"
+
+_MAGIC = b"OCRNGM01"
+# magic, order, table bits, total characters
+_HEADER = struct.Struct("=8s2IQ")
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def normalize(text):
+    """Lower case with whitespace runs as single spaces, padded with a space at each end"""
+    return ' ' + _WHITESPACE.sub(' ', text.lower()).strip() + ' '
+
+
+def model_path():
+    """Where the model built from a corpus is kept"""
+    return data_path("models", MODEL_FILE)
+
+
+class NgramModel:
+    """Memory-mapped character n-gram counts"""
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer = memoryview(self._map)
+
+        magic, self.order, table_bits, self.total = _HEADER.unpack_from(self._buffer, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"{path} is not an n-gram model")
+        offset = (_HEADER.size + 7) & ~7
+        self._counts = self._buffer[offset:offset + 4 * (1 << table_bits)].cast('I')
+        self._mask = (1 << table_bits) - 1
+        # Floor for characters never seen at all
+        self._unseen = math.log(1 / (self.total + len(self._counts)))
+
+    @staticmethod
+    def build(texts, path, order=ORDER, table_bits=TABLE_BITS):
+        """
+        Count the n-grams of an iterable of texts, or of (text, weight) pairs, and write the model to path.
+        """
+        counts = array('I', [0]) * (1 << table_bits)
+        mask = (1 << table_bits) - 1
+        total = 0
+        for item in texts:
+            text, weight = item if isinstance(item, tuple) else (item, 1)
+            data = normalize(text).encode('utf-8')
+            total += len(data) * weight
+            for length in range(1, order + 1):
+                grams = Counter(data[start:start + length] for start in range(len(data) - length + 1))
+                for gram, count in grams.items():
+                    slot = zlib.crc32(gram) & mask
+                    counts[slot] = min(counts[slot] + count * weight, 0xFFFFFFFF)
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, order, table_bits, total))
+            f.write(b'\0' * (-f.tell() % 8))
+            f.write(counts.tobytes())
+        os.replace(tmp_path, path)
+
+    def count(self, gram):
+        """How often gram (already normalized) occurred"""
+        if isinstance(gram, str):
+            gram = gram.encode('utf-8')
+        return self._counts[zlib.crc32(gram) & self._mask]
+
+    def log_probability(self, text, normalized=False):
+        """Natural log probability of text under the model (lower for less language-like text)"""
+        if not normalized:
+            text = normalize(text)
+        data = text.encode('utf-8')
+        counts = self._counts
+        mask = self._mask
+        order = self.order
+        backoff = math.log(BACKOFF)
+        total = 0.0
+        for end in range(1, len(data)):
+            # Predict byte end from up to order - 1 bytes before it; the leading pad is context only
+            discount = 0.0
+            for length in range(min(order, end + 1), 0, -1):
+                seen = counts[zlib.crc32(data[end - length + 1:end + 1]) & mask]
+                if seen:
+                    context = counts[zlib.crc32(data[end - length + 1:end]) & mask] if length > 1 else self.total
+                    total += discount + math.log(seen / max(seen, context))
+                    break
+                discount += backoff
+            else:
+                total += discount + self._unseen
+        return total
+
+    def score(self, text):
+        """Mean log probability per byte of UTF-8, comparable between texts of different lengths"""
+        text = normalize(text)
+        size = len(text.encode('utf-8'))
+        if size < 2:
+            return self._unseen
+        return self.log_probability(text, normalized=True) / (size - 1)
+
+    def close(self):
+        self._counts.release()
+        self._buffer.release()
+        self._map.close()
+        self._file.close()
+
+
+def _lexicon_model_path(domains):
+    """Cache path of the model built from the lexicons, named after their contents"""
+    files = [path for domain in domains for path in lexicon_files(domain)]
+    digest = hashlib.blake2b(digest_size=8)
+    digest.update(f"{_MAGIC!r} {ORDER} {LEXICON_TABLE_BITS} {sys.byteorder}".encode())
+    for path in files:
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)} {stat.st_size} {stat.st_mtime_ns}\n".encode())
+    return data_path("lexicon_cache", f"{'+'.join(domains)}-{digest.hexdigest()}.ngram"), files
+
+
+def _lexicon_model(domains=DEFAULT_DOMAINS):
+    """Model of the lexicon words weighted by their counts, built on first use"""
+    path, files = _lexicon_model_path(domains)
+    if not os.path.exists(path):
+        words = Counter()
+        for lexicon_path in files:
+            for word, count in read_lexicon(lexicon_path).items():
+                words[word] = max(words[word], count)
+        NgramModel.build(words.items(), path, table_bits=LEXICON_TABLE_BITS)
+        directory, name = os.path.split(path)
+        prefix = name.split('-')[0] + '-'
+        for entry in os.listdir(directory):
+            if entry.startswith(prefix) and entry.endswith(".ngram") and entry != name:
+                try:
+                    os.remove(os.path.join(directory, entry))
+                except OSError:
+                    pass
+    return NgramModel(path)
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_language_model():
+    """Process-wide NgramModel: the corpus model if one was built, else the lexicon model"""
+    global _model
+    with _model_lock:
+        if _model is None:
+            path = model_path()
+            _model = NgramModel(path) if os.path.exists(path) else _lexicon_model()
+        return _model
+
+
+def build_language_model(paths, order=ORDER, table_bits=TABLE_BITS):
+    """Build the corpus model from text files, replacing any earlier one; returns its path"""
+    global _model
+
+    def texts():
+        for path in paths:
+            with open(path, 'r', encoding='utf-8', errors='replace') as f:
+                for paragraph in f.read().split('\n\n'):
+                    if paragraph.strip():
+                        yield paragraph
+
+    path = model_path()
+    NgramModel.build(texts(), path, order=order, table_bits=table_bits)
+    with _model_lock:
+        _model = None
+    return path
@@ -0,0 +1,207 @@
+"""
+Multi-page Input
+----------------
+Reads multi-page TIFF files and PDFs one page at a time and runs them through
+a two-stage pipeline: while page N is being OCR'd, page N+1 is already being
+decoded and preprocessed on a background thread. Only a bounded number of
+prepared pages are held in memory at once, and each page's result is yielded
+as soon as it is ready.
+
+PDF pages are rasterized with poppler's `pdftoppm`, which must be installed
+separately (brew install poppler / apt-get install poppler-utils).
+"""
+
+import io
+import re
+import queue
+import shutil
+import subprocess
+import threading
+from collections import namedtuple
+
+from PIL import Image
+
+from ocr_timing import StageTimer
+from ocr_trace import span, traced
+
+
+MULTIPAGE_EXTENSIONS = ('.tif', '.tiff', '.pdf')
+
+# Resolution PDF pages are rasterized at
+PDF_DPI = 300
+
+# Image.info key holding the full size of an image that was decoded at reduced resolution
+FULL_SIZE_KEY = "ocr_full_size"
+
+PageResult = namedtuple("PageResult", "page result error")
+
+_DONE = object()
+
+
+def is_pdf(path):
+    return path.lower().endswith('.pdf')
+
+
+def is_multipage(path):
+    """Whether path may contain more than one page"""
+    return path.lower().endswith(MULTIPAGE_EXTENSIONS)
+
+
+def streams_pages(path):
+    """Whether a file is OCR'd page by page: every PDF, and images with more than one page"""
+    return is_pdf(path) or (is_multipage(path) and page_count(path) > 1)
+
+
+def _require_poppler(tool):
+    """Path of a poppler command line tool, or a helpful error"""
+    executable = shutil.which(tool)
+    if not executable:
+        raise RuntimeError(
+            f"'{tool}' was not found. PDF input needs poppler:\n"
+            "- MacOS: brew install poppler\n"
+            "- Linux: sudo apt-get install poppler-utils\n"
+            "- Windows: install poppler and add its bin folder to PATH"
+        )
+    return executable
+
+
+def page_count(path):
+    """Number of pages in an image or PDF file"""
+    if is_pdf(path):
+        output = subprocess.run(
+            [_require_poppler("pdfinfo"), path],
+            capture_output=True, text=True, check=True
+        ).stdout
+        match = re.search(r'^Pages:\s+(\d+)', output, re.MULTILINE)
+        return int(match.group(1)) if match else 0
+
+    with Image.open(path) as img:
+        return getattr(img, 'n_frames', 1)
+
+
+@traced("decode:pdf-page")
+def render_pdf_page(path, page, dpi=PDF_DPI):
+    """Rasterize a single PDF page (1-based) to a PIL image"""
+    png = subprocess.run(
+        [_require_poppler("pdftoppm"), "-f", str(page), "-l", str(page),
+         "-r", str(dpi), "-png", path],
+        capture_output=True, check=True
+    ).stdout
+    image = Image.open(io.BytesIO(png))
+    image.load()
+    return image
+
+
+@traced("decode")
+def open_image(path, min_size=None, min_pixels=None):
+    """
+    Open and decode a single image, at reduced resolution when that is nearly free.
+
+    JPEGs can be decoded at 1/2, 1/4 or 1/8 scale by the DCT itself (Image.draft),
+    which skips most of the decoding work; the smallest scale that is still at
+    least min_size, or has at least min_pixels pixels, is used. Other formats
+    are decoded in full. The full size is kept in image.info[FULL_SIZE_KEY].
+    """
+    image = Image.open(path)
+    width, height = image.size
+    if min_pixels and width * height > min_pixels:
+        scale = (min_pixels / (width * height)) ** 0.5
+        min_size = (max(1, int(width * scale)), max(1, int(height * scale)))
+    if min_size and image.format == "JPEG":
+        image.draft(image.mode, min_size)
+    image.load()
+    image.info[FULL_SIZE_KEY] = (width, height)
+    return image
+
+
+def full_size(image):
+    """Size of the image a possibly reduced decode came from"""
+    return tuple(image.info.get(FULL_SIZE_KEY, image.size))
+
+
+def iter_pages(path, dpi=PDF_DPI):
+    """Yield (page_number, image) for each page, decoding only one page at a time"""
+    if is_pdf(path):
+        for page in range(1, page_count(path) + 1):
+            yield page, render_pdf_page(path, page, dpi=dpi)
+        return
+
+    with Image.open(path) as img:
+        for index in range(getattr(img, 'n_frames', 1)):
+            img.seek(index)
+            # copy() decodes just this frame into an independent image
+            with span("decode:frame", page=index + 1):
+                frame = img.copy()
+            yield index + 1, frame
+
+
+def first_page(path, dpi=PDF_DPI):
+    """Decode only the first page, e.g. for a preview (which can use a lower PDF dpi)"""
+    for _, image in iter_pages(path, dpi=dpi):
+        return image
+    raise ValueError(f"No pages found in {path}")
+
+
+def process_pages(path, prepare_engine, ocr_engine, max_in_flight=2):
+    """
+    OCR every page of a file, overlapping preprocessing with recognition.
+
+    prepare_engine decodes and preprocesses pages on a background thread while
+    ocr_engine runs the OCR passes on the calling thread; they must be separate
+    engine instances because each holds per-image state. At most max_in_flight
+    prepared pages wait between the two stages. Yields a PageResult per page in
+    page order, as soon as each one is recognized.
+    """
+    prepared_pages = queue.Queue(maxsize=max(1, max_in_flight))
+    stop = threading.Event()
+
+    def produce():
+        try:
+            pages = iter_pages(path)
+            while not stop.is_set():
+                timer = StageTimer()
+                timer.begin("decode")
+                try:
+                    number, image = next(pages)
+                except StopIteration:
+                    break
+                try:
+                    prepare_engine.current_image = image
+                    prepare_engine.current_image_path = path
+                    prepared = prepare_engine._prepare_image(image.copy(), timer=timer)
+                    item = (number, prepared, None)
+                except Exception as e:
+                    item = (number, None, str(e))
+                # Blocks while max_in_flight pages are already waiting, capping memory
+                prepared_pages.put(item)
+        except Exception as e:
+            prepared_pages.put((None, None, str(e)))
+        finally:
+            prepared_pages.put(_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = prepared_pages.get()
+            if item is _DONE:
+                break
+            number, prepared, error = item
+            if error is not None:
+                yield PageResult(number, None, error)
+                continue
+            try:
+                result = ocr_engine._recognize(prepared)
+                result.page = number
+                yield PageResult(number, result, None)
+            except Exception as e:
+                yield PageResult(number, None, str(e))
+    finally:
+        # Unblock the producer if the consumer stopped early
+        stop.set()
+        while producer.is_alive():
+            try:
+                prepared_pages.get(timeout=0.1)
+            except queue.Empty:
+                pass
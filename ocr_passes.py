@@ -0,0 +1,257 @@
+"""
+Pass Utility
+------------
+Which of the extractors' OCR passes earn their runtime.
+
+Every timed pass of a job records, when it was one of the candidates a
+selection chose between, its score, whether it won, and its margin: how far
+the winner's score was ahead of the runner-up, or how far behind the winner
+this pass was. A pass's gain on a job is its margin when it won and nothing
+otherwise, that is, how much the chosen answer would have scored lower
+without it. In consensus modes the candidates' words are merged by a vote
+instead, and a pass's gain is its share of the merged words: those no
+better-ranked pass read, so they came from this one. The benchmark adds the same measure in CER, from ground truth: how
+much lower the CER of this pass was than that of the best other candidate.
+
+PassStats sums these per pass label (labels start with the mode, e.g.
+"document:variant3") and persists them. Passes whose expected gain per
+millisecond stays below a threshold can then be skipped (auto-prune). Base,
+fallback and retry passes are never skipped.
+"""
+
+import time
+import threading
+
+from ocr_paths import data_path, read_json, write_json_atomic, file_lock, at_exit
+from ocr_log import get_logger
+
+log = get_logger("passes")
+
+
+STATS_FILE = "pass_stats.json"
+
+# Candidate runs a pass needs before it can be pruned
+PRUNE_MIN_RUNS = 30
+
+# Pruning thresholds: mean score margin, or mean CER improvement, per millisecond of the pass
+MIN_SCORE_GAIN_PER_MS = 0.001
+MIN_CER_GAIN_PER_MS = 0.00001
+
+# Pruning threshold for voting passes: mean share of the merged words per millisecond of the pass
+MIN_VOTE_SHARE_PER_MS = 0.00002
+
+# Seconds between saves of the sums; the rest is saved when the process exits
+SAVE_INTERVAL = 30.0
+
+# Every n-th job runs pruned passes anyway, so their statistics stay current
+EXPLORE_EVERY = 20
+
+# Passes every extractor relies on for an answer
+PROTECTED_SUFFIXES = (":base", ":fallback", ":region")
+PROTECTED_PREFIXES = ("retry:", "large:", "dedup:")
+
+_FIELDS = ("runs", "seconds", "candidates", "wins", "score_gain", "votes", "vote_share",
+           "cer_runs", "cer", "cer_gain")
+
+
+def is_protected(label):
+    return label.endswith(PROTECTED_SUFFIXES) or label.startswith(PROTECTED_PREFIXES)
+
+
+def _merge(target, deltas):
+    """Add per-label field deltas to per-label sums"""
+    for label, values in deltas.items():
+        entry = target.setdefault(label, dict.fromkeys(_FIELDS, 0))
+        for field, value in values.items():
+            entry[field] = entry.get(field, 0) + value
+
+
+def record_outcomes(records, scores):
+    """
+    Mark the pass records (StageTimer.record_pass entries, by stripped text)
+    of the candidates of one selection with their score, win and margin.
+    scores is ocr_scoring.ranked() output, best first.
+    """
+    distinct = []
+    for value, text in scores:
+        if not distinct or text != distinct[-1][1]:
+            distinct.append((value, text))
+    best = distinct[0][0]
+    for rank, (value, text) in enumerate(distinct):
+        if rank == 0:
+            # Over the runner-up, or over no answer at all
+            margin = value - distinct[1][0] if len(distinct) > 1 else max(0.0, value)
+        else:
+            margin = value - best
+        for record in records.get(text.strip(), ()):
+            record["score"] = value
+            record["won"] = rank == 0
+            record["margin"] = margin
+
+
+def record_votes(records, texts, origins):
+    """
+    Mark the pass records of the texts consensus merged with the share of the
+    merged words each supplied; origins is ocr_consensus.merge() output.
+    """
+    shares = {}
+    for index, _ in origins:
+        key = texts[index].strip()
+        shares[key] = shares.get(key, 0) + 1 / len(origins)
+    for text in texts:
+        for record in records.get(text.strip(), ()):
+            record["vote_share"] = shares.get(text.strip(), 0.0)
+
+
+def candidate_cers(passes, truth, measure):
+    """
+    Add "cer" and "cer_gain" to the candidate pass dicts that kept their text,
+    measured against truth with measure(output, truth).
+    """
+    candidates = [item for item in passes if "score" in item and "text" in item]
+    for item in candidates:
+        item["cer"] = measure(item["text"], truth)
+    for item in candidates:
+        others = [other["cer"] for other in candidates if other is not item]
+        item["cer_gain"] = max(0.0, min(others) - item["cer"]) if others else 0.0
+
+
+class PassStats:
+    """Summed outcomes per pass label, persisted as JSON"""
+
+    def __init__(self, path=None):
+        self.path = path or data_path(STATS_FILE)
+        self._lock = threading.Lock()
+        self._data = read_json(self.path, {}) or {}
+        # Added since the last save; merged into the file so concurrent workers don't lose counts
+        self._pending = {}
+        self._saved_at = time.monotonic()
+
+    def _add(self, label, **values):
+        for target in (self._data, self._pending):
+            _merge(target, {label: values})
+
+    def update(self, passes):
+        """Fold one job's timed passes (StageTimer.as_dict()["passes"]) into the sums"""
+        with self._lock:
+            for item in passes:
+                values = {"runs": 1, "seconds": item["seconds"]}
+                if "score" in item:
+                    values.update(candidates=1, wins=int(item["won"]),
+                                  score_gain=item["margin"] if item["won"] else 0.0)
+                if "vote_share" in item:
+                    values.update(votes=1, vote_share=item["vote_share"])
+                self._add(item["label"], **values)
+
+    def update_accuracy(self, passes):
+        """Fold in the ground-truth CERs the benchmark added with candidate_cers"""
+        with self._lock:
+            for item in passes:
+                if "cer" in item:
+                    self._add(item["label"], cer_runs=1, cer=item["cer"], cer_gain=item["cer_gain"])
+
+    def save(self):
+        """
+        Add what changed since the last save to the file, under a lock, so
+        processes sharing the file keep each other's counts.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._saved_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            with file_lock(self.path):
+                merged = read_json(self.path, {}) or {}
+                _merge(merged, pending)
+                write_json_atomic(self.path, merged)
+        except OSError as e:
+            log.warning("Could not save pass statistics: %s", e)
+            with self._lock:
+                _merge(self._pending, pending)
+            return
+        with self._lock:
+            # Counts added while the file was written go on top of it
+            _merge(merged, self._pending)
+            self._data = merged
+
+    def maybe_save(self):
+        """Save when SAVE_INTERVAL has passed since the last save"""
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+    def rows(self, mode=None):
+        """Per-label report rows, optionally for one mode, most expensive first"""
+        with self._lock:
+            data = {label: dict(entry) for label, entry in self._data.items()}
+        rows = []
+        for label, entry in data.items():
+            if mode and not label.startswith(f"{mode}:"):
+                continue
+            runs = entry["runs"] or 1
+            ms = 1000 * entry["seconds"]
+            row = {
+                "label": label,
+                "runs": entry["runs"],
+                "mean_ms": ms / runs,
+                "candidates": entry["candidates"],
+                "win_rate": entry["wins"] / entry["candidates"] if entry["candidates"] else None,
+                "score_gain_per_ms": entry["score_gain"] / ms if ms else None,
+                "vote_share_per_ms": entry.get("vote_share", 0) / ms if ms and entry.get("votes") else None,
+                "mean_cer": entry["cer"] / entry["cer_runs"] if entry["cer_runs"] else None,
+                "cer_gain_per_ms": entry["cer_gain"] / ms if ms and entry["cer_runs"] else None,
+            }
+            row["prune"] = self._prunable(label, entry, row)
+            rows.append(row)
+        rows.sort(key=lambda row: -row["mean_ms"] * row["runs"])
+        return rows
+
+    @staticmethod
+    def _prunable(label, entry, row, min_runs=PRUNE_MIN_RUNS):
+        if is_protected(label):
+            return False
+        # A voting pass shapes the merged answer without winning, so it is judged by the words it supplied
+        if entry.get("votes"):
+            return entry["votes"] >= min_runs and row["vote_share_per_ms"] < MIN_VOTE_SHARE_PER_MS
+        if entry["candidates"] < min_runs:
+            return False
+        # Ground truth, where the benchmark has measured enough of it, outranks the score margin
+        if entry["cer_runs"] >= min_runs:
+            return row["cer_gain_per_ms"] < MIN_CER_GAIN_PER_MS
+        return row["score_gain_per_ms"] is not None and row["score_gain_per_ms"] < MIN_SCORE_GAIN_PER_MS
+
+    def pruned(self):
+        """Labels of the passes auto-prune skips"""
+        return {row["label"] for row in self.rows() if row["prune"]}
+
+
+_stats = None
+_stats_lock = threading.Lock()
+
+
+def get_pass_stats():
+    """Process-wide PassStats, loaded on first use"""
+    global _stats
+    with _stats_lock:
+        if _stats is None:
+            _stats = PassStats()
+            at_exit(_stats.save)
+        return _stats
+
+
+def format_report(rows):
+    """Text table of PassStats.rows()"""
+    def percent(value):
+        return f"{value:.0%}" if value is not None else "-"
+
+    def rate(value, scale):
+        return f"{value * scale:.2f}" if value is not None else "-"
+
+    lines = [f"{'pass':<34}{'runs':>7}{'ms':>8}{'wins':>7}{'score/s':>9}{'words%/s':>9}{'CER':>7}{'CER pp/s':>10}  prune"]
+    for row in rows:
+        lines.append(
+            f"{row['label']:<34}{row['runs']:>7}{row['mean_ms']:>8.0f}{percent(row['win_rate']):>7}"
+            f"{rate(row['score_gain_per_ms'], 1000):>9}{rate(row['vote_share_per_ms'], 100000):>9}"
+            f"{percent(row['mean_cer']):>7}"
+            f"{rate(row['cer_gain_per_ms'], 100000):>10}  {'yes' if row['prune'] else ''}")
+    return "\n".join(lines)
@@ -0,0 +1,83 @@
+"""
+Application Data Paths
+----------------------
+Where the OCR application keeps caches and persisted statistics. Defaults to
+~/.ocr_app and can be moved with the OCR_APP_HOME environment variable.
+"""
+
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+from multiprocessing import util as mp_util
+
+try:
+    import fcntl
+except ImportError:  # Windows: saves are not serialized across processes
+    fcntl = None
+
+
+def app_data_dir():
+    """Per-user directory for caches and persisted statistics"""
+    path = os.environ.get("OCR_APP_HOME") or os.path.join(os.path.expanduser("~"), ".ocr_app")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def data_path(*parts):
+    """Path of a file or directory inside the application data directory"""
+    return os.path.join(app_data_dir(), *parts)
+
+
+def write_json_atomic(path, data):
+    """Write JSON so readers never see a half-written file"""
+    write_text_atomic(path, json.dumps(data, indent=1, sort_keys=True), suffix=".json")
+
+
+def write_text_atomic(path, text, suffix=".txt"):
+    """Write text so readers never see a half-written file"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-", suffix=suffix)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def read_json(path, default=None):
+    """Load JSON from path, returning default if it is missing or unreadable"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on path (through path.lock) across processes"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".lock", 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def at_exit(func):
+    """
+    Call func when this process exits normally. Unlike atexit, this also runs
+    in multiprocessing workers, which leave through os._exit.
+    """
+    mp_util.Finalize(None, func, exitpriority=10)
@@ -0,0 +1,275 @@
+"""
+OCR Worker Pool
+---------------
+A pool of pre-warmed worker processes for batch OCR. Each worker imports the
+imaging stack, probes tesseract and pages in the language data once at start-up,
+then serves many jobs. Workers are recycled after a fixed number of jobs to
+keep memory growth in check.
+"""
+
+import os
+import sys
+import time
+import threading
+import multiprocessing as mp
+from collections import namedtuple
+
+# Import the engine (numpy, cv2, PIL, pytesseract) in the parent so forked
+# workers inherit the already-imported modules instead of paying for them again
+import ocr_engine
+import ocr_trace
+import ocr_log
+import ocr_metrics
+import ocr_scoring
+
+log = ocr_log.get_logger("pool")
+
+
+JobResult = namedtuple(
+    "JobResult",
+    "path text error seconds first_job worker_pid init_timings result trace counters rss",
+    defaults=(None, None, None)
+)
+
+# Per-process worker state, set up by _init_worker
+_engine = None
+_jobs_done = 0
+_init_timings = None
+_score_cache = (0, 0)
+
+
+def _pool_context():
+    """Pick the cheapest start method that lets workers reuse the parent's imports"""
+    methods = mp.get_all_start_methods()
+    if sys.platform.startswith("linux") and "fork" in methods:
+        # Fork after import: children share the imported modules copy-on-write
+        return mp.get_context("fork")
+    if "forkserver" in methods:
+        # The fork server imports the engine once and forks workers from there
+        ctx = mp.get_context("forkserver")
+        ctx.set_forkserver_preload(["ocr_engine"])
+        return ctx
+    return mp.get_context("spawn")
+
+
+def _init_worker(engine_options, warm, trace=False):
+    """Import everything, probe tesseract and warm the language data once per worker"""
+    global _engine, _jobs_done, _init_timings, _score_cache
+
+    # A forked worker starts with a copy of the parent's tracing state
+    ocr_trace.reset()
+    if trace:
+        ocr_trace.enable()
+    else:
+        ocr_trace.disable()
+    # Likewise its counters; the level comes from OCR_LOG_LEVEL, which the parent exported
+    ocr_log.reset_counters()
+    ocr_log.configure(default="warning")
+
+    started = time.perf_counter()
+
+    # A no-op when the module was inherited from the parent or fork server
+    import ocr_engine as engine_module
+    imported = time.perf_counter()
+
+    with ocr_trace.span("worker:probe"):
+        _engine = engine_module.OCREngine(**engine_options)
+    probed = time.perf_counter()
+
+    if warm:
+        try:
+            with ocr_trace.span("worker:warm-up"):
+                _engine.warm_up()
+        except Exception as e:
+            log.warning("Worker %d warm-up failed: %s", os.getpid(), e)
+    warmed = time.perf_counter()
+
+    _jobs_done = 0
+    info = ocr_scoring.score.cache_info()
+    _score_cache = (info.hits, info.misses)
+    _init_timings = {
+        "import": imported - started,
+        "probe": probed - imported,
+        "warm": warmed - probed,
+        "total": warmed - started,
+    }
+
+
+def _run_job(path):
+    """Run one OCR job inside a worker process"""
+    global _jobs_done
+
+    started = time.perf_counter()
+    try:
+        with ocr_trace.span("job", path=path):
+            result = _engine.process_file(path)
+        text = result.text
+        error = None
+    except Exception as e:
+        result = None
+        text = ""
+        error = str(e)
+    seconds = time.perf_counter() - started
+
+    first_job = _jobs_done == 0
+    _jobs_done += 1
+
+    _count_score_cache()
+
+    # This job's spans (and the worker's start-up, on its first job) go back with the result
+    trace = ocr_trace.drain() if ocr_trace.is_enabled() else None
+    return JobResult(path, text, error, seconds, first_job, os.getpid(),
+                     _init_timings if first_job else None, result, trace, ocr_log.drain_counters(),
+                     ocr_metrics.current_rss())
+
+
+def _count_score_cache():
+    """Count the score cache's hits and misses since the last job"""
+    global _score_cache
+    info = ocr_scoring.score.cache_info()
+    hits, misses = info.hits - _score_cache[0], info.misses - _score_cache[1]
+    _score_cache = (info.hits, info.misses)
+    if hits:
+        ocr_log.count("cache.score.hit", hits)
+    if misses:
+        ocr_log.count("cache.score.miss", misses)
+
+
+def _mean(values):
+    """Average of an iterable of numbers, 0 when empty"""
+    values = list(values)
+    return sum(values) / len(values) if values else 0.0
+
+
+def _percentile(values, fraction):
+    """Nearest-rank percentile of a list of numbers"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))
+    return ordered[index]
+
+
+class OCRWorkerPool:
+    """Pool of pre-warmed OCR worker processes"""
+
+    def __init__(self, workers=None, max_jobs_per_worker=50, engine_options=None, warm=True, trace=False):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self.engine_options = dict(engine_options or {})
+
+        self.spawn_timings = []
+        self.first_job_latencies = []
+        self.steady_latencies = []
+        self.failures = 0
+        self._started = time.perf_counter()
+
+        # Jobs submitted and not yet finished
+        self.pending = 0
+        self._pending_lock = threading.Lock()
+        ocr_metrics.track_pool(self)
+
+        ctx = _pool_context()
+        self._pool = ctx.Pool(
+            processes=self.workers,
+            initializer=_init_worker,
+            initargs=(self.engine_options, warm, trace),
+            maxtasksperchild=max_jobs_per_worker,
+        )
+
+    def map(self, paths):
+        """Process image paths on the pool, yielding JobResults as they complete"""
+        for result in self._pool.imap_unordered(_run_job, self._queued(paths), chunksize=1):
+            self._record(result)
+            yield result
+
+    def submit(self, path, callback=None):
+        """Queue one image without blocking; callback(JobResult) runs on the pool's result thread"""
+        def done(result):
+            self._record(result)
+            if callback is not None:
+                callback(result)
+        self._add_pending(1)
+        return self._pool.apply_async(_run_job, (path,), callback=done)
+
+    def _queued(self, paths):
+        # The pool's task thread draws paths as it queues them
+        for path in paths:
+            self._add_pending(1)
+            yield path
+
+    def _add_pending(self, amount):
+        with self._pending_lock:
+            self.pending += amount
+
+    def _record(self, result):
+        """Keep spawn cost, first-job and steady-state latency apart"""
+        self._add_pending(-1)
+        ocr_trace.collect(result.trace)
+        ocr_log.merge_counters(result.counters)
+        ocr_metrics.record_job(result)
+        if result.error:
+            self.failures += 1
+        if result.first_job:
+            if result.init_timings:
+                self.spawn_timings.append(result.init_timings)
+            self.first_job_latencies.append(result.seconds)
+        else:
+            self.steady_latencies.append(result.seconds)
+
+    def stats(self):
+        """Summarize worker spawn cost and job latencies"""
+        spawn_totals = [t["total"] for t in self.spawn_timings]
+        jobs = len(self.first_job_latencies) + len(self.steady_latencies)
+        elapsed = time.perf_counter() - self._started
+        return {
+            "jobs": jobs,
+            "failures": self.failures,
+            "elapsed": elapsed,
+            "throughput": jobs / elapsed if elapsed > 0 else 0.0,
+            "workers_spawned": len(self.spawn_timings),
+            "spawn_mean": sum(spawn_totals) / len(spawn_totals) if spawn_totals else 0.0,
+            "spawn_max": max(spawn_totals) if spawn_totals else 0.0,
+            "spawn_import_mean": _mean(t["import"] for t in self.spawn_timings),
+            "spawn_probe_mean": _mean(t["probe"] for t in self.spawn_timings),
+            "spawn_warm_mean": _mean(t["warm"] for t in self.spawn_timings),
+            "first_job_mean": _mean(self.first_job_latencies),
+            "first_job_p50": _percentile(self.first_job_latencies, 0.5),
+            "steady_mean": _mean(self.steady_latencies),
+            "steady_p50": _percentile(self.steady_latencies, 0.5),
+            "steady_p95": _percentile(self.steady_latencies, 0.95),
+        }
+
+    def format_stats(self):
+        """Human-readable summary of stats()"""
+        s = self.stats()
+        return (
+            f"Jobs: {s['jobs']} ({s['failures']} failed) in {s['elapsed']:.2f}s "
+            f"({s['throughput']:.2f} images/s)\n"
+            f"Worker spawn: {s['workers_spawned']} workers, mean {s['spawn_mean']:.3f}s, "
+            f"max {s['spawn_max']:.3f}s (import {s['spawn_import_mean']:.3f}s, "
+            f"probe {s['spawn_probe_mean']:.3f}s, warm {s['spawn_warm_mean']:.3f}s)\n"
+            f"First job latency: mean {s['first_job_mean']:.3f}s, p50 {s['first_job_p50']:.3f}s\n"
+            f"Steady-state latency: mean {s['steady_mean']:.3f}s, p50 {s['steady_p50']:.3f}s, "
+            f"p95 {s['steady_p95']:.3f}s"
+        )
+
+    def close(self):
+        """Stop accepting work and wait for the workers to exit"""
+        self._pool.close()
+        self._pool.join()
+
+    def terminate(self):
+        """Stop the workers immediately"""
+        self._pool.terminate()
+        self._pool.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+        return False
@@ -0,0 +1,99 @@
+"""
+OCR Result
+----------
+The value returned by the OCR pipeline: the extracted text together with what
+is known about how it was produced.
+"""
+
+from ocr_words import WordTable
+
+# Separates pages in the combined text of a multi-page document (as pdftotext does)
+PAGE_SEPARATOR = "\f"
+
+
+class OCRResult:
+    """Text and measurements produced by one OCR job"""
+
+    def __init__(self, text, mode=None, image_size=None, timings=None, path=None, page=None, pages=None,
+                 words=None):
+        self.text = text
+        self.mode = mode
+        self.image_size = image_size
+        self.timings = timings or {"stages": {}, "passes": [], "total": 0.0}
+        self.path = path
+        self.page = page
+        self.pages = pages or []
+        # WordTable of boxes and confidences for the pass the text came from, when known
+        self.words = words
+        # Near-duplicate lookup: {"match": earlier path or None, "distance", "reused"}, when enabled
+        self.dedup = None
+
+    @classmethod
+    def from_pages(cls, page_results, path=None):
+        """Combine per-page results into one document result"""
+        stages = {}
+        passes = []
+        total = 0.0
+        for result in page_results:
+            for stage, seconds in result.stage_timings.items():
+                stages[stage] = stages.get(stage, 0.0) + seconds
+            passes.extend(result.timings.get("passes", []))
+            total += result.total_seconds
+
+        modes = {result.mode for result in page_results}
+        if len(modes) > 1:
+            mode = "mixed"
+        else:
+            mode = modes.pop() if modes else None
+
+        # Word offsets index the table's own text, so pages without a table leave it empty
+        tables = [result.words for result in page_results]
+        if tables and all(table is not None for table in tables):
+            words = WordTable.concat(tables, PAGE_SEPARATOR)
+        else:
+            words = None
+
+        return cls(
+            PAGE_SEPARATOR.join(result.text for result in page_results),
+            mode=mode,
+            # The document is as large as its first page, as for a single-page file
+            image_size=page_results[0].image_size if page_results else None,
+            timings={"stages": stages, "passes": passes, "total": total},
+            path=path,
+            pages=list(page_results),
+            words=words,
+        )
+
+    @property
+    def stage_timings(self):
+        """Seconds spent in each pipeline stage"""
+        return self.timings.get("stages", {})
+
+    @property
+    def pass_timings(self):
+        """(label, seconds) for every tesseract pass that ran"""
+        return [(item["label"], item["seconds"]) for item in self.timings.get("passes", [])]
+
+    @property
+    def total_seconds(self):
+        return self.timings.get("total", 0.0)
+
+    def to_dict(self):
+        """Plain-data view for JSON output"""
+        return {
+            "path": self.path,
+            "text": self.text,
+            "mode": self.mode,
+            "image_size": list(self.image_size) if self.image_size else None,
+            "timings": self.timings,
+            "page": self.page,
+            "pages": [page.to_dict() for page in self.pages],
+            "words": len(self.words) if self.words is not None else None,
+            "dedup": self.dedup,
+        }
+
+    def __str__(self):
+        return self.text
+
+    def __repr__(self):
+        return f"OCRResult(mode={self.mode!r}, chars={len(self.text)}, seconds={self.total_seconds:.2f})"
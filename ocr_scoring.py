@@ -0,0 +1,146 @@
+"""
+OCR Result Scoring
+------------------
+Chooses between the texts produced by different OCR passes of the same image.
+
+Every candidate is measured once: text_stats gathers the character-class,
+word, line and paragraph counts in a single pass, and each mode's keywords are
+found with one precompiled alternation. A mode is a weight vector over the
+shared features, so the modes differ only in data. Scores are cached by
+(text, mode) because different passes often return identical text.
+"""
+
+import re
+from functools import lru_cache
+
+from ocr_text import text_stats, contains_date, language_model
+
+
+CERTIFICATE_KEYWORDS = ('certificate', 'certify', 'award', 'recognition', 'presented',
+                        'completion', 'achievement', 'hereby', 'issued', 'granted',
+                        'honored', 'date', 'signature', 'authorized', 'official')
+
+UI_KEYWORDS = ('menu', 'file', 'edit', 'view', 'window', 'help', 'options',
+               'tools', 'settings', 'preferences', 'button', 'click', 'select',
+               'save', 'cancel', 'ok', 'yes', 'no', 'submit', 'login', 'sign')
+
+# Per-mode feature weights, applied in order. Ratios are fractions of the text
+# length; "_N" features are counts capped at N so long gibberish can't win on
+# length alone. fluency is the language model's mean log probability per
+# character, about -2 for clean English and -3 to -4 for misread text.
+WEIGHTS = {
+    "ocr": {
+        "words_50": 1,               # Longer text usually means better recognition
+        "real_words": 2,             # Alphabetic words of two or more letters
+        "alnum_or_space_ratio": 50,
+        "special_ratio": -30,        # Penalize excessive special characters
+        "fluency": 20,               # Reads like real language (see ocr_ngram)
+    },
+    "document": {
+        "words_100": 1,
+        "long_real_words": 2,        # Alphabetic words of three or more letters
+        "alnum_or_space_ratio": 100,
+        "special_ratio": -50,
+        "paragraphs_10": 5,          # Paragraphs indicate good structure detection
+        "fluency": 20,
+    },
+    "screenshot": {
+        "lines_30": 3,               # More lines likely means better UI element detection
+        "keywords": 8,               # UI element keywords
+        "short_words": 20,           # UI text tends to be shorter
+        "punctuation_ratio": -40,    # UI elements typically have little punctuation
+        "fluency": 10,               # UI labels are short and often not sentences
+    },
+    "certificate": {
+        "keywords": 10,              # Certificate wording
+        "lines_10": 5,               # Certificates usually have multiple sections
+        "alnum_ratio": 50,
+        "date": 30,                  # Certificates are usually dated
+        "fluency": 20,
+    },
+}
+
+KEYWORDS = {
+    "screenshot": UI_KEYWORDS,
+    "certificate": CERTIFICATE_KEYWORDS,
+}
+
+# Average word length below which a text counts as having short words
+SHORT_WORD_LENGTH = 6
+
+# Fluency is measured on at most this many leading characters, which bounds the
+# cost (about a microsecond a character) on very long pages
+FLUENCY_SAMPLE = 4000
+
+# Distinct candidate texts whose scores are remembered. The cache keeps the texts
+# alive, so it only needs to cover the passes of the current job or two
+SCORE_CACHE_SIZE = 128
+
+
+@lru_cache(maxsize=None)
+def _keyword_pattern(keywords):
+    """
+    One alternation matching any keyword at any position.
+
+    The lookahead lets matches overlap, and longer keywords are tried first so
+    each position reports the longest keyword starting there.
+    """
+    alternatives = sorted(set(keywords), key=lambda keyword: (-len(keyword), keyword))
+    return re.compile('(?=(' + '|'.join(map(re.escape, alternatives)) + '))')
+
+
+def keywords_in(text, keywords):
+    """The keywords that occur in text, case-insensitively"""
+    if not keywords or not text:
+        return frozenset()
+    found = set(_keyword_pattern(tuple(keywords)).findall(text.lower()))
+    # A keyword that starts where a longer one matched is inside that match
+    found.update(keyword for keyword in keywords
+                 if keyword not in found and any(keyword in match for match in found))
+    return frozenset(found)
+
+
+def features(text, mode):
+    """{feature: value} for every feature the mode weighs"""
+    weights = WEIGHTS[mode]
+    stats = text_stats(text)
+    length = max(1, stats.length)
+    values = {}
+    for name in weights:
+        if name == "keywords":
+            value = len(keywords_in(text, KEYWORDS.get(mode, ())))
+        elif name == "date":
+            value = int(contains_date(text))
+        elif name == "fluency":
+            model = language_model()
+            value = model.score(text[:FLUENCY_SAMPLE]) if model is not None else 0.0
+        elif name == "short_words":
+            value = int(stats.word_chars / max(1, stats.words) < SHORT_WORD_LENGTH)
+        elif name == "special_ratio":
+            value = (stats.length - stats.alnum_or_space) / length
+        elif name.endswith("_ratio"):
+            value = getattr(stats, name[:-len("_ratio")]) / length
+        else:
+            field, _, cap = name.rpartition("_")
+            if cap.isdigit():
+                value = min(getattr(stats, field), int(cap))
+            else:
+                value = getattr(stats, name)
+        values[name] = value
+    return values
+
+
+@lru_cache(maxsize=SCORE_CACHE_SIZE)
+def score(text, mode):
+    """Weighted sum of the mode's features for one candidate text"""
+    total = 0
+    for name, value in features(text, mode).items():
+        total += value * WEIGHTS[mode][name]
+    return total
+
+
+def ranked(results, mode):
+    """(score, text) for the non-blank results, best first; equal scores go to the greater text"""
+    scores = [(score(result, mode), result) for result in results if result.strip()]
+    scores.sort(reverse=True)
+    return scores
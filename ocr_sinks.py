@@ -0,0 +1,271 @@
+"""
+Result Sinks
+------------
+Bulk writers for batch and watch results, next to the per-image .txt files:
+
+- JsonlSink: one JSON record per image, through a large write buffer
+- SqliteSink: a `results` table in a WAL-mode database, committed every N results
+- NpzSink: word-box tables as compressed numpy arrays in one .npz archive
+- IndexSink (ocr_index): a full-text index of the results
+
+A SinkWriter feeds every sink from one dedicated thread, so the loop collecting
+OCR results only appends to a queue and never waits on the disk. It times each
+sink separately, so sink throughput can be told apart from OCR throughput.
+"""
+
+import json
+import time
+import queue
+import sqlite3
+import threading
+import zipfile
+
+from ocr_words import COLUMNS
+from ocr_log import get_logger
+
+log = get_logger("sinks")
+
+
+# Write buffer of the JSONL sink
+JSONL_BUFFER_BYTES = 1024 * 1024
+
+# Results per SQLite transaction
+SQLITE_BATCH_SIZE = 100
+
+# Sinks are flushed once no result has arrived for this long, so a watcher's
+# output doesn't sit in buffers between scans
+IDLE_FLUSH_SECONDS = 2.0
+
+_STOP = object()
+
+
+def result_record(job):
+    """Plain-data record of a worker pool JobResult, shared by the JSONL and SQLite sinks"""
+    result = job.result
+    return {
+        "path": job.path,
+        "text": job.text,
+        "error": job.error,
+        "seconds": job.seconds,
+        "mode": result.mode if result is not None else None,
+        "image_size": list(result.image_size) if result is not None and result.image_size else None,
+        "words": len(result.words) if result is not None and result.words is not None else None,
+        "timings": result.timings if result is not None else None,
+        "completed_at": time.time(),
+    }
+
+
+class JsonlSink:
+    """Appends one JSON line per result"""
+
+    name = "jsonl"
+
+    def __init__(self, path, buffer_bytes=JSONL_BUFFER_BYTES):
+        self.path = path
+        self._file = open(path, 'a', encoding='utf-8', buffering=buffer_bytes)
+
+    def write(self, job):
+        self._file.write(json.dumps(result_record(job), ensure_ascii=False))
+        self._file.write('\n')
+
+    def flush(self):
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class SqliteSink:
+    """Inserts results into a WAL-mode SQLite database in batched transactions"""
+
+    name = "sqlite"
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS results (
+            path TEXT PRIMARY KEY,
+            text TEXT,
+            error TEXT,
+            seconds REAL,
+            mode TEXT,
+            width INTEGER,
+            height INTEGER,
+            words INTEGER,
+            timings TEXT,
+            completed_at REAL
+        )
+    """
+
+    def __init__(self, path, batch_size=SQLITE_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+        # Connections belong to the thread that opened them, so the writer thread opens it on first use
+        self._db = None
+        self._pending = 0
+
+    def _connect(self):
+        db = sqlite3.connect(self.path)
+        db.execute("PRAGMA journal_mode=WAL")
+        # With WAL, NORMAL only risks the last transactions on power loss, never corruption
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.execute(self.SCHEMA)
+        db.commit()
+        return db
+
+    def write(self, job):
+        if self._db is None:
+            self._db = self._connect()
+        record = result_record(job)
+        width, height = record["image_size"] or (None, None)
+        self._db.execute(
+            "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (record["path"], record["text"], record["error"], record["seconds"], record["mode"],
+             width, height, record["words"],
+             json.dumps(record["timings"]) if record["timings"] else None, record["completed_at"]))
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._db is not None and self._pending:
+            self._db.commit()
+            self._pending = 0
+
+    def close(self):
+        if self._db is not None:
+            self.flush()
+            self._db.close()
+            self._db = None
+
+
+class NpzSink:
+    """
+    Word tables as a compressed .npz archive. Result n is stored as the arrays
+    n/path, n/text and n/<column> for every WordTable column, so
+    numpy.load(path)["3/left"] reads one column of one result without
+    decompressing the rest.
+
+    An existing archive is appended to, numbering on from its last result, so
+    a restarted watcher keeps the word tables of the files it finished before.
+    """
+
+    name = "npz"
+
+    def __init__(self, path):
+        import numpy as np
+        self._np = np
+        self.path = path
+        self._zip = zipfile.ZipFile(path, 'a', compression=zipfile.ZIP_DEFLATED, allowZip64=True)
+        numbers = [int(name.split('/', 1)[0]) for name in self._zip.namelist() if name.split('/', 1)[0].isdigit()]
+        self._count = max(numbers) + 1 if numbers else 0
+
+    def _write_array(self, name, array):
+        # The .npy format written straight into the archive member, as numpy.savez_compressed does
+        with self._zip.open(f"{name}.npy", 'w', force_zip64=True) as f:
+            self._np.lib.format.write_array(f, self._np.asanyarray(array), allow_pickle=False)
+
+    def write(self, job):
+        words = job.result.words if job.result is not None else None
+        if words is None:
+            return
+        prefix = str(self._count)
+        self._write_array(f"{prefix}/path", self._np.array(job.path))
+        self._write_array(f"{prefix}/text", self._np.array(words.text))
+        for name, typecode in COLUMNS:
+            self._write_array(f"{prefix}/{name}", self._np.frombuffer(words.columns[name], dtype=typecode))
+        self._count += 1
+
+    def flush(self):
+        # Archive members are complete once written; the central directory is written on close
+        pass
+
+    def close(self):
+        self._zip.close()
+
+
+class SinkWriter:
+    """Runs a set of sinks on one background thread"""
+
+    def __init__(self, sinks):
+        self.sinks = list(sinks)
+        self._queue = queue.Queue()
+        # Per sink: results written and seconds spent writing
+        self._stats = {sink.name: [0, 0.0] for sink in self.sinks}
+        self._thread = threading.Thread(target=self._write_loop, name="result-sinks", daemon=True)
+        self._thread.start()
+
+    def submit(self, job):
+        """Queue a JobResult for every sink; never blocks"""
+        self._queue.put(job)
+
+    def _write_loop(self):
+        dirty = False
+        while True:
+            try:
+                job = self._queue.get(timeout=IDLE_FLUSH_SECONDS if dirty else None)
+            except queue.Empty:
+                self._run_all("flush")
+                dirty = False
+                continue
+            if job is _STOP:
+                break
+            dirty = True
+            for sink in self.sinks:
+                started = time.perf_counter()
+                try:
+                    sink.write(job)
+                except Exception as e:
+                    log.warning("%s sink failed on %s: %s", sink.name, job.path, e)
+                stats = self._stats[sink.name]
+                stats[0] += 1
+                stats[1] += time.perf_counter() - started
+
+        self._run_all("close")
+
+    def _run_all(self, method):
+        """Call flush or close on every sink, counting the time against it"""
+        for sink in self.sinks:
+            started = time.perf_counter()
+            try:
+                getattr(sink, method)()
+            except Exception as e:
+                log.warning("Could not %s %s sink: %s", method, sink.name, e)
+            self._stats[sink.name][1] += time.perf_counter() - started
+
+    def close(self):
+        """Write everything still queued, then flush and close the sinks"""
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def stats(self):
+        """{sink name: {"results", "seconds", "throughput"}}"""
+        return {name: {"results": count, "seconds": seconds,
+                       "throughput": count / seconds if seconds else 0.0}
+                for name, (count, seconds) in self._stats.items()}
+
+    def format_stats(self):
+        """Human-readable summary of stats(), in the style of the pool's"""
+        return "\n".join(
+            f"Sink {name}: {s['results']} results in {s['seconds']:.3f}s ({s['throughput']:.0f} results/s)"
+            for name, s in self.stats().items())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+
+def open_sinks(jsonl=None, sqlite=None, npz=None, index=None, sqlite_batch_size=SQLITE_BATCH_SIZE):
+    """SinkWriter for the sinks whose paths are given, or None if there are none"""
+    sinks = []
+    if jsonl:
+        sinks.append(JsonlSink(jsonl))
+    if sqlite:
+        sinks.append(SqliteSink(sqlite, batch_size=sqlite_batch_size))
+    if npz:
+        sinks.append(NpzSink(npz))
+    if index:
+        from ocr_index import IndexSink
+        sinks.append(IndexSink(index))
+    return SinkWriter(sinks) if sinks else None
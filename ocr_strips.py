@@ -0,0 +1,243 @@
+"""
+Large Images
+------------
+OCR of huge scans (A0 drawings, 600 dpi plans) without decoding them into
+memory.
+
+Uncompressed TIFF and binary PNM files store their rows as plain bytes, so
+the pixel data is memory-mapped straight from the file. The image is then
+preprocessed strip by strip. Contrast enhancement uses the CLAHE tile grid of
+a whole-image pass: a first pass over the strips gathers every tile's
+histogram, and each strip is then mapped by interpolating between the lookup
+tables of its nearest tiles, so the result has no seams at strip boundaries.
+Each strip is read with a margin of rows above and below, so the denoise
+filter and the threshold window see the same neighbourhood as in a
+whole-image pass, and only the strip itself is kept. The binarized rows go to tesseract in tiles of about TILE_HEIGHT rows,
+cut at the emptiest row so no text line is split between two tiles.
+
+Memory use depends on the image width and the strip and tile heights, not on
+the image height, and there is a single preprocessed variant instead of the
+usual five or six.
+"""
+
+import numpy as np
+import cv2
+from PIL import Image
+
+from ocr_pages import FULL_SIZE_KEY
+from ocr_trace import traced
+
+
+# Images with at least this many pixels use the strip pipeline, when their layout allows it
+LARGE_IMAGE_PIXELS = 40000000
+
+# Rows preprocessed at a time, and rows of context read above and below each strip
+STRIP_HEIGHT = 512
+OVERLAP = 32
+
+# Contrast enhancement of the whole-image document path
+CLAHE_CLIP_LIMIT = 2.0
+CLAHE_GRID = (8, 8)
+
+# Rows mapped through the CLAHE lookup tables at a time, which bounds the temporary arrays
+CLAHE_CHUNK_ROWS = 64
+
+# Rows per OCR tile; each cut is made at the emptiest row of the last half of a tile
+TILE_HEIGHT = 2048
+
+# Channels of the raw layouts that can be memory-mapped
+_RAW_CHANNELS = {"L": 1, "RGB": 3}
+
+
+def _open_header(path):
+    """Open an image without decoding it; huge images would otherwise trip PIL's decompression bomb check"""
+    limit = Image.MAX_IMAGE_PIXELS
+    Image.MAX_IMAGE_PIXELS = None
+    try:
+        return Image.open(path)
+    finally:
+        Image.MAX_IMAGE_PIXELS = limit
+
+
+class StripSource:
+    """Rows of an uncompressed TIFF or PNM image, memory-mapped from the file"""
+
+    def __init__(self, path):
+        self.path = path
+        with _open_header(path) as image:
+            self.width, self.height = image.size
+            self.mode = image.mode
+            tiles = list(image.tile)
+            frames = getattr(image, "n_frames", 1)
+
+        channels = _RAW_CHANNELS.get(self.mode)
+        if frames != 1 or channels is None or not tiles:
+            raise ValueError(f"{path} can't be memory-mapped")
+
+        # One map of the whole file; (first row, last row + 1, rows) views of it for every strip
+        data = np.memmap(path, dtype=np.uint8, mode='r')
+        self._strips = []
+        for codec, extents, offset, args in tiles:
+            x0, y0, x1, y1 = extents
+            rawmode, stride, orientation = (tuple(args) + (0, 1))[:3]
+            if (codec != "raw" or rawmode != self.mode or orientation != 1
+                    or (x0, x1) != (0, self.width) or stride not in (0, self.width * channels)):
+                raise ValueError(f"{path} can't be memory-mapped")
+            count = (y1 - y0) * self.width * channels
+            rows = data[offset:offset + count].reshape(y1 - y0, self.width, channels)
+            self._strips.append((y0, y1, rows))
+        self._strips.sort(key=lambda strip: strip[0])
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def rows(self, top, bottom):
+        """Grayscale copy of rows top to bottom - 1"""
+        parts = [rows[max(top, y0) - y0:min(bottom, y1) - y0]
+                 for y0, y1, rows in self._strips if y0 < bottom and y1 > top]
+        pixels = np.concatenate(parts) if len(parts) > 1 else np.array(parts[0])
+        if pixels.shape[2] == 3:
+            return cv2.cvtColor(pixels, cv2.COLOR_RGB2GRAY)
+        return pixels[:, :, 0]
+
+    def preview(self, size):
+        """Image of at least size from every n-th row and column, for thumbnails"""
+        step = max(1, min(self.width // size[0], self.height // size[1]))
+        # Start each strip at the first of its rows on the global grid of every step-th row
+        parts = [rows[-y0 % step::step, ::step] for y0, _, rows in self._strips]
+        pixels = np.ascontiguousarray(np.concatenate(parts))
+        image = Image.fromarray(pixels[:, :, 0] if pixels.shape[2] == 1 else pixels)
+        image.info[FULL_SIZE_KEY] = self.size
+        return image
+
+
+def open_strips(path):
+    """StripSource for a large image whose pixels can be memory-mapped, else None"""
+    try:
+        with _open_header(path) as image:
+            width, height = image.size
+        if width * height < LARGE_IMAGE_PIXELS:
+            return None
+        return StripSource(path)
+    except (OSError, ValueError):
+        return None
+
+
+def _clahe_luts(histograms, areas, clip_limit):
+    """Lookup table of every tile from its histogram, clipped and redistributed as cv2's CLAHE does"""
+    clip = np.maximum((clip_limit * areas / 256).astype(np.int64), 1)[..., None]
+    excess = np.maximum(histograms - clip, 0).sum(axis=-1)
+    histograms = np.minimum(histograms, clip) + (excess // 256)[..., None]
+    residuals = excess % 256
+    for index in zip(*np.nonzero(residuals)):
+        residual = int(residuals[index])
+        histograms[index][np.arange(0, 256, max(256 // residual, 1))[:residual]] += 1
+    return np.clip(np.rint(np.cumsum(histograms, axis=-1) * (255.0 / areas[..., None])), 0, 255).astype(np.float32)
+
+
+def _interpolation(positions, tile, count):
+    """Nearest tile before and after each position, and the weight of the one after"""
+    offsets = positions / tile - 0.5
+    first = np.floor(offsets)
+    weight = (offsets - first).astype(np.float32)
+    first = first.astype(np.intp)
+    return np.clip(first, 0, count - 1), np.clip(first + 1, 0, count - 1), weight
+
+
+class TiledCLAHE:
+    """
+    CLAHE with the tiles of a whole-image pass, applied a strip at a time.
+
+    Unlike cv2's CLAHE, the edge tiles are not padded to full size; their
+    histograms count only the image's own pixels.
+    """
+
+    def __init__(self, source, clip_limit=CLAHE_CLIP_LIMIT, grid=CLAHE_GRID, strip_height=STRIP_HEIGHT):
+        columns, rows = grid
+        self.tile_width = -(-source.width // columns)
+        self.tile_height = -(-source.height // rows)
+        bounds = [min(source.width, column * self.tile_width) for column in range(columns + 1)]
+
+        histograms = np.zeros((rows, columns, 256), np.int64)
+        for top in range(0, source.height, strip_height):
+            gray = source.rows(top, min(source.height, top + strip_height))
+            tile_rows = (top + np.arange(len(gray))) // self.tile_height
+            for row in np.unique(tile_rows):
+                band = gray[tile_rows == row]
+                for column in range(columns):
+                    block = band[:, bounds[column]:bounds[column + 1]]
+                    histograms[row, column] += np.bincount(block.ravel(), minlength=256)
+
+        areas = np.maximum(histograms.sum(axis=-1), 1)
+        self.luts = _clahe_luts(histograms, areas, clip_limit)
+        self.rows = rows
+        self._columns = _interpolation(np.arange(source.width), self.tile_width, columns)
+
+    def apply(self, gray, top):
+        """Enhanced copy of the rows of gray, the first of which is image row top"""
+        first_row, next_row, row_weight = _interpolation(top + np.arange(len(gray)), self.tile_height, self.rows)
+        first_column, next_column, column_weight = self._columns
+        luts = self.luts
+        enhanced = np.empty_like(gray)
+        for lo in range(0, len(gray), CLAHE_CHUNK_ROWS):
+            hi = lo + CLAHE_CHUNK_ROWS
+            values = gray[lo:hi]
+            above, below = first_row[lo:hi, None], next_row[lo:hi, None]
+            weight = row_weight[lo:hi, None]
+            upper = luts[above, first_column, values] * (1 - column_weight) + luts[above, next_column, values] * column_weight
+            lower = luts[below, first_column, values] * (1 - column_weight) + luts[below, next_column, values] * column_weight
+            enhanced[lo:hi] = np.rint(upper * (1 - weight) + lower * weight)
+        return enhanced
+
+
+@traced("preprocess:strip")
+def enhance_strip(gray, top, clahe):
+    """
+    Document preprocessing of one strip (whose first row is image row top):
+    contrast enhancement, light denoising and adaptive thresholding.
+
+    A median filter stands in for the non-local means denoising of the
+    whole-image path, which would take minutes on an image this size.
+    """
+    enhanced = clahe.apply(gray, top)
+    denoised = cv2.medianBlur(enhanced, 3)
+    return cv2.adaptiveThreshold(denoised, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                 cv2.THRESH_BINARY, 11, 2)
+
+
+def iter_processed_strips(source, enhance=enhance_strip, strip_height=STRIP_HEIGHT, overlap=OVERLAP):
+    """Yield (top, rows) of the preprocessed image, strip by strip"""
+    clahe = TiledCLAHE(source, strip_height=strip_height)
+    for top in range(0, source.height, strip_height):
+        bottom = min(source.height, top + strip_height)
+        context_top = max(0, top - overlap)
+        context_bottom = min(source.height, bottom + overlap)
+        processed = enhance(source.rows(context_top, context_bottom), context_top, clahe)
+        yield top, processed[top - context_top:bottom - context_top]
+
+
+def _cut_row(block, tile_height):
+    """Row to end a tile at: the one with the fewest dark pixels in the second half of the tile"""
+    lo = tile_height // 2
+    dark = np.count_nonzero(block[lo:tile_height] < 128, axis=1)
+    return lo + int(np.argmin(dark))
+
+
+def iter_tiles(source, enhance=enhance_strip, tile_height=TILE_HEIGHT, **strip_options):
+    """Yield (top, rows) OCR tiles of the preprocessed image, cut between text lines"""
+    pending = []
+    pending_rows = 0
+    top = 0
+    for _, rows in iter_processed_strips(source, enhance, **strip_options):
+        pending.append(rows)
+        pending_rows += len(rows)
+        while pending_rows >= tile_height:
+            block = np.concatenate(pending)
+            cut = _cut_row(block, tile_height)
+            yield top, block[:cut]
+            pending = [block[cut:]]
+            pending_rows -= cut
+            top += cut
+    if pending_rows:
+        yield top, np.concatenate(pending)
@@ -0,0 +1,687 @@
+"""
+Text Correction
+---------------
+Cleans up raw Tesseract output. Everything the cleaners need - the character
+map, the regular expressions and the word correction tables - is built once
+at import, so cleaning a page is a handful of C-level passes
+over the text plus a dictionary lookup for the few words that need fixing.
+"""
+
+import re
+from collections import namedtuple
+
+from ocr_lexicon import DEFAULT_DOMAINS, get_lexicon
+from ocr_confusion import get_confusions
+from ocr_ngram import get_language_model
+from ocr_log import get_logger
+
+log = get_logger("text")
+
+
+# Characters commonly misread by OCR, mapped to what they usually are
+CHAR_REPLACEMENTS = {
+    '|': 'I',      # Pipe character often mistaken for 'I'
+    '1': 'l',      # 1 often mistaken for 'l' in some fonts
+    '[': '(',      # Common bracket mistakes
+    ']': ')',
+    '{': '(',
+    '}': ')',
+    '$': 'S',      # Dollar sign often mistaken for 'S'
+    '<': '(',      # Angle brackets confused with parentheses
+    '>': ')',
+    '`': "'",      # Backtick confused with apostrophe
+    '¢': 'c',      # Cent sign confused with 'c'
+    '©': 'c',      # Copyright symbol confused with 'c'
+    '®': 'R',      # Registered symbol confused with 'R'
+    '°': '0',      # Degree symbol confused with '0'
+    '—': '-',      # Em dash to hyphen
+    '–': '-',      # En dash to hyphen
+    '…': '...',    # Ellipsis to three periods
+    '•': '*',      # Bullet to asterisk
+    'é': 'e',      # Common accented characters
+    'è': 'e',
+    'ê': 'e',
+    'à': 'a',
+    'â': 'a',
+    'ô': 'o',
+    'ö': 'o'
+}
+
+# Words OCR commonly gets wrong, keyed by the lowercased misreading
+COMMON_CORRECTIONS = {
+    # Common OCR errors with 'h' being read as 'b'
+    'tbe': 'the',
+    'bave': 'have',
+    'tbat': 'that',
+    'tban': 'than',
+    'witb': 'with',
+    'lf': 'If',
+    'tbis': 'this',
+    'wbat': 'what',
+    'wben': 'when',
+    'wbere': 'where',
+    'wby': 'why',
+    'bere': 'here',
+    'tbere': 'there',
+    'tbeir': 'their',
+    'tbey': 'they',
+    'tbem': 'them',
+    'tbese': 'these',
+    'tbose': 'those',
+    'bome': 'home',
+    'bouse': 'house',
+    'bour': 'hour',
+    'bead': 'head',
+    'beart': 'heart',
+    'bope': 'hope',
+    'bigh': 'high',
+    'band': 'hand',
+    'batb': 'bath',
+    'botb': 'both',
+    'bard': 'hard',
+    'belp': 'help',
+    'bealth': 'health',
+    'buman': 'human',
+    'sbould': 'should',
+    'bowever': 'however',
+    'bebind': 'behind',
+    'perbaps': 'perhaps',
+    'bimself': 'himself',
+    'berself': 'herself',
+
+    # Common OCR errors with 'rn' being read as 'm'
+    'modem': 'modern',
+    'leam': 'learn',
+    'bum': 'burn',
+    'tum': 'turn',
+    'retum': 'return',
+    'pattem': 'pattern',
+    'concem': 'concern',
+    'intem': 'intern',
+    'govemment': 'government',
+
+    # Common OCR errors with 'I' and 'l' confusion
+    'Iike': 'like',
+    'Iife': 'life',
+    'Iist': 'list',
+    'Iine': 'line',
+    'Iight': 'light',
+    'Iittle': 'little',
+    'Iong': 'long',
+    'Iove': 'love',
+    'Iook': 'look',
+    'Iarge': 'large',
+    'Iater': 'later',
+    'Ieft': 'left',
+    'Ievel': 'level',
+    'Iearn': 'learn',
+    'Iast': 'last',
+    'Ieast': 'least',
+
+    # Common OCR errors with 'O' and '0' confusion
+    '0ne': 'One',
+    '0nly': 'Only',
+    '0ther': 'Other',
+    '0ver': 'Over',
+    '0pen': 'Open',
+    '0ff': 'Off',
+    '0ut': 'Out',
+    '0ur': 'Our',
+    'g0': 'go',
+    'd0': 'do',
+    't0': 'to',
+    'n0': 'no',
+    's0': 'so',
+
+    # Other common OCR errors
+    'arid': 'and',
+    'iri': 'in',
+    'ori': 'on',
+    'frorn': 'from',
+    'rnay': 'may',
+    'sorne': 'some',
+    'tirne': 'time',
+    'cornputer': 'computer',
+    'systern': 'system',
+    'inforrnation': 'information',
+    'prograrns': 'programs',
+    'rnanagement': 'management',
+    'developrnent': 'development',
+    'docurnent': 'document',
+    'environrnent': 'environment',
+    'irnportant': 'important',
+    'rnore': 'more',
+    'rnust': 'must',
+    'nurnber': 'number',
+    'sarne': 'same',
+    'cornpany': 'company',
+    'rnethod': 'method',
+    'cornmon': 'common',
+    'rnain': 'main',
+    'rnake': 'make',
+    'rnean': 'mean',
+    'arnount': 'amount',
+    'alrnost': 'almost',
+    'cornplete': 'complete',
+    'cornponent': 'component',
+    'rnernory': 'memory',
+    'cornmand': 'command',
+    'cornmunity': 'community',
+    'cornpare': 'compare',
+    'cornplex': 'complex',
+    'rnernber': 'member',
+    'rnonth': 'month',
+    'rnedia': 'media',
+    'rnessage': 'message',
+    'rnove': 'move',
+    'rnodel': 'model',
+    'rnorning': 'morning',
+    'rnachine': 'machine',
+    'rnaterial': 'material',
+    'rneasure': 'measure',
+    'rnedical': 'medical',
+    'rnany': 'many',
+    'rnight': 'might',
+    'rnarket': 'market',
+    'rnoney': 'money',
+    'rneet': 'meet',
+    'rnile': 'mile',
+    'rnind': 'mind',
+
+    # Double letter issues
+    'cornrnand': 'command',
+    'surnrnary': 'summary',
+    'surnrner': 'summer',
+    'cornrnunity': 'community',
+    'cornrnent': 'comment',
+    'cornrnon': 'common',
+    'cornrnittee': 'committee',
+    'cornrnunicate': 'communicate',
+    'cornrnunication': 'communication',
+    'cornrnercial': 'commercial',
+    'cornrnission': 'commission',
+    'prograrnrning': 'programming'
+}
+
+# Misreadings of words that appear on certificates
+CERTIFICATE_CORRECTIONS = {
+    'certif': 'certificate',
+    'certificat': 'certificate',
+    'certificare': 'certificate',
+    'certiticate': 'certificate',
+    'certificste': 'certificate',
+    'certlficate': 'certificate',
+    'aword': 'award',
+    'awerd': 'award',
+    'awasd': 'award',
+    'achievenent': 'achievement',
+    'achievernent': 'achievement',
+    'completion': 'completion',
+    'cornpletion': 'completion',
+    'presentet': 'presented',
+    'presentec': 'presented',
+    'recegnition': 'recognition',
+    'recogniton': 'recognition',
+    'recogn': 'recognition',
+    'perfarmance': 'performance',
+    'performonce': 'performance',
+    'excellonce': 'excellence',
+    'excellance': 'excellence',
+    'euthorized': 'authorized',
+    'authorlzed': 'authorized',
+    'authorised': 'authorized',
+    'slgnature': 'signature',
+    'signafure': 'signature',
+    'signatore': 'signature',
+    'signoture': 'signature',
+    'direcfor': 'director',
+    'directar': 'director',
+    'presidont': 'president',
+    'chaiperson': 'chairperson',
+    'chairparson': 'chairperson',
+    'chairnran': 'chairman',
+    'chairwan': 'chairman',
+    'opproval': 'approval',
+    'appraval': 'approval',
+    'approvel': 'approval'
+}
+
+# Streaming cleaners read this many characters of input at a time, and correct
+# this many words at a time
+BLOCK_SIZE = 64 * 1024
+BATCH_WORDS = 4096
+
+# Words tesseract is less confident of than this (0-100) are checked by spelling correction
+UNCERTAIN_CONFIDENCE = 60
+
+CERTIFICATE_HEADINGS = ['CERTIFICATE', 'AWARD', 'RECOGNITION', 'ACHIEVEMENT']
+CERTIFICATE_PHRASES = ['presented to', 'awarded to', 'given to', 'granted to']
+
+# Lexicons used for spelling correction of certificates
+CERTIFICATE_DOMAINS = DEFAULT_DOMAINS + ("certificate",)
+
+# The correct spellings from the correction tables are added to every lexicon
+LEXICON_SEEDS = sorted(
+    {word.lower() for word in COMMON_CORRECTIONS.values() if word.isalpha()} |
+    {word.lower() for word in CERTIFICATE_CORRECTIONS.values()} |
+    {word.lower() for word in CERTIFICATE_HEADINGS}
+)
+
+
+class _CharFilter(dict):
+    """
+    str.translate mapping that classifies each character the first time it is
+    seen and caches the answer, so a whole text is filtered in one C-level pass.
+    """
+
+    def __init__(self, keep, replacement):
+        super().__init__()
+        self._keep = keep
+        self._replacement = replacement
+
+    def __missing__(self, codepoint):
+        char = chr(codepoint)
+        value = char if self._keep(char) else self._replacement
+        self[codepoint] = value
+        return value
+
+
+# str.translate leaves its fast path as soon as the text contains a non-ASCII
+# character, and one str.replace per entry was measured to be quicker on
+# typical OCR output, so the map is applied as a precomputed replace chain
+_CHAR_REPLACEMENTS = tuple(CHAR_REPLACEMENTS.items())
+
+# Deletes letters, digits and whitespace, leaving the characters that count against a line
+_SPECIAL_ONLY = _CharFilter(lambda c: not (c.isalnum() or c.isspace()), None)
+
+# Turns control characters into spaces for display
+_PRINTABLE = _CharFilter(lambda c: c.isprintable() or c in '\n\t', ' ')
+
+_PLACEHOLDER_LINE = re.compile(r'^[-_=.…]+$')
+_RARE_CHARS = re.compile(r'[^\w\s.,;:!?()\'"-]')
+_ISOLATED_LETTERS = frozenset('bcdefghjklmnopqrstuvwxyzBCDEFGHJKLMNOPQRSTUVWXYZ')
+_CAMEL_CASE = re.compile(r'([a-z])([A-Z])')
+_ZERO_IN_WORD = re.compile(r'([a-zA-Z])0([a-zA-Z])')
+_SPACE_AFTER_PUNCTUATION = re.compile(r'([.,;:!?])([^\s])')
+_EXCESS_NEWLINES = re.compile(r'\n{3,}')
+# Marks of a misread word: a digit or symbol between letters, or lower case inside an upper-case word
+_MISREAD_MARKS = re.compile(r'[^\W\d_][\d@%&*?!][^\W\d_]|[A-Z]{2}[a-z]+[A-Z]')
+_DATE = re.compile(
+    r'\d{1,2}[/-]\d{1,2}[/-]\d{2,4}'                                                # MM/DD/YYYY or similar
+    r'|\d{1,2}\s+(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{2,4}'   # DD Mon YYYY
+    r'|(?:Jan|Feb|Mar|Apr|May|Jun|Jul|Aug|Sep|Oct|Nov|Dec)[a-z]*\s+\d{1,2},?\s+\d{2,4}',  # Mon DD, YYYY
+    re.IGNORECASE
+)
+
+# Each heading and phrase is moved onto its own line in turn, as separate passes.
+# A match always spans a whole line, so anchoring at line starts finds the same
+# matches without rescanning the rest of the line from every position.
+_CERTIFICATE_LAYOUT = (
+    [(re.compile(r'^([^\n]*)(' + heading + r')([^\n]*)', re.IGNORECASE | re.MULTILINE),
+      r'\1\n' + heading + r'\n\3')
+     for heading in CERTIFICATE_HEADINGS] +
+    [(re.compile(r'^([^\n]*)(' + phrase + r')([^\n]*)', re.IGNORECASE | re.MULTILINE), r'\1\n\2\n\3')
+     for phrase in CERTIFICATE_PHRASES]
+)
+
+# Only alphabetic words longer than two letters are corrected, and words are
+# lowercased before lookup, so entries outside that shape can never match
+_WORD_CORRECTIONS = {
+    wrong: right for wrong, right in COMMON_CORRECTIONS.items()
+    if len(wrong) > 2 and wrong.isalpha() and wrong == wrong.lower()
+}
+
+
+def is_placeholder(text):
+    """Whether text is nothing but dashes, dots and similar filler"""
+    return bool(_PLACEHOLDER_LINE.match(text.strip()))
+
+
+def match_case(word, replacement):
+    """Give replacement the capitalization of word"""
+    if word.isupper():
+        return replacement.upper()
+    if word[0].isupper():
+        return replacement.capitalize()
+    return replacement
+
+
+def correct_words(words, corrections, accept=None):
+    """
+    Replace listed misreadings in a list of words, in place.
+
+    The lowercased words are checked against the table with one set
+    intersection, so pages without any known misreading cost no Python-level
+    loop at all. accept(word) can veto a correction.
+    """
+    # Words never contain spaces, so lowercasing the joined text keeps them aligned
+    lowered = ' '.join(words).lower().split(' ')
+    if corrections.keys().isdisjoint(lowered):
+        return words
+
+    for index, key in enumerate(lowered):
+        replacement = corrections.get(key)
+        if replacement is None:
+            continue
+        word = words[index]
+        if accept is None or accept(word):
+            words[index] = match_case(word, replacement)
+    return words
+
+
+def spelling_lexicon(domains=DEFAULT_DOMAINS):
+    """The shared Lexicon for domains, or None if its index cannot be built"""
+    if domains in _unavailable_lexicons:
+        return None
+    try:
+        return get_lexicon(domains, extra_words=LEXICON_SEEDS)
+    except (OSError, ValueError) as e:
+        log.warning("Spelling correction disabled for %s: %s", "+".join(domains), e)
+        _unavailable_lexicons.add(domains)
+        return None
+
+
+_unavailable_lexicons = set()
+
+
+def confusion_table():
+    """The shared ConfusionTable, or None if it cannot be loaded"""
+    try:
+        return get_confusions()
+    except (OSError, ValueError) as e:
+        log.warning("Confusion-based correction disabled: %s", e)
+        return None
+
+
+def language_model():
+    """The shared NgramModel, or None if it cannot be loaded"""
+    global _language_model_unavailable
+    if _language_model_unavailable:
+        return None
+    try:
+        return get_language_model()
+    except (OSError, ValueError) as e:
+        log.warning("Language model disabled: %s", e)
+        _language_model_unavailable = True
+        return None
+
+
+_language_model_unavailable = False
+
+
+def looks_misread(word):
+    """
+    Whether a word shows the marks of a misreading (a digit or symbol between
+    letters, "CERTlFICATE"). Without tesseract's confidences this is all that
+    marks a word as doubtful: a plain word missing from the lexicon is more
+    often a rare word than a misread one.
+    """
+    return _MISREAD_MARKS.search(word) is not None
+
+
+def uncertain_words(words, threshold=UNCERTAIN_CONFIDENCE):
+    """
+    Predicate for correct_spelling from the WordTable of the pass a text came
+    from: true for words tesseract read with a confidence below threshold, and
+    for words cleaning has changed that look misread.
+    """
+    doubtful, confident = set(), set()
+    for word, conf in zip(words.words(), words.columns["conf"]):
+        if 0 <= conf < threshold:
+            doubtful.add(word)
+        elif conf >= threshold:
+            confident.add(word)
+    return lambda word: word in doubtful or (word not in confident and looks_misread(word))
+
+
+def correct_spelling(words, lexicon, confusions=None, uncertain=None, language_model=None):
+    """
+    Correct misread words in place.
+
+    Only words for which uncertain(word) is true are touched; by default those
+    that look misread. A word is first matched against the words its character
+    confusions could have come from, ranked with the language model if one is
+    given; if that finds nothing, the closest lexicon word is used.
+    """
+    if uncertain is None:
+        uncertain = looks_misread
+    for index, word in enumerate(words):
+        if not uncertain(word):
+            continue
+        replacement = None
+        if confusions is not None:
+            replacement = confusions.correction(word, lexicon, language_model=language_model)
+        if replacement is None:
+            replacement = lexicon.correction(word)
+            if replacement is not None:
+                replacement = match_case(word, replacement)
+        if replacement is not None:
+            words[index] = replacement
+    return words
+
+
+def _is_correctable(word):
+    return len(word) > 2 and word.isalpha()
+
+
+def _keep_line(line):
+    """Drop placeholder lines and lines that are mostly special characters"""
+    if _PLACEHOLDER_LINE.match(line.strip()):
+        return False
+    # At least 30% should be alphanumeric or space
+    special = len(line.translate(_SPECIAL_ONLY))
+    return (len(line) - special) / len(line) >= 0.3
+
+
+def iter_lines(text):
+    """Yield the lines of text one at a time, without building a list of them"""
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_blocks(lines, block_size=BLOCK_SIZE):
+    """Group a stream of lines into newline-joined blocks of about block_size characters"""
+    block = []
+    size = 0
+    for line in lines:
+        block.append(line)
+        size += len(line) + 1
+        if size >= block_size:
+            yield '\n'.join(block)
+            block = []
+            size = 0
+    if block:
+        yield '\n'.join(block)
+
+
+def text_blocks(text, block_size=BLOCK_SIZE):
+    """Split text at line boundaries into blocks of about block_size characters"""
+    start = 0
+    while start < len(text):
+        end = text.find('\n', start + block_size)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def _block_tokens(block):
+    """Map misread characters, drop gibberish lines and rare characters, and split into tokens"""
+    for original, replacement in _CHAR_REPLACEMENTS:
+        block = block.replace(original, replacement)
+    lines = [line for line in block.split('\n') if line.strip() and _keep_line(line)]
+    return _RARE_CHARS.sub('', '\n'.join(lines)).split()
+
+
+def _drop_isolated_letters(tokens):
+    """
+    Drop single letters that aren't words ('a', 'A' and 'I' are kept).
+
+    Matches removing r'\s[b-hj-zA-HJ-Z]\s' from the space-joined tokens: the
+    first and last tokens are never dropped, and neither is a token right
+    after a dropped one, whose leading space the previous match consumed.
+    """
+    previous_dropped = True
+    pending = None
+    has_pending = False
+    for token in tokens:
+        if has_pending:
+            if not previous_dropped and len(pending) == 1 and pending in _ISOLATED_LETTERS:
+                previous_dropped = True
+            else:
+                yield pending
+                previous_dropped = False
+        pending = token
+        has_pending = True
+    if has_pending:
+        yield pending
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_clean_text(blocks, lexicon=None, confusions=None, uncertain=None, language_model=None,
+                    batch_words=BATCH_WORDS):
+    """
+    Clean a stream of text blocks, yielding the cleaned text in pieces.
+
+    Memory stays bounded by one block plus batch_words words however long the
+    input is; joining the pieces gives the same text as clean_text. Blocks
+    must end at line boundaries (see text_blocks and iter_blocks).
+    """
+    tokens = (token for block in blocks for token in _block_tokens(block))
+    separator = ''
+    for batch in _batches(_drop_isolated_letters(tokens), batch_words):
+        text = ' '.join(batch)
+
+        # Add space between lowercase and uppercase
+        text = _CAMEL_CASE.sub(r'\1 \2', text)
+
+        # 0 between letters is usually 'o' (every '1' was already mapped to 'l')
+        if '0' in text:
+            text = _ZERO_IN_WORD.sub(r'\1o\2', text)
+
+        words = correct_words(text.split(), _WORD_CORRECTIONS, accept=_is_correctable)
+        if lexicon is not None:
+            correct_spelling(words, lexicon, confusions, uncertain, language_model)
+        text = ' '.join(words)
+
+        # Ensure proper spacing after punctuation
+        yield separator + _SPACE_AFTER_PUNCTUATION.sub(r'\1 \2', text)
+        separator = ' '
+
+
+def clean_text(text, lexicon=None, confusions=None, uncertain=None, language_model=None):
+    """
+    Clean up extracted text to remove gibberish and common OCR misreadings.
+
+    Lines are cleaned and joined into a single space-separated line. With a
+    lexicon, doubtful words it does not contain are also corrected against it,
+    using the confusion table if one is given (see correct_spelling).
+    """
+    if not text:
+        return text
+    return ''.join(iter_clean_text(text_blocks(text), lexicon, confusions, uncertain, language_model))
+
+
+def post_process_certificate_text(text, lexicon=None, confusions=None, uncertain=None, language_model=None):
+    """Fix common certificate misreadings and put headings on their own lines"""
+    if not text:
+        return text
+
+    words = correct_words(text.split(), CERTIFICATE_CORRECTIONS)
+    if lexicon is not None:
+        correct_spelling(words, lexicon, confusions, uncertain, language_model)
+    text = ' '.join(words)
+
+    for pattern, replacement in _CERTIFICATE_LAYOUT:
+        text = pattern.sub(replacement, text)
+
+    text = _EXCESS_NEWLINES.sub('\n\n', text)
+    return text.strip()
+
+
+TextStats = namedtuple(
+    "TextStats",
+    "length words word_chars real_words long_real_words alnum alnum_or_space "
+    "lines paragraphs punctuation"
+)
+TextStats.__doc__ = """
+Counts used to judge an OCR result. real_words are alphabetic words of two or
+more letters and long_real_words of three or more; lines counts non-blank
+lines and paragraphs non-blank blocks between blank lines.
+"""
+
+
+def text_stats(text):
+    """Gather every TextStats count in a single pass over the lines of text"""
+    length = words = word_chars = real_words = long_real_words = 0
+    alnum_or_space = punctuation = lines = paragraphs = spaces = newlines = 0
+
+    # Paragraphs are the non-blank pieces of text.split('\n\n'); track runs of newlines to find them
+    newline_run = 0
+    paragraph_has_text = False
+
+    for number, line in enumerate(iter_lines(text)):
+        if number:
+            newlines += 1
+            newline_run += 1
+            if newline_run == 2:
+                paragraphs += paragraph_has_text
+                paragraph_has_text = False
+                newline_run = 0
+        if not line:
+            continue
+        newline_run = 0
+
+        length += len(line)
+        alnum_or_space += len(line) - len(line.translate(_SPECIAL_ONLY))
+        punctuation += sum(line.count(mark) for mark in ',.;:!?')
+
+        tokens = line.split()
+        if tokens:
+            lines += 1
+            paragraph_has_text = True
+            line_chars = sum(map(len, tokens))
+            spaces += len(line) - line_chars
+            words += len(tokens)
+            word_chars += line_chars
+            for token in tokens:
+                if len(token) > 1 and token.isalpha():
+                    real_words += 1
+                    long_real_words += len(token) > 2
+        else:
+            spaces += len(line)
+
+    paragraphs += paragraph_has_text
+    # Newlines count towards the length and as whitespace
+    return TextStats(length + newlines, words, word_chars, real_words, long_real_words,
+                     alnum_or_space - spaces, alnum_or_space + newlines,
+                     lines, paragraphs, punctuation)
+
+
+def contains_date(text):
+    """Whether text contains something that looks like a date"""
+    return _DATE.search(text) is not None
+
+
+def printable_text(text):
+    """Replace non-printable characters (other than newlines and tabs) with spaces"""
+    if text.replace('\n', '').replace('\t', '').isprintable():
+        return text
+    return text.translate(_PRINTABLE)
@@ -0,0 +1,209 @@
+"""
+Thumbnail Cache
+---------------
+Preview thumbnails rendered on a background thread and kept on disk.
+
+Thumbnails are stored as PNG files in ~/.ocr_app/thumbnails, named after a
+hash of the source file's contents and the thumbnail size, so a file that was
+moved or renamed still hits and an edited one misses. The directory is kept
+under MAX_BYTES by removing the least recently used thumbnails.
+
+ThumbnailWorker renders on a single thread and hands finished thumbnails to a
+callback. Requests share slots (e.g. "preview"); a request that was superseded
+in its slot before the worker got to it is skipped, so clicking through files
+never queues up stale work.
+"""
+
+import os
+import hashlib
+import threading
+import concurrent.futures
+
+from PIL import Image, PngImagePlugin
+
+from ocr_paths import data_path
+from ocr_pages import is_multipage, first_page, open_image, full_size, FULL_SIZE_KEY
+from ocr_strips import open_strips
+from ocr_log import get_logger
+
+log = get_logger("thumbs")
+
+
+# Total size of the thumbnail directory
+MAX_BYTES = 64 * 1024 * 1024
+
+# Resolution PDF pages are rendered at for thumbnails (an A4 page is then about 600x840)
+THUMBNAIL_DPI = 72
+
+_HASH_CHUNK = 1024 * 1024
+
+
+def file_digest(path):
+    """Hex digest of a file's contents"""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def render_thumbnail(path, size):
+    """Decode an image file (the first page of a multi-page one) and shrink it to fit size"""
+    large_source = open_strips(path)
+    if large_source is not None:
+        # Huge scans are sampled from their memory-mapped rows instead of decoded
+        image = large_source.preview(size)
+    elif is_multipage(path):
+        image = first_page(path, dpi=THUMBNAIL_DPI)
+    else:
+        # JPEGs are decoded at the smallest DCT scale that still covers size
+        image = open_image(path, min_size=size)
+    source_size = full_size(image)
+    if image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    # Never scales up, like the preview always did
+    image.thumbnail(size, Image.LANCZOS)
+    image.info[FULL_SIZE_KEY] = source_size
+    return image
+
+
+class ThumbnailCache:
+    """Size-bounded directory of thumbnails keyed by content hash and size"""
+
+    def __init__(self, directory=None, max_bytes=MAX_BYTES):
+        self.directory = directory or data_path("thumbnails")
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # name -> (last use, bytes), read from the directory on first use
+        self._entries = None
+        # (path, size, mtime) -> digest, so reopening a file doesn't hash it again
+        self._digests = {}
+
+    def digest(self, path):
+        """Content digest of path, remembered while the file is unchanged"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        digest = self._digests.get(key)
+        if digest is None:
+            digest = file_digest(path)
+            if len(self._digests) >= 1024:
+                self._digests.clear()
+            self._digests[key] = digest
+        return digest
+
+    def _name(self, digest, size):
+        return f"{digest}-{size[0]}x{size[1]}.png"
+
+    def _load_entries(self):
+        if self._entries is None:
+            self._entries = {}
+            os.makedirs(self.directory, exist_ok=True)
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(".png"):
+                    stat = entry.stat()
+                    self._entries[entry.name] = (stat.st_mtime, stat.st_size)
+        return self._entries
+
+    def get(self, digest, size):
+        """The cached thumbnail, or None"""
+        name = self._name(digest, size)
+        path = os.path.join(self.directory, name)
+        try:
+            image = Image.open(path)
+            image.load()
+        except (OSError, ValueError):
+            return None
+        width, _, height = image.info.get("source_size", "").partition("x")
+        if width and height:
+            image.info[FULL_SIZE_KEY] = (int(width), int(height))
+
+        # Mark it recently used
+        with self._lock:
+            entries = self._load_entries()
+            try:
+                os.utime(path)
+                entries[name] = (os.path.getmtime(path), os.path.getsize(path))
+            except OSError:
+                pass
+        return image
+
+    def put(self, digest, size, image):
+        """Store a thumbnail, evicting the least recently used ones over max_bytes"""
+        name = self._name(digest, size)
+        path = os.path.join(self.directory, name)
+        info = PngImagePlugin.PngInfo()
+        width, height = full_size(image)
+        info.add_text("source_size", f"{width}x{height}")
+
+        with self._lock:
+            entries = self._load_entries()
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            try:
+                image.save(tmp_path, format="PNG", pnginfo=info)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                log.warning("Could not cache thumbnail: %s", e)
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+            entries[name] = (os.path.getmtime(path), os.path.getsize(path))
+
+            total = sum(nbytes for _, nbytes in entries.values())
+            for old_name in sorted(entries, key=lambda n: entries[n][0]):
+                if total <= self.max_bytes or old_name == name:
+                    break
+                try:
+                    os.remove(os.path.join(self.directory, old_name))
+                except OSError:
+                    pass
+                total -= entries.pop(old_name)[1]
+
+    def thumbnail(self, path, size, render=render_thumbnail):
+        """Thumbnail of the file at path, from the cache or rendered and cached"""
+        size = tuple(size)
+        digest = self.digest(path)
+        image = self.get(digest, size)
+        if image is None:
+            image = render(path, size)
+            self.put(digest, size, image)
+        return image
+
+
+class ThumbnailWorker:
+    """Renders thumbnails on one background thread, newest request per slot wins"""
+
+    def __init__(self, cache=None):
+        self.cache = cache or ThumbnailCache()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="thumbnails")
+        self._lock = threading.Lock()
+        self._latest = {}
+
+    def request(self, slot, path, size, deliver=None):
+        """
+        Queue a thumbnail of path; deliver(image, error) is called on the worker
+        thread when it is ready, unless a newer request for the slot came first.
+        Without deliver the thumbnail is only rendered into the cache.
+        """
+        with self._lock:
+            ticket = self._latest.get(slot, 0) + 1
+            self._latest[slot] = ticket
+        self._executor.submit(self._run, slot, ticket, path, size, deliver)
+
+    def _current(self, slot, ticket):
+        with self._lock:
+            return self._latest.get(slot) == ticket
+
+    def _run(self, slot, ticket, path, size, deliver):
+        if not self._current(slot, ticket):
+            return
+        try:
+            image, error = self.cache.thumbnail(path, size), None
+        except Exception as e:
+            image, error = None, e
+        if deliver is not None and self._current(slot, ticket):
+            deliver(image, error)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
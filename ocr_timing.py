@@ -0,0 +1,238 @@
+"""
+Stage Timings
+-------------
+Measures wall time per pipeline stage and per tesseract pass, keeps rolling
+averages per OCR mode and image size, and turns those averages into progress
+percentages and ETAs while a scan is running.
+"""
+
+import time
+import threading
+
+from ocr_paths import data_path, read_json, write_json_atomic, file_lock, at_exit
+from ocr_log import get_logger
+
+log = get_logger("timing")
+
+
+# Pipeline stages in the order they run
+STAGES = ("decode", "preprocess", "ocr", "clean")
+
+# Starting guesses (seconds) until a mode/size combination has been measured
+DEFAULT_STAGE_SECONDS = {
+    "decode": 0.1,
+    "preprocess": 0.5,
+    "ocr": 4.0,
+    "clean": 0.05,
+}
+
+# Seconds between saves of the rolling averages; the rest is saved when the process exits
+SAVE_INTERVAL = 30.0
+
+# Upper edges of the megapixel buckets timings are grouped by
+MEGAPIXEL_BUCKETS = (0.5, 1, 2, 4, 8, 16, 32)
+
+
+def megapixel_bucket(width, height):
+    """Name of the size bucket an image of width x height falls into"""
+    megapixels = width * height / 1000000
+    for edge in MEGAPIXEL_BUCKETS:
+        if megapixels <= edge:
+            return f"<={edge}MP"
+    return f">{MEGAPIXEL_BUCKETS[-1]}MP"
+
+
+class StageTimer:
+    """Wall time per stage and per OCR pass for a single job"""
+
+    def __init__(self):
+        self.stages = {}
+        self.passes = []
+        self.total = 0.0
+        self._stage = None
+        self._stage_started = None
+        self._started = time.perf_counter()
+
+    def begin(self, stage):
+        """Close the running stage and start timing the next one ("done" just closes)"""
+        now = time.perf_counter()
+        if self._stage is not None:
+            elapsed = now - self._stage_started
+            self.stages[self._stage] = self.stages.get(self._stage, 0.0) + elapsed
+            self._stage = None
+        if stage == "done":
+            self.total = now - self._started
+        else:
+            self._stage = stage
+            self._stage_started = now
+
+    def finish(self):
+        """Stop timing"""
+        self.begin("done")
+
+    def record_pass(self, label, seconds):
+        """
+        Record one tesseract pass; list.append keeps this safe across threads.
+        Returns the pass's record, to which selection adds its outcome (see ocr_passes).
+        """
+        record = {"label": label, "seconds": seconds}
+        self.passes.append(record)
+        return record
+
+    def as_dict(self):
+        """Plain-data view of the timings for results and persistence"""
+        return {
+            "stages": dict(self.stages),
+            "passes": [dict(record) for record in self.passes],
+            "total": self.total,
+        }
+
+
+class TimingStore:
+    """Rolling average stage and pass durations per OCR mode and megapixel bucket"""
+
+    # Weight of the newest measurement in the exponential moving average
+    ALPHA = 0.2
+
+    def __init__(self, path=None):
+        self.path = path or data_path("stage_timings.json")
+        self._lock = threading.Lock()
+        self._data = read_json(self.path, {}) or {}
+        # Jobs folded in since the last save, replayed onto the file so concurrent workers don't lose them
+        self._pending = []
+        self._saved_at = time.monotonic()
+
+    @staticmethod
+    def _key(mode, bucket):
+        return f"{mode}|{bucket}"
+
+    def expected(self, mode, bucket):
+        """Expected seconds per stage for a mode and size bucket"""
+        expected = dict(DEFAULT_STAGE_SECONDS)
+        with self._lock:
+            entry = self._data.get(self._key(mode, bucket))
+            if entry:
+                expected.update(entry.get("stages", {}))
+        return expected
+
+    def expected_passes(self, mode, bucket):
+        """Average seconds per labelled OCR pass for a mode and size bucket"""
+        with self._lock:
+            entry = self._data.get(self._key(mode, bucket)) or {}
+            return dict(entry.get("passes", {}))
+
+    def update(self, mode, bucket, timings):
+        """Fold one job's StageTimer.as_dict() into the rolling averages"""
+        job = (self._key(mode, bucket), dict(timings["stages"]),
+               [(item["label"], item["seconds"]) for item in timings["passes"]])
+        with self._lock:
+            self._fold(self._data, *job)
+            self._pending.append(job)
+
+    def _fold(self, data, key, stages, passes):
+        entry = data.setdefault(key, {"jobs": 0, "stages": {}, "passes": {}})
+        for stage, seconds in stages.items():
+            entry["stages"][stage] = self._average(entry["stages"].get(stage), seconds)
+
+        # Several passes can share a label (e.g. one per region); average their total
+        pass_totals = {}
+        for label, seconds in passes:
+            pass_totals[label] = pass_totals.get(label, 0.0) + seconds
+        for label, seconds in pass_totals.items():
+            entry["passes"][label] = self._average(entry["passes"].get(label), seconds)
+
+        entry["jobs"] += 1
+
+    def _average(self, old, new):
+        if old is None:
+            return new
+        return old + self.ALPHA * (new - old)
+
+    def save(self):
+        """
+        Replay the jobs folded in since the last save onto the file's averages,
+        under a lock, so processes sharing the file keep each other's updates.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._saved_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            with file_lock(self.path):
+                merged = read_json(self.path, {}) or {}
+                for job in pending:
+                    self._fold(merged, *job)
+                write_json_atomic(self.path, merged)
+        except OSError as e:
+            log.warning("Could not save stage timings: %s", e)
+            with self._lock:
+                self._pending[:0] = pending
+            return
+        with self._lock:
+            # Jobs added while the file was written are folded in again on top of it
+            for job in self._pending:
+                self._fold(merged, *job)
+            self._data = merged
+
+    def maybe_save(self):
+        """Save when SAVE_INTERVAL has passed since the last save"""
+        if time.monotonic() - self._saved_at >= SAVE_INTERVAL:
+            self.save()
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_timing_store():
+    """Process-wide TimingStore, loaded on first use"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TimingStore()
+            at_exit(_store.save)
+        return _store
+
+
+class ProgressEstimator:
+    """Turns expected stage durations into a progress percentage and ETA"""
+
+    def __init__(self, expected, stages=STAGES):
+        self.expected = dict(expected)
+        self.stages = list(stages)
+        self.finished = False
+        self._stage_index = None
+        self._stage_started = None
+
+    def set_expected(self, expected):
+        """Swap in better estimates, e.g. once the image type has been detected"""
+        self.expected.update(expected)
+
+    def begin(self, stage, now=None):
+        """Note that a stage has started"""
+        now = time.monotonic() if now is None else now
+        if stage == "done":
+            self.finished = True
+        elif stage in self.stages:
+            self._stage_index = self.stages.index(stage)
+            self._stage_started = now
+
+    def estimate(self, now=None):
+        """Return (percent complete, estimated seconds remaining)"""
+        if self.finished:
+            return 100.0, 0.0
+        durations = [max(0.001, self.expected.get(stage, 0.0)) for stage in self.stages]
+        total = sum(durations)
+        if self._stage_index is None:
+            return 0.0, total
+
+        now = time.monotonic() if now is None else now
+        elapsed = now - self._stage_started
+        current = durations[self._stage_index]
+
+        # Never let a slow stage push the bar past its own share
+        done = sum(durations[:self._stage_index]) + min(elapsed, current * 0.95)
+        remaining = max(0.0, current - elapsed) + sum(durations[self._stage_index + 1:])
+
+        return min(99.0, 100.0 * done / total), remaining
@@ -0,0 +1,228 @@
+"""
+Tracing
+-------
+Spans around the pipeline's stages (decoding, feature extraction, each
+preprocessing step, every tesseract pass, selection and cleaning), written as
+Chrome trace-event JSON that Perfetto (ui.perfetto.dev) or chrome://tracing
+can show as a timeline per process and thread.
+
+Tracing is off unless enabled: run_ocr.py batch/watch --trace FILE, or the
+OCR_TRACE environment variable for the desktop application. While it is off,
+span() returns a shared object whose enter and exit do nothing, and traced
+functions make one extra call, so instrumentation can stay in hot paths.
+
+Worker processes collect their own spans; the pool hands them to the parent
+with each job's result, and the parent writes one trace for all of them.
+Timestamps come from the monotonic clock, which processes on one machine
+share. A trace opened with open_trace is appended to every few seconds while
+jobs run, so a long watch session neither holds its events in memory nor
+loses them if it dies: the file is a JSON array of events, which the viewers
+load even without its closing bracket.
+"""
+
+import os
+import json
+import time
+import functools
+import threading
+import multiprocessing
+
+
+TRACE_ENV = "OCR_TRACE"
+
+# An open trace file is appended to when this many events are waiting, or this many seconds passed
+FLUSH_EVENTS = 5000
+FLUSH_INTERVAL = 5.0
+
+_enabled = False
+
+# Finished spans of this process: (name, category, start ns, duration ns, thread id, args)
+_spans = []
+
+# Names of the threads spans ended on; pool threads may be gone by the time spans are drained
+_thread_names = {}
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def is_enabled():
+    return _enabled
+
+
+def reset():
+    """Forget collected spans (e.g. those a forked worker inherited from its parent)"""
+    del _spans[:]
+    _thread_names.clear()
+
+
+class _NullSpan:
+    """What span() returns while tracing is off"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def set(self, **args):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("name", "category", "args", "_start")
+
+    def __init__(self, name, category, args):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        end = time.perf_counter_ns()
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        # list.append is atomic, so spans can end on any thread
+        tid = threading.get_ident()
+        if tid not in _thread_names:
+            _thread_names[tid] = threading.current_thread().name
+        _spans.append((self.name, self.category, self._start, end - self._start, tid, self.args))
+        return False
+
+    def set(self, **args):
+        """Attach arguments known only once the span is running (e.g. a result size)"""
+        self.args.update(args)
+
+
+def span(name, category="ocr", **args):
+    """Context manager timing a block as one span, with args shown alongside it"""
+    if not _enabled:
+        return _NULL_SPAN
+    return _Span(name, category, args)
+
+
+def traced(name, category="ocr"):
+    """Decorator timing every call of a function as a span"""
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(name, category, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def drain():
+    """This process's spans since the last drain, as trace events"""
+    count = len(_spans)
+    spans = _spans[:count]
+    del _spans[:count]
+
+    pid = os.getpid()
+    events = [{"name": "process_name", "ph": "M", "pid": pid,
+               "args": {"name": multiprocessing.current_process().name}}]
+    for tid in {span[4] for span in spans}:
+        events.append({"name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+                       "args": {"name": _thread_names.get(tid, str(tid))}})
+    for name, category, start, duration, tid, args in spans:
+        events.append({"name": name, "cat": category, "ph": "X", "ts": start / 1000,
+                       "dur": duration / 1000, "pid": pid, "tid": tid, "args": args})
+    return events
+
+
+# Events drained from worker processes, waiting to be written with this process's own
+_collected = []
+
+# The TraceFile collected events are appended to, if one is open
+_trace_file = None
+_flush_lock = threading.Lock()
+_flushed_at = 0.0
+
+
+class TraceFile:
+    """A Chrome trace-event JSON array written as events arrive"""
+
+    def __init__(self, path):
+        self.path = path
+        self.spans = 0
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write("[")
+        self._separator = "\n"
+
+    def write(self, events):
+        for event in events:
+            self._file.write(self._separator + json.dumps(event))
+            self._separator = ",\n"
+            if event["ph"] == "X":
+                self.spans += 1
+        self._file.flush()
+
+    def close(self):
+        self._file.write("\n]\n")
+        self._file.close()
+
+
+def open_trace(path):
+    """Start appending collected spans to path, every FLUSH_INTERVAL seconds or FLUSH_EVENTS events"""
+    global _trace_file, _flushed_at
+    with _flush_lock:
+        _trace_file = TraceFile(path)
+        _flushed_at = time.monotonic()
+
+
+def collect(events):
+    """Keep trace events from another process for the trace file"""
+    if events:
+        _collected.extend(events)
+        if _trace_file is not None and (len(_collected) >= FLUSH_EVENTS
+                                        or time.monotonic() - _flushed_at >= FLUSH_INTERVAL):
+            flush()
+
+
+def flush():
+    """Append the collected events and this process's spans to the open trace file"""
+    global _flushed_at
+    with _flush_lock:
+        if _trace_file is None:
+            return
+        count = len(_collected)
+        events = _collected[:count]
+        del _collected[:count]
+        _trace_file.write(events + drain())
+        _flushed_at = time.monotonic()
+
+
+def close_trace():
+    """Write the remaining events and close the trace file; returns its span count"""
+    global _trace_file
+    flush()
+    with _flush_lock:
+        trace_file, _trace_file = _trace_file, None
+    if trace_file is None:
+        return 0
+    trace_file.close()
+    return trace_file.spans
+
+
+def write_trace(path):
+    """Write every span collected so far to path as Chrome trace-event JSON; returns the event count"""
+    events = _collected + drain()
+    del _collected[:]
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return sum(1 for event in events if event["ph"] == "X")
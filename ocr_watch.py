@@ -0,0 +1,269 @@
+"""
+Hot Folder Watcher
+------------------
+Watches a directory that scanners drop files into and OCRs each new or changed
+image exactly once. Files are picked up by polling (one directory listing per
+interval, no per-file syscalls beyond what the listing returns), are only
+queued once their size and mtime have stopped changing, and are compared by
+content hash so a file that was merely touched is not reprocessed.
+
+Completed files are appended to a checkpoint journal (fsync'd per entry), so a
+restarted watcher resumes where it left off and never redoes finished work.
+"""
+
+import os
+import json
+import time
+import queue
+
+from ocr_files import IMAGE_EXTENSIONS, file_hash, write_result
+from ocr_log import get_logger
+
+log = get_logger("watch")
+
+
+CHECKPOINT_NAME = ".ocr_checkpoint.jsonl"
+
+
+class Checkpoint:
+    """Append-only journal of completed files; the last entry for a path wins"""
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self._journal_lines = 0
+        self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                self._journal_lines += 1
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # A torn final line from a crash mid-write; the file will be redone
+                    continue
+                self.entries[entry["path"]] = entry
+
+    def get(self, path):
+        return self.entries.get(path)
+
+    def record(self, entry):
+        """Durably record a completed (or unchanged) file"""
+        self.entries[entry["path"]] = entry
+        self._file.write(json.dumps(entry, sort_keys=True) + "\n")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._journal_lines += 1
+
+        # Rewrite the journal once it is mostly superseded entries
+        if self._journal_lines > 2 * len(self.entries) + 100:
+            self.compact()
+
+    def compact(self):
+        """Rewrite the journal with one line per file"""
+        self._file.close()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, sort_keys=True) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._journal_lines = len(self.entries)
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    @property
+    def closed(self):
+        return self._file.closed
+
+    def close(self):
+        self._file.close()
+
+
+class HotFolderWatcher:
+    """Polls a directory and OCRs new or changed images on a worker pool"""
+
+    def __init__(self, directory, pool, output_dir=None, checkpoint_path=None,
+                 interval=2.0, settle_seconds=2.0, recursive=False, words_format=None, sinks=None):
+        self.directory = os.path.abspath(directory)
+        self.pool = pool
+        self.output_dir = output_dir
+        self.interval = interval
+        self.settle_seconds = settle_seconds
+        self.recursive = recursive
+        self.words_format = words_format
+        # Optional SinkWriter that also receives every result
+        self.sinks = sinks
+        self.checkpoint = Checkpoint(checkpoint_path or os.path.join(self.directory, CHECKPOINT_NAME))
+
+        # path -> (size, mtime_ns, time the size/mtime were first seen unchanged)
+        self._candidates = {}
+        # path -> (size, mtime_ns, sha256) for jobs on the pool
+        self._in_flight = {}
+        # path -> (size, mtime_ns) of files that failed; skipped until they change
+        self._failed = {}
+        # Completed JobResults handed over from the pool's result thread
+        self._completed = queue.Queue()
+
+        self.processed = 0
+        self.failed = 0
+        self.skipped_unchanged = 0
+        self._running = False
+
+    def _scan(self, directory):
+        """Yield (path, stat) for image files using the directory listing's cached stat data"""
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if self.recursive and not entry.name.startswith('.'):
+                            yield from self._scan(entry.path)
+                    elif entry.name.lower().endswith(IMAGE_EXTENSIONS) and not entry.name.startswith('.'):
+                        yield entry.path, entry.stat()
+        except OSError as e:
+            log.warning("Could not list %s: %s", directory, e)
+
+    def _relative(self, path):
+        return os.path.relpath(path, self.directory)
+
+    def poll(self, now=None):
+        """Find files that are new or changed and have stopped growing, and queue them"""
+        now = time.monotonic() if now is None else now
+        present = set()
+
+        for path, stat in self._scan(self.directory):
+            present.add(path)
+            if path in self._in_flight:
+                continue
+
+            signature = (stat.st_size, stat.st_mtime_ns)
+            if path in self._failed:
+                if self._failed[path] == signature:
+                    continue
+                del self._failed[path]
+            done = self.checkpoint.get(self._relative(path))
+            if done and (done["size"], done["mtime_ns"]) == signature:
+                continue
+
+            # Wait until the writer has finished: same size and mtime for settle_seconds
+            previous = self._candidates.get(path)
+            if previous is None or previous[:2] != signature:
+                self._candidates[path] = (signature[0], signature[1], now)
+                continue
+            if now - previous[2] < self.settle_seconds or stat.st_size == 0:
+                continue
+
+            del self._candidates[path]
+            self._queue_if_changed(path, signature, done)
+
+        # Forget files that disappeared before they settled, or after they failed
+        for pending in (self._candidates, self._failed):
+            for path in list(pending):
+                if path not in present:
+                    del pending[path]
+
+    def _queue_if_changed(self, path, signature, done):
+        try:
+            digest = file_hash(path)
+        except OSError as e:
+            log.warning("Could not read %s: %s", path, e)
+            self._failed[path] = signature
+            return
+
+        if done and done.get("sha256") == digest:
+            # Touched or copied over with identical content: just refresh the checkpoint
+            entry = dict(done, size=signature[0], mtime_ns=signature[1])
+            self.checkpoint.record(entry)
+            self.skipped_unchanged += 1
+            return
+
+        self._in_flight[path] = (signature[0], signature[1], digest)
+        self.pool.submit(path, callback=self._completed.put)
+        log.info("Queued %s", self._relative(path))
+
+    def collect(self):
+        """Write finished results and checkpoint them"""
+        while True:
+            try:
+                result = self._completed.get_nowait()
+            except queue.Empty:
+                return
+
+            size, mtime_ns, digest = self._in_flight.pop(result.path)
+            if self.sinks is not None:
+                self.sinks.submit(result)
+            if result.error:
+                # Not checkpointed, so it is retried once the file changes or the watcher restarts
+                self.failed += 1
+                self._failed[result.path] = (size, mtime_ns)
+                log.error("Failed %s: %s", self._relative(result.path), result.error)
+                continue
+
+            try:
+                output_path = write_result(result, self.output_dir, self.words_format, root=self.directory)
+            except OSError as e:
+                # Not checkpointed either: the file is redone once it changes or the watcher restarts
+                self.failed += 1
+                self._failed[result.path] = (size, mtime_ns)
+                log.error("Could not write the result of %s: %s", self._relative(result.path), e)
+                continue
+
+            self.checkpoint.record({
+                "path": self._relative(result.path),
+                "size": size,
+                "mtime_ns": mtime_ns,
+                "sha256": digest,
+                "output": output_path,
+                "completed_at": time.time(),
+            })
+            self.processed += 1
+            log.info("%s: %d chars in %.2fs", self._relative(result.path), len(result.text), result.seconds)
+
+    @property
+    def pending(self):
+        """Files waiting to settle or on the pool"""
+        return len(self._candidates) + len(self._in_flight)
+
+    def run(self, once=False):
+        """Poll until stopped; with once=True, stop when the current backlog is done"""
+        if self.output_dir:
+            os.makedirs(self.output_dir, exist_ok=True)
+
+        self._running = True
+        try:
+            while self._running:
+                self.poll()
+                self.collect()
+                if once and not self.pending:
+                    break
+                time.sleep(self.interval)
+        except KeyboardInterrupt:
+            log.info("Stopping watcher...")
+        finally:
+            if not self.checkpoint.closed:
+                self.stop()
+
+    def stop(self, timeout=60.0):
+        """Wait (up to timeout seconds) for queued jobs, record them and close the checkpoint"""
+        self._running = False
+        deadline = time.monotonic() + timeout
+        while self._in_flight and time.monotonic() < deadline:
+            self.collect()
+            if self._in_flight:
+                time.sleep(0.1)
+        if self._in_flight:
+            # Unfinished files are not checkpointed, so the next run picks them up again
+            log.warning("%d unfinished files will be processed on the next run", len(self._in_flight))
+        self.checkpoint.close()
+
+    def summary(self):
+        return {
+            "processed": self.processed,
+            "failed": self.failed,
+            "skipped_unchanged": self.skipped_unchanged,
+            "checkpointed": len(self.checkpoint.entries),
+        }
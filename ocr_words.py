@@ -0,0 +1,385 @@
+"""
+OCR Word Table
+--------------
+Word boxes, confidences and layout structure from a tesseract pass, stored as
+columns rather than one object per word.
+
+Every column is an array.array of machine integers, so a word costs a few dozen
+bytes instead of the several hundred of a dict of boxed values
+(benchmarks/bench_word_table.py). Word text is not
+stored per word: the table keeps the recognized text as one string and each
+word is a (start, length) span of it. Exporters stream straight from the
+columns to a file without building per-word records.
+"""
+
+import re
+import json
+from array import array
+from html import escape
+
+
+# Column name -> array typecode
+COLUMNS = (
+    ("start", "I"),    # offset of the word in the table's text
+    ("length", "H"),   # characters in the word
+    ("left", "I"),
+    ("top", "I"),
+    ("width", "I"),
+    ("height", "I"),
+    ("conf", "b"),     # tesseract confidence, 0-100 (-1 when unknown)
+    ("page", "H"),
+    ("block", "H"),
+    ("par", "H"),
+    ("line", "H"),
+)
+
+# tesseract's level number for a word in image_to_data output
+WORD_LEVEL = 5
+
+EXPORT_FORMATS = ("tsv", "json", "hocr", "alto")
+
+# File extension used for each export format
+EXPORT_EXTENSIONS = {"tsv": ".tsv", "json": ".words.json", "hocr": ".hocr", "alto": ".alto.xml"}
+
+_WORD = re.compile(r'\S+')
+
+TSV_HEADER = "level\tpage_num\tblock_num\tpar_num\tline_num\tword_num\tleft\ttop\twidth\theight\tconf\ttext\n"
+
+
+def _confidence(value):
+    """tesseract reports confidence as a string or number, possibly fractional"""
+    try:
+        return max(-1, min(100, int(round(float(value)))))
+    except (TypeError, ValueError):
+        return -1
+
+
+class WordTable:
+    """Columnar table of the words recognized in one or more pages"""
+
+    def __init__(self, text="", columns=None, page_sizes=None):
+        self.text = text
+        self.columns = columns or {name: array(typecode) for name, typecode in COLUMNS}
+        # (width, height) of the image each page's boxes refer to, by page number
+        self.page_sizes = list(page_sizes or [])
+
+    @classmethod
+    def from_tesseract(cls, data, image_size=None):
+        """
+        Build a table from pytesseract.image_to_data(..., output_type=Output.DICT).
+
+        The text is rebuilt the way tesseract's text output lays it out: words
+        separated by a space, lines by a newline and paragraphs and blocks by a
+        blank line.
+        """
+        table = cls(page_sizes=[tuple(image_size)] if image_size else None)
+        columns = table.columns
+        starts, lengths = columns["start"], columns["length"]
+        lefts, tops, widths, heights = columns["left"], columns["top"], columns["width"], columns["height"]
+        confs, pages, blocks, pars, lines = (
+            columns["conf"], columns["page"], columns["block"], columns["par"], columns["line"])
+
+        pieces = []
+        offset = 0
+        previous = None
+        for index, word in enumerate(data.get("text", ())):
+            if int(data["level"][index]) != WORD_LEVEL:
+                continue
+            word = word.strip() if word else ""
+            if not word:
+                continue
+
+            block, par, line = int(data["block_num"][index]), int(data["par_num"][index]), int(data["line_num"][index])
+            if previous is not None:
+                if previous[:2] != (block, par):
+                    separator = "\n\n"
+                elif previous[2] != line:
+                    separator = "\n"
+                else:
+                    separator = " "
+                pieces.append(separator)
+                offset += len(separator)
+            previous = (block, par, line)
+
+            pieces.append(word)
+            starts.append(offset)
+            lengths.append(min(len(word), 0xFFFF))
+            offset += len(word)
+
+            lefts.append(max(0, int(data["left"][index])))
+            tops.append(max(0, int(data["top"][index])))
+            widths.append(max(0, int(data["width"][index])))
+            heights.append(max(0, int(data["height"][index])))
+            confs.append(_confidence(data["conf"][index]))
+            pages.append(0)
+            blocks.append(block)
+            pars.append(par)
+            lines.append(line)
+
+        table.text = "".join(pieces)
+        return table
+
+    @classmethod
+    def concat(cls, tables, separator):
+        """Join per-page tables into one, numbering the pages in order and putting separator between their texts"""
+        table = cls()
+        columns = table.columns
+        pieces = []
+        offset = 0
+        for number, page in enumerate(tables):
+            if number:
+                pieces.append(separator)
+                offset += len(separator)
+            pieces.append(page.text)
+            for name, _ in COLUMNS:
+                if name == "start":
+                    columns[name].extend(start + offset for start in page.columns[name])
+                elif name == "page":
+                    columns[name].extend(array("H", [number]) * len(page))
+                else:
+                    columns[name].extend(page.columns[name])
+            offset += len(page.text)
+            table.page_sizes.append(page.page_sizes[0] if page.page_sizes else None)
+        table.text = "".join(pieces)
+        return table
+
+    @classmethod
+    def stack(cls, tables, tops, size, separator="\n\n"):
+        """Join tables of horizontal strips of one page into a table of the whole page of the given size"""
+        table = cls(page_sizes=[tuple(size)])
+        columns = table.columns
+        pieces = []
+        offset = 0
+        blocks = 0
+        for number, (strip, top) in enumerate(zip(tables, tops)):
+            if number:
+                pieces.append(separator)
+                offset += len(separator)
+            pieces.append(strip.text)
+            for name, _ in COLUMNS:
+                if name == "start":
+                    columns[name].extend(start + offset for start in strip.columns[name])
+                elif name == "top":
+                    columns[name].extend(value + top for value in strip.columns[name])
+                elif name == "block":
+                    # Keep block numbers distinct across strips
+                    columns[name].extend(value + blocks for value in strip.columns[name])
+                elif name == "page":
+                    columns[name].extend(array("H", [0]) * len(strip))
+                else:
+                    columns[name].extend(strip.columns[name])
+            offset += len(strip.text)
+            blocks += max(strip.columns["block"], default=0)
+        table.text = "".join(pieces)
+        return table
+
+    @classmethod
+    def gather(cls, text, sources, size=None):
+        """
+        Table of a text assembled from other tables' words (e.g. by consensus
+        voting): sources holds, for each whitespace-separated word of text in
+        order, the (table, index) it came from, or None for a word without a
+        box. The tables' boxes must refer to images of the given size.
+        """
+        table = cls(text, page_sizes=[tuple(size)] if size else None)
+        columns = table.columns
+        for match, source in zip(_WORD.finditer(text), sources):
+            if source is None:
+                continue
+            other, index = source
+            for name, _ in COLUMNS:
+                if name == "start":
+                    columns[name].append(match.start())
+                elif name == "length":
+                    columns[name].append(min(match.end() - match.start(), 0xFFFF))
+                else:
+                    columns[name].append(other.columns[name][index])
+        return table
+
+    def scaled(self, size):
+        """Copy of a single-page table with its boxes mapped onto an image of the given size"""
+        if not self.page_sizes or not self.page_sizes[0] or tuple(self.page_sizes[0]) == tuple(size):
+            return self
+        (from_w, from_h), (to_w, to_h) = self.page_sizes[0], size
+        sx, sy = to_w / max(1, from_w), to_h / max(1, from_h)
+        columns = dict(self.columns)
+        for name, factor in (("left", sx), ("width", sx), ("top", sy), ("height", sy)):
+            columns[name] = array("I", (int(round(value * factor)) for value in self.columns[name]))
+        return WordTable(self.text, columns, [tuple(size)])
+
+    def __len__(self):
+        return len(self.columns["start"])
+
+    def word(self, index):
+        """Text of the word at index"""
+        start = self.columns["start"][index]
+        return self.text[start:start + self.columns["length"][index]]
+
+    def words(self):
+        """Iterate over the words' text"""
+        text = self.text
+        for start, length in zip(self.columns["start"], self.columns["length"]):
+            yield text[start:start + length]
+
+    def mean_confidence(self):
+        """Average confidence of the words that have one, or None"""
+        known = [conf for conf in self.columns["conf"] if conf >= 0]
+        return sum(known) / len(known) if known else None
+
+    def nbytes(self):
+        """Memory held by the columns"""
+        return sum(column.itemsize * len(column) for column in self.columns.values())
+
+    # -- Layout ------------------------------------------------------------
+
+    def _spans(self, names, lo, hi):
+        """(first, end) index ranges in [lo, hi) where the named columns stay the same"""
+        keys = [self.columns[name] for name in names]
+        first = lo
+        for index in range(lo + 1, hi):
+            if any(key[index] != key[index - 1] for key in keys):
+                yield first, index
+                first = index
+        if first < hi:
+            yield first, hi
+
+    def _bbox(self, lo, hi):
+        """(left, top, right, bottom) around the words in [lo, hi)"""
+        columns = self.columns
+        left = min(columns["left"][lo:hi])
+        top = min(columns["top"][lo:hi])
+        right = max(l + w for l, w in zip(columns["left"][lo:hi], columns["width"][lo:hi]))
+        bottom = max(t + h for t, h in zip(columns["top"][lo:hi], columns["height"][lo:hi]))
+        return left, top, right, bottom
+
+    def _page_size(self, page, lo, hi):
+        if page < len(self.page_sizes) and self.page_sizes[page]:
+            return self.page_sizes[page]
+        _, _, right, bottom = self._bbox(lo, hi)
+        return right, bottom
+
+    # -- Exporters ---------------------------------------------------------
+
+    def write_tsv(self, f):
+        """Words in tesseract's TSV layout (word rows only)"""
+        f.write(TSV_HEADER)
+        columns = self.columns
+        text = self.text
+        word_num = 0
+        previous_line = None
+        for row in zip(columns["start"], columns["length"], columns["page"], columns["block"], columns["par"],
+                       columns["line"], columns["left"], columns["top"], columns["width"], columns["height"],
+                       columns["conf"]):
+            start, length, page, block, par, line, left, top, width, height, conf = row
+            line_key = (page, block, par, line)
+            word_num = word_num + 1 if line_key == previous_line else 1
+            previous_line = line_key
+            word = text[start:start + length].replace("\t", " ")
+            f.write(f"{WORD_LEVEL}\t{page + 1}\t{block}\t{par}\t{line}\t{word_num}\t"
+                    f"{left}\t{top}\t{width}\t{height}\t{conf}\t{word}\n")
+
+    def write_json(self, f):
+        """The text and the columns as JSON arrays (word text is text[start:start + length])"""
+        f.write('{"text": ')
+        f.write(json.dumps(self.text))
+        f.write(', "page_sizes": ')
+        f.write(json.dumps([list(size) if size else None for size in self.page_sizes]))
+        f.write(', "words": {')
+        for number, (name, _) in enumerate(COLUMNS):
+            if number:
+                f.write(", ")
+            f.write(f'"{name}": ')
+            f.write(json.dumps(self.columns[name].tolist()))
+        f.write("}}\n")
+
+    def write_hocr(self, f, title="OCR output"):
+        """hOCR (HTML with ocr_page / ocr_carea / ocr_par / ocr_line / ocrx_word elements)"""
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"\n'
+                '    "http://www.w3.org/TR/xhtml1/DTD/xhtml1-transitional.dtd">\n'
+                '<html xmlns="http://www.w3.org/1999/xhtml" xml:lang="en" lang="en">\n'
+                f'<head>\n<title>{escape(title)}</title>\n'
+                '<meta http-equiv="Content-Type" content="text/html;charset=utf-8"/>\n'
+                '<meta name="ocr-system" content="tesseract"/>\n'
+                '<meta name="ocr-capabilities" content="ocr_page ocr_carea ocr_par ocr_line ocrx_word"/>\n'
+                '</head>\n<body>\n')
+        columns = self.columns
+        word_id = 0
+        for page_lo, page_hi in self._spans(("page",), 0, len(self)):
+            page = columns["page"][page_lo]
+            width, height = self._page_size(page, page_lo, page_hi)
+            f.write(f'<div class="ocr_page" id="page_{page + 1}" title="bbox 0 0 {width} {height}">\n')
+            for block_lo, block_hi in self._spans(("block",), page_lo, page_hi):
+                block_id = f"{page + 1}_{columns['block'][block_lo]}"
+                f.write(f' <div class="ocr_carea" id="block_{block_id}" '
+                        f'title="bbox {" ".join(map(str, self._bbox(block_lo, block_hi)))}">\n')
+                for par_lo, par_hi in self._spans(("par",), block_lo, block_hi):
+                    par_id = f"{block_id}_{columns['par'][par_lo]}"
+                    f.write(f'  <p class="ocr_par" id="par_{par_id}" '
+                            f'title="bbox {" ".join(map(str, self._bbox(par_lo, par_hi)))}">\n')
+                    for line_lo, line_hi in self._spans(("line",), par_lo, par_hi):
+                        line_id = f"{par_id}_{columns['line'][line_lo]}"
+                        f.write(f'   <span class="ocr_line" id="line_{line_id}" '
+                                f'title="bbox {" ".join(map(str, self._bbox(line_lo, line_hi)))}">')
+                        for index in range(line_lo, line_hi):
+                            word_id += 1
+                            left, top = columns["left"][index], columns["top"][index]
+                            right, bottom = left + columns["width"][index], top + columns["height"][index]
+                            conf = max(0, columns["conf"][index])
+                            if index > line_lo:
+                                f.write(" ")
+                            f.write(f'<span class="ocrx_word" id="word_{word_id}" '
+                                    f'title="bbox {left} {top} {right} {bottom}; x_wconf {conf}">'
+                                    f'{escape(self.word(index))}</span>')
+                        f.write('</span>\n')
+                    f.write('  </p>\n')
+                f.write(' </div>\n')
+            f.write('</div>\n')
+        f.write('</body>\n</html>\n')
+
+    def write_alto(self, f):
+        """ALTO v4 XML (paragraphs become TextBlocks, since ALTO has no paragraph level)"""
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<alto xmlns="http://www.loc.gov/standards/alto/ns-v4#">\n'
+                ' <Description>\n  <MeasurementUnit>pixel</MeasurementUnit>\n'
+                '  <OCRProcessing ID="ocr_0"><ocrProcessingStep><processingSoftware>'
+                '<softwareName>tesseract</softwareName></processingSoftware></ocrProcessingStep>'
+                '</OCRProcessing>\n </Description>\n <Layout>\n')
+        columns = self.columns
+        for page_lo, page_hi in self._spans(("page",), 0, len(self)):
+            page = columns["page"][page_lo]
+            width, height = self._page_size(page, page_lo, page_hi)
+            f.write(f'  <Page ID="page_{page + 1}" PHYSICAL_IMG_NR="{page + 1}" WIDTH="{width}" HEIGHT="{height}">\n'
+                    f'   <PrintSpace HPOS="0" VPOS="0" WIDTH="{width}" HEIGHT="{height}">\n')
+            for par_lo, par_hi in self._spans(("block", "par"), page_lo, page_hi):
+                par_id = f"{page + 1}_{columns['block'][par_lo]}_{columns['par'][par_lo]}"
+                f.write(f'    <TextBlock ID="block_{par_id}" {self._alto_box(par_lo, par_hi)}>\n')
+                for line_lo, line_hi in self._spans(("line",), par_lo, par_hi):
+                    f.write(f'     <TextLine ID="line_{par_id}_{columns["line"][line_lo]}" '
+                            f'{self._alto_box(line_lo, line_hi)}>\n')
+                    for index in range(line_lo, line_hi):
+                        if index > line_lo:
+                            f.write('      <SP/>\n')
+                        conf = max(0, columns["conf"][index]) / 100
+                        f.write(f'      <String CONTENT="{escape(self.word(index))}" '
+                                f'HPOS="{columns["left"][index]}" VPOS="{columns["top"][index]}" '
+                                f'WIDTH="{columns["width"][index]}" HEIGHT="{columns["height"][index]}" '
+                                f'WC="{conf:.2f}"/>\n')
+                    f.write('     </TextLine>\n')
+                f.write('    </TextBlock>\n')
+            f.write('   </PrintSpace>\n  </Page>\n')
+        f.write(' </Layout>\n</alto>\n')
+
+    def _alto_box(self, lo, hi):
+        left, top, right, bottom = self._bbox(lo, hi)
+        return f'HPOS="{left}" VPOS="{top}" WIDTH="{right - left}" HEIGHT="{bottom - top}"'
+
+    def export(self, fmt, path):
+        """Write the table to path in one of EXPORT_FORMATS"""
+        if fmt not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown word table format: {fmt}")
+        with open(path, 'w', encoding='utf-8') as f:
+            getattr(self, f"write_{fmt}")(f)
+
+    def __repr__(self):
+        return f"WordTable(words={len(self)}, pages={len(self.page_sizes) or 1})"
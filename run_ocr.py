@@ -3,12 +3,27 @@
 OCR Application Launcher
 ------------------------
 This script launches the OCR application and handles any initialization requirements.
+
+Usage:
+    python run_ocr.py                      Start the desktop application
+    python run_ocr.py batch <paths...>     OCR images on a pool of worker processes
+    python run_ocr.py watch <dir>          OCR new and changed images as they arrive
+    python run_ocr.py learn-confusions <pairs.tsv...>
+                                           Learn OCR character confusions from ground truth
+    python run_ocr.py build-language-model <corpus.txt...>
+                                           Build the language model that ranks OCR candidates
+    python run_ocr.py search <words...>    Search the full-text index of OCR results
+    python run_ocr.py passes               Report which OCR passes win and which auto-prune skips
 """
 
 import os
 import sys
+import argparse
 import subprocess
 
+import ocr_log
+from ocr_files import IMAGE_EXTENSIONS, write_result
+
 def check_dependencies():
     """Check if required dependencies are installed"""
     try:
@@ -35,17 +50,414 @@ def check_tesseract():
         print("- Linux: sudo apt-get install tesseract-ocr")
         return False
 
-def main():
+def collect_images(paths):
+    """Expand files and directories into a sorted list of image paths"""
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append(os.path.join(path, name))
+        elif path.lower().endswith(IMAGE_EXTENSIONS):
+            images.append(path)
+        else:
+            print(f"Skipping unsupported file: {path}")
+    return images
+
+def sinks_from(args):
+    """SinkWriter for the --jsonl, --sqlite and --npz options, or None"""
+    from ocr_sinks import open_sinks
+    index = None
+    if args.index is not None:
+        from ocr_index import index_path
+        index = args.index or index_path()
+    return open_sinks(jsonl=args.jsonl, sqlite=args.sqlite, npz=args.npz, index=index,
+                      sqlite_batch_size=args.sqlite_batch)
+
+def start_logging(args):
+    """Log at --log-level (else OCR_LOG_LEVEL, else warning); the workers inherit the level"""
+    ocr_log.configure(args.log_level, default="warning")
+
+def print_counters():
+    """The per-scan counters the workers added up, if any"""
+    counters = ocr_log.format_counters()
+    if counters:
+        print(counters)
+
+def start_metrics(args):
+    """Serve --metrics-port and write --metrics-file; the handles for finish_metrics"""
+    handles = []
+    if args.metrics_port is None and not args.metrics_file:
+        return handles
+    import ocr_metrics
+    if args.metrics_port is not None:
+        server = ocr_metrics.MetricsServer(args.metrics_port)
+        print(f"Serving metrics on {server.url}")
+        handles.append(server)
+    if args.metrics_file:
+        handles.append(ocr_metrics.SnapshotWriter(args.metrics_file, args.metrics_interval))
+    return handles
+
+def finish_metrics(handles):
+    """Stop the metrics endpoint and write the final snapshot"""
+    for handle in handles:
+        handle.close()
+
+def start_trace(args):
+    """Turn on span tracing for --trace; True if the pool's workers should trace too"""
+    if not args.trace:
+        return False
+    import ocr_trace
+    ocr_trace.enable()
+    ocr_trace.open_trace(args.trace)
+    return True
+
+def finish_trace(args):
+    """Write the last spans collected from the workers and close the --trace file"""
+    if args.trace:
+        import ocr_trace
+        print(f"Wrote {ocr_trace.close_trace()} spans to {args.trace} (open in https://ui.perfetto.dev)")
+
+def format_dedup_stats(results):
+    """Summary of the near-duplicate lookups of a run's OCRResults"""
+    looked_up = [result.dedup for result in results if result.dedup is not None]
+    reused = sum(1 for dedup in looked_up if dedup["reused"])
+    rejected = sum(1 for dedup in looked_up if dedup["match"] and not dedup["reused"])
+    return (f"Dedup: {reused} of {len(looked_up)} images reused a near-duplicate's result, "
+            f"{rejected} near-duplicates read differently and were OCR'd")
+
+def run_batch(args):
+    """OCR a set of images on a pool of pre-warmed worker processes"""
+    images = collect_images(args.paths)
+    if not images:
+        print("No images to process")
+        return 1
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    # Images from several folders keep their folders under -o, relative to the folder they share
+    root = os.path.commonpath([os.path.dirname(os.path.abspath(path)) for path in images])
+
+    from ocr_pool import OCRWorkerPool
+
+    start_logging(args)
+    metrics = start_metrics(args)
+    sinks = sinks_from(args)
+    completed = []
+    unwritten = 0
+    try:
+        with OCRWorkerPool(workers=args.workers, max_jobs_per_worker=args.max_jobs_per_worker,
+                           engine_options=engine_options_from(args), trace=start_trace(args)) as pool:
+            for result in pool.map(images):
+                if sinks is not None:
+                    sinks.submit(result)
+                if result.error:
+                    print(f"FAILED {result.path}: {result.error}")
+                    continue
+                try:
+                    write_result(result, args.output_dir, args.words, root=root)
+                except OSError as e:
+                    # Disk full or no permission: the other images may still be written
+                    unwritten += 1
+                    print(f"FAILED {result.path}: could not write the result: {e}")
+                    continue
+                completed.append(result.result)
+                dedup = result.result.dedup
+                reused = f" (reused {dedup['match']})" if dedup and dedup["reused"] else ""
+                print(f"{result.path}: {len(result.text)} chars in {result.seconds:.2f}s{reused}")
+
+            print()
+            print(pool.format_stats())
+            if unwritten:
+                print(f"{unwritten} results could not be written")
+            if args.dedup:
+                print(format_dedup_stats(completed))
+            print_counters()
+    finally:
+        # Sink time is reported on its own: it runs on the writer thread, off the OCR path
+        if sinks is not None:
+            sinks.close()
+            print(sinks.format_stats())
+        finish_trace(args)
+        finish_metrics(metrics)
+
+    return 0
+
+def engine_options_from(args):
+    """Engine settings shared by the batch and watch commands"""
+    return {
+        "mode": args.mode,
+        "preprocessing": args.preprocessing,
+        "ai_enhancement": args.ai,
+        "lang": args.lang,
+        "debug": {
+            "directory": args.debug_dir,
+            "fmt": args.debug_format,
+            "compression": args.debug_compression,
+            "max_bytes": args.debug_max_mb * 1024 * 1024,
+            "max_age_days": args.debug_max_days,
+        } if args.debug_dir else None,
+        "dedup": {
+            "path": args.dedup_index,
+            "max_distance": args.dedup_distance,
+        } if args.dedup else None,
+        "auto_prune": args.auto_prune,
+    }
+
+def run_watch(args):
+    """Watch a hot folder and OCR new or changed images exactly once"""
+    if not os.path.isdir(args.directory):
+        print(f"Not a directory: {args.directory}")
+        return 1
+
+    from ocr_pool import OCRWorkerPool
+    from ocr_watch import HotFolderWatcher
+
+    start_logging(args)
+    metrics = start_metrics(args)
+    sinks = sinks_from(args)
+    try:
+        with OCRWorkerPool(workers=args.workers, max_jobs_per_worker=args.max_jobs_per_worker,
+                           engine_options=engine_options_from(args), trace=start_trace(args)) as pool:
+            watcher = HotFolderWatcher(
+                args.directory, pool,
+                output_dir=args.output_dir,
+                checkpoint_path=args.checkpoint,
+                interval=args.interval,
+                settle_seconds=args.settle,
+                recursive=args.recursive,
+                words_format=args.words,
+                sinks=sinks,
+            )
+            print(f"Watching {watcher.directory} (checkpoint: {watcher.checkpoint.path})")
+            watcher.run(once=args.once)
+
+            print()
+            print(", ".join(f"{key}: {value}" for key, value in watcher.summary().items()))
+            print(pool.format_stats())
+            print_counters()
+    finally:
+        if sinks is not None:
+            sinks.close()
+            print(sinks.format_stats())
+        finish_trace(args)
+        finish_metrics(metrics)
+
+    return 0
+
+def read_truth_pairs(args):
+    """(ocr_text, true_text) pairs from TSV files and/or matching text files in two folders"""
+    pairs = []
+    for path in args.pairs:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                fields = line.rstrip('\n').split('\t')
+                if len(fields) == 2:
+                    pairs.append((fields[0], fields[1]))
+
+    if args.ocr_dir and args.truth_dir:
+        for name in sorted(os.listdir(args.truth_dir)):
+            ocr_path = os.path.join(args.ocr_dir, name)
+            if not name.endswith('.txt') or not os.path.isfile(ocr_path):
+                continue
+            with open(ocr_path, 'r', encoding='utf-8') as f:
+                ocr_lines = f.read().splitlines()
+            with open(os.path.join(args.truth_dir, name), 'r', encoding='utf-8') as f:
+                truth_lines = f.read().splitlines()
+            # Line by line when the files line up, which keeps the alignments short
+            if len(ocr_lines) == len(truth_lines):
+                pairs.extend(zip(ocr_lines, truth_lines))
+            else:
+                pairs.append(('\n'.join(ocr_lines), '\n'.join(truth_lines)))
+    return pairs
+
+def run_learn_confusions(args):
+    """Learn character confusions from OCR output paired with ground truth"""
+    if bool(args.ocr_dir) != bool(args.truth_dir):
+        print("--ocr-dir and --truth-dir must be given together")
+        return 1
+
+    pairs = read_truth_pairs(args)
+    if not pairs:
+        print("No (OCR, ground truth) pairs found")
+        return 1
+
+    from ocr_confusion import save_learned_confusions, learned_confusions_path
+
+    learned = save_learned_confusions(pairs)
+    print(f"Learned {sum(learned.values())} confusions ({len(learned)} distinct) from {len(pairs)} pairs")
+    for (observed, intended), count in learned.most_common(20):
+        print(f"  {observed!r} -> {intended!r}: {count}")
+    print(f"Saved to {learned_confusions_path()}")
+    return 0
+
+def run_build_language_model(args):
+    """Count character n-grams in a text corpus for ranking OCR candidates"""
+    missing = [path for path in args.corpus if not os.path.isfile(path)]
+    if missing:
+        print(f"Not a file: {', '.join(missing)}")
+        return 1
+
+    import time
+    from ocr_ngram import build_language_model
+
+    started = time.perf_counter()
+    path = build_language_model(args.corpus, table_bits=args.table_bits)
+    print(f"Built {path} ({os.path.getsize(path) // 1024} KB) in {time.perf_counter() - started:.1f}s")
+    return 0
+
+def run_search(args):
+    """Print the best matching lines from the full-text index"""
+    import time
+    import json
+    from ocr_index import TextIndex, index_path
+
+    path = args.index or index_path()
+    if not os.path.isfile(path):
+        print(f"No index at {path}; build one with batch or watch --index")
+        return 1
+
+    index = TextIndex(path)
+    started = time.perf_counter()
+    hits = index.search(" ".join(args.query), limit=args.limit, raw=args.raw)
+    elapsed = time.perf_counter() - started
+    for hit in hits:
+        if args.json:
+            print(json.dumps(hit, ensure_ascii=False))
+        else:
+            box = " at {},{}-{},{}".format(*hit["box"]) if hit["box"] else ""
+            print(f"{hit['path']}:{hit['page']}:{hit['line']}{box}: {hit['snippet']}")
+    if not args.json:
+        print(f"{len(hits)} hits in {elapsed * 1000:.1f} ms")
+    index.close()
+    return 0
+
+def run_passes(args):
+    """Print how often each OCR pass wins and what it gains for its runtime"""
+    import json
+    from ocr_passes import PassStats, format_report
+
+    stats = PassStats()
+    rows = stats.rows(mode=args.mode)
+    if not rows:
+        print(f"No pass statistics in {stats.path} yet; they are collected as images are OCR'd")
+        return 1
+    if args.json:
+        print(json.dumps(rows, indent=2))
+    else:
+        print(format_report(rows))
+    return 0
+
+def add_engine_arguments(parser):
+    """Pool and OCR settings shared by the batch and watch commands"""
+    parser.add_argument("-o", "--output-dir", help="write .txt results here instead of next to the images")
+    parser.add_argument("-w", "--workers", type=int, default=None, help="number of worker processes")
+    parser.add_argument("--max-jobs-per-worker", type=int, default=50,
+                        help="recycle a worker after this many jobs to limit memory growth")
+    parser.add_argument("--mode", default="auto", choices=["auto", "document", "screenshot", "single"])
+    parser.add_argument("--preprocessing", default="none", choices=["none", "contrast", "sharpen", "grayscale"])
+    parser.add_argument("--ai", action="store_true", help="use AI enhancement")
+    parser.add_argument("--lang", default="eng")
+    parser.add_argument("--words", choices=["tsv", "json", "hocr", "alto"],
+                        help="also write word boxes and confidences in this format")
+    parser.add_argument("--jsonl", help="also append a JSON record per image to this file")
+    parser.add_argument("--sqlite", help="also store results in this SQLite database")
+    parser.add_argument("--sqlite-batch", type=int, default=100, help="results per SQLite transaction")
+    parser.add_argument("--npz", help="also store word boxes in this compressed .npz archive")
+    parser.add_argument("--index", nargs="?", const="",
+                        help="keep a full-text index of the results for the search command "
+                             "(default: ~/.ocr_app/ocr_index.db)")
+    parser.add_argument("--dedup", action="store_true",
+                        help="reuse the results of near-duplicate images OCR'd before (verified by one fast pass)")
+    parser.add_argument("--dedup-index", help="near-duplicate database (default: ~/.ocr_app/dedup.db)")
+    parser.add_argument("--dedup-distance", type=int, default=8,
+                        help="largest perceptual hash distance (of 64 bits) between near-duplicates")
+    parser.add_argument("--auto-prune", action="store_true",
+                        help="skip OCR passes that rarely improve the result for their runtime (see the passes command)")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="write a Chrome trace-event timeline of every stage and tesseract pass to FILE")
+    parser.add_argument("--metrics-port", type=int,
+                        help="serve Prometheus metrics on http://127.0.0.1:PORT/metrics while running")
+    parser.add_argument("--metrics-file", help="write the metrics to this file in Prometheus text format")
+    parser.add_argument("--metrics-interval", type=float, default=15.0,
+                        help="seconds between rewrites of --metrics-file (it is also written at the end)")
+    parser.add_argument("--log-level", choices=ocr_log.LEVELS,
+                        help="diagnostic output on stderr (default: $OCR_LOG_LEVEL or warning; "
+                             "trace also logs recognized text)")
+    parser.add_argument("--debug-dir", help="save preprocessed images and OCR pass variants here")
+    parser.add_argument("--debug-format", default="png", choices=["png", "jpeg", "webp"])
+    parser.add_argument("--debug-compression", type=int, default=None,
+                        help="PNG zlib level (0-9) or JPEG/WebP quality (1-100) of debug images")
+    parser.add_argument("--debug-max-mb", type=int, default=256, help="prune debug images beyond this total size")
+    parser.add_argument("--debug-max-days", type=float, default=7, help="prune debug images older than this")
+
+def build_parser():
+    """Command line interface for the launcher"""
+    parser = argparse.ArgumentParser(description="OCR Application")
+    commands = parser.add_subparsers(dest="command")
+
+    batch = commands.add_parser("batch", help="OCR images on a pool of worker processes")
+    batch.add_argument("paths", nargs="+", help="image files or directories")
+    add_engine_arguments(batch)
+    batch.set_defaults(func=run_batch)
+
+    watch = commands.add_parser("watch", help="OCR new and changed images in a hot folder")
+    watch.add_argument("directory", help="folder to watch")
+    add_engine_arguments(watch)
+    watch.add_argument("--interval", type=float, default=2.0, help="seconds between directory scans")
+    watch.add_argument("--settle", type=float, default=2.0,
+                       help="seconds a file's size must stay unchanged before it is processed")
+    watch.add_argument("--checkpoint", help="checkpoint journal (default: <directory>/.ocr_checkpoint.jsonl)")
+    watch.add_argument("--recursive", action="store_true", help="also watch subdirectories")
+    watch.add_argument("--once", action="store_true", help="process the current backlog and exit")
+    watch.set_defaults(func=run_watch)
+
+    learn = commands.add_parser("learn-confusions",
+                                help="learn OCR character confusions from ground-truth text")
+    learn.add_argument("pairs", nargs="*", help="TSV files of OCR text<TAB>true text, one pair per line")
+    learn.add_argument("--ocr-dir", help="folder of OCR .txt output")
+    learn.add_argument("--truth-dir", help="folder of corrected .txt files with the same names")
+    learn.set_defaults(func=run_learn_confusions)
+
+    model = commands.add_parser("build-language-model",
+                                help="build the character n-gram model used to rank OCR candidates")
+    model.add_argument("corpus", nargs="+", help="plain text files of the kind of text you scan")
+    model.add_argument("--table-bits", type=int, default=20,
+                       help="log2 of the number of n-gram counters (default 20: 4 MB)")
+    model.set_defaults(func=run_build_language_model)
+
+    search = commands.add_parser("search", help="search the full-text index of OCR results")
+    search.add_argument("query", nargs="+", help="words that must all appear in a line")
+    search.add_argument("--index", help="index database (default: ~/.ocr_app/ocr_index.db)")
+    search.add_argument("--limit", type=int, default=20)
+    search.add_argument("--raw", action="store_true",
+                        help="pass the query to SQLite FTS5 as is (phrases, prefix*, OR, NEAR)")
+    search.add_argument("--json", action="store_true", help="print hits as JSON lines")
+    search.set_defaults(func=run_search)
+
+    passes = commands.add_parser("passes", help="report which OCR passes win and which auto-prune skips")
+    passes.add_argument("--mode", help="only passes of this mode (document, screenshot, single, certificate, auto)")
+    passes.add_argument("--json", action="store_true", help="print the report as JSON")
+    passes.set_defaults(func=run_passes)
+
+    return parser
+
+def main(argv=None):
     """Main entry point for the application launcher"""
+    args = build_parser().parse_args(argv)
+
     if not check_dependencies():
         return 1
-    
+
+    if args.command:
+        return args.func(args)
+
     if not check_tesseract():
         print("\nWARNING: The application may not work correctly without Tesseract OCR.")
         response = input("Do you want to continue anyway? (y/n): ")
         if response.lower() != 'y':
             return 1
-    
+
     # Launch the OCR application
     try:
         from ocr_app import main
@@ -53,8 +465,8 @@ def main():
     except Exception as e:
         print(f"Error launching OCR application: {e}")
         return 1
-    
+
     return 0
 
 if __name__ == "__main__":
-    sys.exit(main()) 
\ No newline at end of file
+    sys.exit(main())